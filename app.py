@@ -1,15 +1,66 @@
+import threading
 from flask import Flask
-from utility.db import get_db_connection
+from utility.db import get_db_connection, init_app as init_db
+from utility.metrics import init_app as init_metrics
+from utility.logs import init_app as init_logs
+from utility.cache import init_cache_bus
+from utility.search_index import start_item_search_index
+from utility.idempotency import start_idempotency_purge
 from routes.routes_item import item_routes
 from routes.routes_user import user_routes
 from routes.routes_transaction import transaction_routes
+from routes.routes_inventory import inventory_routes
+from routes.routes_admin import admin_routes
+from routes.routes_health import health_routes
 
-app = Flask(__name__)
+_background_started = False
+_background_lock = threading.Lock()
 
-# Register routes
-app.register_blueprint(item_routes, url_prefix="/items")
-app.register_blueprint(user_routes, url_prefix="/users")
-app.register_blueprint(transaction_routes, url_prefix="/transactions")
 
+# Background threads are per process, started once however many apps are made
+def _start_background_tasks():
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+
+    # Share cache invalidations with other workers when configured
+    init_cache_bus()
+
+    # Build the item search index in the background
+    start_item_search_index()
+
+    # Delete expired idempotency keys periodically
+    start_idempotency_purge()
+
+
+# App factory. gunicorn calls it in each worker process after the fork,
+# so every worker gets its own pool, caches and background threads.
+def create_app():
+    app = Flask(__name__)
+
+    # JSON logs with request IDs, written off the request thread
+    init_logs(app)
+
+    # Return pooled connections at the end of each request
+    init_db(app)
+
+    # Request latency, status and in-flight metrics, served on /metrics
+    init_metrics(app)
+
+    # Register routes
+    app.register_blueprint(item_routes, url_prefix="/items")
+    app.register_blueprint(user_routes, url_prefix="/users")
+    app.register_blueprint(transaction_routes, url_prefix="/transactions")
+    app.register_blueprint(inventory_routes, url_prefix="/inventory")
+    app.register_blueprint(admin_routes, url_prefix="/admin")
+    app.register_blueprint(health_routes)
+
+    _start_background_tasks()
+    return app
+
+
+# Development server only, use gunicorn -c gunicorn.conf.py in production
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,887 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import datetime
+import threading
+import subprocess
+import http.client
+import multiprocessing
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+
+# Benchmarks replaying the terminal frontend workflows against a synthetic
+# catalog, either in-process through Flask's test client or over HTTP
+# against a running server (gunicorn -c gunicorn.conf.py).
+#
+#   python benchmark.py run [--transport client|http] [--url URL] [--skus N]
+#                           [--requests N] [--concurrency N] [--scenario NAME ...]
+#                           [--save NAME] [--compare NAME] [--tolerance FRACTION]
+#   python benchmark.py seed [--skus N]
+#   python benchmark.py contention [--transport client|http] [--hot-skus N] [--warehouses N]
+#                                  [--stock N] [--operations N] [--processes N] [--threads N]
+#
+# The client transport uses an in-memory SQLite database unless DB_BACKEND
+# is set. Over HTTP the catalog is seeded through this process's database
+# settings, which must point at the server's database (or pass --no-seed).
+# --save stores the results under benchmarks/; --compare exits with status 1
+# when a scenario got slower or needs more round trips than the baseline.
+#
+# contention fires concurrent purchases and returns at a few hot SKUs from
+# threads in one or more processes, then checks the ledger invariants and
+# exits with status 1 on a violation. Run it with different settings (e.g.
+# PURCHASE_GROUP_COMMIT=1) to compare locking strategies.
+
+BENCHMARKS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+BENCH_PREFIX = "BENCH"
+SEED_CHUNK = 10000
+WAREHOUSES = 4
+CUSTOMERS = 1000
+USERS = 1000
+# Seeded stock per inventory row, purchases never run out during a run
+STOCK = 1000000000
+PURCHASE_QUANTITY = 5
+
+
+def _sku(i):
+    return f"{BENCH_PREFIX}-{i:08d}"
+
+
+def _warehouse(i):
+    return f"{BENCH_PREFIX}-W{i % WAREHOUSES}"
+
+
+def _customer(i):
+    return f"{BENCH_PREFIX}-C{i:05d}"
+
+
+def _user(i):
+    return f"{BENCH_PREFIX}-U{i:05d}"
+
+
+def _item(sku, i, barcode):
+    return {
+        "item_sku": sku, "item_name": f"Bench item {i}", "item_uom": "ea", "item_group": f"group-{i % 100}",
+        "retail_price": 19.99, "purchase_price": 9.5, "warranty_period": 12, "is_stock_item": True,
+        "brand": f"brand-{i % 500}", "description": "Synthetic benchmark item", "single_unit_dimensions": "10x10x10",
+        "single_unit_weight": 1.25, "weight_uom": "lb", "country_of_origin": "US",
+        "barcode": barcode, "barcode_type": "EAN13"
+    }
+
+
+### Seeding ###
+
+def _count(cur, table, column, prefix):
+    cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} LIKE %s", (f"{prefix}%",))
+    return cur.fetchone()[0]
+
+
+# Insert whatever part of the synthetic catalog is missing. Rows are numbered
+# from zero, so a partly seeded database is topped up rather than redone.
+def seed(skus):
+    from utility.db import get_db_connection
+    from utility.versions import bump_table_version
+    from validations.validate_item import ITEM_FIELDS
+
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        existing = _count(cur, "Warehouse", "warehouse_id", f"{BENCH_PREFIX}-W")
+        if existing < WAREHOUSES:
+            cur.executemany(
+                "INSERT INTO Warehouse (warehouse_id, warehouse_name) VALUES (%s, %s)",
+                [(_warehouse(i), f"Bench warehouse {i}") for i in range(existing, WAREHOUSES)]
+            )
+        existing = _count(cur, "Customer", "customer_id", f"{BENCH_PREFIX}-C")
+        if existing < CUSTOMERS:
+            cur.executemany(
+                "INSERT INTO Customer (customer_id, customer_name) VALUES (%s, %s)",
+                [(_customer(i), f"Bench customer {i}") for i in range(existing, CUSTOMERS)]
+            )
+        existing = _count(cur, "User", "user_id", f"{BENCH_PREFIX}-U")
+        if existing < USERS:
+            cur.executemany(
+                "INSERT INTO User (user_id, user_name, user_role, pass_hash) VALUES (%s, %s, %s, %s)",
+                [(_user(i), f"Bench user {i}", "employee", uuid.uuid4().hex) for i in range(existing, USERS)]
+            )
+            bump_table_version(cur, "User")
+        conn.commit()
+
+        existing = _count(cur, "Item", "item_sku", f"{BENCH_PREFIX}-0")
+        item_insert = f"INSERT INTO Item ({', '.join(ITEM_FIELDS)}) VALUES ({', '.join(['%s'] * len(ITEM_FIELDS))})"
+        started = time.monotonic()
+        for start in range(existing, skus, SEED_CHUNK):
+            numbers = range(start, min(start + SEED_CHUNK, skus))
+            items = [_item(_sku(i), i, f"9{i:012d}") for i in numbers]
+            cur.executemany(item_insert, [[item[field] for field in ITEM_FIELDS] for item in items])
+            cur.executemany(
+                "INSERT INTO In_Inventory (item_sku, warehouse_id, item_quantity, opening_stock) VALUES (%s, %s, %s, %s)",
+                [(_sku(i), _warehouse(i), STOCK, STOCK) for i in numbers]
+            )
+            bump_table_version(cur, "Item")
+            conn.commit()
+            print(f"Seeded {numbers[-1] + 1}/{skus} items ({time.monotonic() - started:.1f}s)", file=sys.stderr)
+        return max(skus - existing, 0)
+    finally:
+        cur.close()
+        conn.close()
+
+
+### Transports ###
+
+class ClientTransport:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, params=None, body=None, headers=None):
+        response = self._client.open(path, method=method, query_string=params, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True), response.headers
+
+
+# One keep-alive connection per thread, reopened when the server closes it
+class HttpTransport:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._conn = None
+
+    def _send(self, method, target, payload, headers):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self._host, self._port, timeout=60)
+        self._conn.request(method, target, payload, headers)
+        response = self._conn.getresponse()
+        return response, response.read()
+
+    def request(self, method, path, params=None, body=None, headers=None):
+        target = path + ("?" + urlencode(params) if params else "")
+        payload = json.dumps(body) if body is not None else None
+        headers = {**(headers or {}), **({"Content-Type": "application/json"} if payload is not None else {})}
+        try:
+            response, data = self._send(method, target, payload, headers)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Closed while idle, the request never reached the application
+            self._conn.close()
+            self._conn = None
+            response, data = self._send(method, target, payload, headers)
+        if response.getheader("Connection", "").lower() == "close":
+            self._conn.close()
+            self._conn = None
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return response.status, parsed, response.headers
+
+
+### Scenarios ###
+
+# State shared by the scenarios of one run: the rows created so far, so the
+# update, delete and return flows act on rows of their own
+class _Context:
+    def __init__(self, skus):
+        self.skus = skus
+        self.run_id = uuid.uuid4().hex[:8]
+        self.today = datetime.date.today().isoformat()
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.items = deque()
+        self.users = deque()
+        self.purchases = []
+        self.returnable = deque()
+
+    def next_id(self):
+        with self.lock:
+            self.sequence += 1
+            return self.sequence
+
+    def take(self, rows):
+        with self.lock:
+            return rows.popleft() if rows else None
+
+
+def item_create(ctx, rng, transport):
+    n = ctx.next_id()
+    sku = f"{BENCH_PREFIX}-N-{ctx.run_id}-{n}"
+    status, _, headers = transport.request("POST", "/items/", body=_item(sku, n, f"8{ctx.run_id}{n:08d}"))
+    if status == 201:
+        ctx.items.append(sku)
+    return status == 201, headers
+
+
+def item_view(ctx, rng, transport):
+    status, _, headers = transport.request("GET", f"/items/{_sku(rng.randrange(ctx.skus))}")
+    return status == 200, headers
+
+
+def item_search(ctx, rng, transport):
+    status, _, headers = transport.request("GET", "/items/", params={"brand": f"brand-{rng.randrange(500)}", "limit": 50})
+    return status in (200, 404), headers
+
+
+def item_update(ctx, rng, transport):
+    body = {"retail_price": round(rng.uniform(10, 99), 2), "description": f"Updated {ctx.run_id}"}
+    status, _, headers = transport.request("PUT", f"/items/{_sku(rng.randrange(ctx.skus))}", body=body)
+    return status == 200, headers
+
+
+def item_delete(ctx, rng, transport):
+    sku = ctx.take(ctx.items)
+    if sku is None:
+        return None, None
+    status, _, headers = transport.request("DELETE", f"/items/{sku}")
+    return status == 200, headers
+
+
+def user_create(ctx, rng, transport):
+    user_id = f"{BENCH_PREFIX}-N-{ctx.run_id}-{ctx.next_id()}"
+    body = {"user_id": user_id, "user_name": "Bench user", "user_role": "employee", "pass_hash": uuid.uuid4().hex}
+    status, _, headers = transport.request("POST", "/users/", body=body)
+    if status == 201:
+        ctx.users.append(user_id)
+    return status == 201, headers
+
+
+def user_view(ctx, rng, transport):
+    status, _, headers = transport.request("GET", f"/users/{_user(rng.randrange(USERS))}")
+    return status == 200, headers
+
+
+def user_update(ctx, rng, transport):
+    body = {"user_name": f"Bench user {rng.randrange(1000)}", "user_role": rng.choice(["admin", "employee"])}
+    status, _, headers = transport.request("PUT", f"/users/{_user(rng.randrange(USERS))}", body=body)
+    return status == 200, headers
+
+
+def user_delete(ctx, rng, transport):
+    user_id = ctx.take(ctx.users)
+    if user_id is None:
+        return None, None
+    status, _, headers = transport.request("DELETE", f"/users/{user_id}")
+    return status == 200, headers
+
+
+def purchase(ctx, rng, transport):
+    i = rng.randrange(ctx.skus)
+    body = {
+        "item_sku": _sku(i), "warehouse_id": _warehouse(i), "customer_id": _customer(rng.randrange(CUSTOMERS)),
+        "date": ctx.today, "sales_uom": "ea", "transaction_quantity": PURCHASE_QUANTITY,
+        "shipping_address": "1 Bench Street", "shipping_city": "Springfield", "shipping_state": "OR",
+        "shipping_zipcode": "97477", "shipping_country": "US", "transaction_weight": 6.25
+    }
+    status, data, headers = transport.request(
+        "POST", "/transactions/purchase", body=body, headers={"Idempotency-Key": str(uuid.uuid4())}
+    )
+    if status == 201:
+        with ctx.lock:
+            ctx.purchases.append((data['transaction_id'], data['date']))
+            ctx.returnable.extend([(data['transaction_id'], data['date'])] * PURCHASE_QUANTITY)
+    return status == 201, headers
+
+
+def purchase_update(ctx, rng, transport):
+    with ctx.lock:
+        chosen = rng.choice(ctx.purchases) if ctx.purchases else None
+    if chosen is None:
+        return None, None
+    transaction_id, date = chosen
+    status, _, headers = transport.request(
+        "PUT", f"/transactions/purchase/{transaction_id}", params={"date": date},
+        body={"tracking_information": f"TRK{rng.randrange(10 ** 9)}"}
+    )
+    return status == 200, headers
+
+
+def purchase_return(ctx, rng, transport):
+    chosen = ctx.take(ctx.returnable)
+    if chosen is None:
+        return None, None
+    transaction_id, date = chosen
+    status, _, headers = transport.request(
+        "POST", f"/transactions/return/{transaction_id}", params={"date": date},
+        body={"return_quantity": 1}, headers={"Idempotency-Key": str(uuid.uuid4())}
+    )
+    return status == 201, headers
+
+
+# In run order: rows are created before the flows that update or remove them
+SCENARIOS = {
+    "item_create": item_create,
+    "item_view": item_view,
+    "item_search": item_search,
+    "item_update": item_update,
+    "item_delete": item_delete,
+    "user_create": user_create,
+    "user_view": user_view,
+    "user_update": user_update,
+    "user_delete": user_delete,
+    "purchase": purchase,
+    "purchase_update": purchase_update,
+    "return": purchase_return
+}
+
+
+### Running ###
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_scenario(name, ctx, make_transport, requests, concurrency, seed_value):
+    scenario = SCENARIOS[name]
+    latencies = []
+    round_trips = []
+    errors = [0]
+    skipped = [0]
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(f"{seed_value}-{name}-{index}")
+        transport = make_transport()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                ok, headers = scenario(ctx, rng, transport)
+            except Exception:
+                ok, headers = False, None
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok is None:
+                    skipped[0] += 1
+                    continue
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+                queries = headers.get("X-DB-Queries") if headers is not None else None
+                round_trips.append(int(queries) if queries else 0)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "skipped": skipped[0],
+        "throughput": round(len(latencies) / wall, 1) if wall > 0 else 0,
+        "mean_ms": to_ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": to_ms(_percentile(ordered, 0.50)),
+        "p95_ms": to_ms(_percentile(ordered, 0.95)),
+        "p99_ms": to_ms(_percentile(ordered, 0.99)),
+        "db_round_trips": round(sum(round_trips) / len(round_trips), 2) if round_trips else None
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _print_results(results):
+    print(f"{'scenario':<16} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'db/req':>7}")
+    for name, row in results["scenarios"].items():
+        print(
+            f"{name:<16} {row['requests']:>7} {row['errors']:>5} {row['throughput']:>9} "
+            f"{row['p50_ms']!s:>9} {row['p95_ms']!s:>9} {row['p99_ms']!s:>9} {row['db_round_trips']!s:>7}"
+        )
+
+
+def _baseline_path(name):
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(BENCHMARKS_PATH, f"{name}.json")
+
+
+# Scenarios that lost more than tolerance of their throughput, grew p50 or
+# p95 latency by more than tolerance, or need more round trips per request
+def compare(results, baseline, tolerance):
+    for key in ("transport", "skus", "concurrency"):
+        if results["meta"].get(key) != baseline["meta"].get(key):
+            print(f"Warning: {key} differs from the baseline ({results['meta'].get(key)} vs {baseline['meta'].get(key)})")
+
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None or not current["requests"] or not base["requests"]:
+            continue
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']} -> {current['throughput']} req/s")
+        for key in ("p50_ms", "p95_ms"):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if (current["db_round_trips"] or 0) > (base["db_round_trips"] or 0) + 0.05:
+            regressions.append(f"{name}: db round trips {base['db_round_trips']} -> {current['db_round_trips']} per request")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def run(args):
+    if args.transport == 'client':
+        from app import create_app
+        from utility.lifecycle import warm_up
+
+        if not args.no_seed:
+            seed(args.skus)
+        app = create_app()
+        warm_up()
+        make_transport = lambda: ClientTransport(app)
+    else:
+        if not args.no_seed:
+            seed(args.skus)
+        make_transport = lambda: HttpTransport(args.url)
+        status, _, _ = make_transport().request("POST", "/admin/search-index/rebuild")
+        if status != 200:
+            print(f"Warning: search index rebuild returned {status}", file=sys.stderr)
+
+    names = args.scenario or list(SCENARIOS)
+    ctx = _Context(args.skus)
+    # Untimed pass so connections, caches and prepared statements are warm
+    if args.warmup:
+        for name in names:
+            run_scenario(name, ctx, make_transport, args.warmup, args.concurrency, f"{args.seed}-warmup")
+
+    results = {
+        "meta": {
+            "transport": args.transport, "skus": args.skus, "requests": args.requests, "concurrency": args.concurrency,
+            "backend": os.environ.get('DB_BACKEND', 'mysql') if args.transport == 'client' else args.url,
+            "revision": _git_revision(), "created_at": datetime.datetime.now().isoformat(timespec='seconds')
+        },
+        "scenarios": {}
+    }
+    for name in names:
+        results["scenarios"][name] = run_scenario(name, ctx, make_transport, args.requests, args.concurrency, args.seed)
+    _print_results(results)
+
+    if args.save:
+        path = _baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {path}")
+
+    if args.compare:
+        with open(_baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+### Contention ###
+
+HOT_PREFIX = f"{BENCH_PREFIX}-HOT"
+# Responses worth retrying with the same Idempotency-Key: deadlocks and lock
+# wait timeouts surface as 500, a full group commit queue as 503
+RETRY_STATUSES = (500, 503)
+
+
+def _hot_sku(run_id, k):
+    return f"{HOT_PREFIX}-{run_id}-{k}"
+
+
+# Fresh hot SKUs per run, so the invariants only look at this run's rows
+def seed_hot(run_id, skus, warehouses, stock):
+    from utility.db import get_db_connection
+    from utility.versions import bump_table_version
+    from validations.validate_item import ITEM_FIELDS
+
+    seed(0)
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        items = [_item(_hot_sku(run_id, k), k, f"7{run_id}{k:06d}") for k in range(skus)]
+        cur.executemany(
+            f"INSERT INTO Item ({', '.join(ITEM_FIELDS)}) VALUES ({', '.join(['%s'] * len(ITEM_FIELDS))})",
+            [[item[field] for field in ITEM_FIELDS] for item in items]
+        )
+        cur.executemany(
+            "INSERT INTO In_Inventory (item_sku, warehouse_id, item_quantity, opening_stock) VALUES (%s, %s, %s, %s)",
+            [(_hot_sku(run_id, k), _warehouse(w), stock, stock) for k in range(skus) for w in range(warehouses)]
+        )
+        bump_table_version(cur, "Item")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _lock_waits():
+    from utility.db import get_backend, get_db_connection
+
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        return get_backend().lock_wait_stats(cur)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _lock_wait_delta(before, after):
+    return {key: round(after[key] - before[key], 6) for key in before}
+
+
+# Send one write, retrying transient failures under the same Idempotency-Key
+# so a retry can never apply the write twice
+def _send_write(transport, path, params, body, max_retries, stats):
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    for attempt in range(max_retries + 1):
+        try:
+            status, data, response_headers = transport.request("POST", path, params=params, body=body, headers=headers)
+        except Exception:
+            status, data, response_headers = None, None, None
+        if status not in RETRY_STATUSES and status is not None:
+            if response_headers.get("Idempotent-Replayed"):
+                stats["replays"] += 1
+            return status, data
+        if attempt < max_retries:
+            stats["retries"] += 1
+            time.sleep(0.01 * (attempt + 1))
+    return status, data
+
+
+def _contention_stats():
+    return {
+        "purchases": 0, "purchased_quantity": 0, "insufficient_stock": 0,
+        "returns": 0, "returned_quantity": 0, "returns_rejected": 0,
+        "errors": 0, "retries": 0, "replays": 0,
+        "purchase_latency": [], "return_latency": [], "lock_waits": None
+    }
+
+
+# Purchases of one to three units against a random hot SKU and warehouse,
+# and returns of a random quantity against a purchase seen by this process.
+# Returns deliberately race and overshoot, the route has to reject the excess.
+def _contend(config, index, transport, operations, purchases, lock, stats):
+    rng = random.Random(f"{config['seed']}-contention-{index}")
+    today = datetime.date.today().isoformat()
+    local = _contention_stats()
+    for _ in range(operations):
+        with lock:
+            chosen = rng.choice(purchases) if purchases and rng.random() < config['return_ratio'] else None
+        start = time.perf_counter()
+        if chosen is None:
+            quantity = rng.randint(1, 3)
+            body = {
+                "item_sku": _hot_sku(config['run_id'], rng.randrange(config['hot_skus'])),
+                "warehouse_id": _warehouse(rng.randrange(config['warehouses'])),
+                "customer_id": _customer(rng.randrange(CUSTOMERS)), "date": today, "sales_uom": "ea",
+                "transaction_quantity": quantity, "shipping_address": "1 Bench Street", "shipping_city": "Springfield",
+                "shipping_state": "OR", "shipping_zipcode": "97477", "shipping_country": "US", "transaction_weight": 1.25
+            }
+            status, data = _send_write(transport, "/transactions/purchase", None, body, config['max_retries'], local)
+            local["purchase_latency"].append(time.perf_counter() - start)
+            if status == 201:
+                local["purchases"] += 1
+                local["purchased_quantity"] += quantity
+                with lock:
+                    purchases.append((data['transaction_id'], data['date'], quantity))
+            elif status == 409:
+                local["insufficient_stock"] += 1
+            else:
+                local["errors"] += 1
+        else:
+            transaction_id, date, purchased = chosen
+            quantity = rng.randint(1, purchased)
+            status, _ = _send_write(
+                transport, f"/transactions/return/{transaction_id}", {"date": date},
+                {"return_quantity": quantity}, config['max_retries'], local
+            )
+            local["return_latency"].append(time.perf_counter() - start)
+            if status == 201:
+                local["returns"] += 1
+                local["returned_quantity"] += quantity
+            elif status == 400:
+                local["returns_rejected"] += 1
+            else:
+                local["errors"] += 1
+    with lock:
+        _merge_stats(stats, local)
+
+
+def _merge_stats(total, part):
+    for key, value in part.items():
+        if key == "lock_waits":
+            if value is not None:
+                total[key] = value if total[key] is None else {k: total[key][k] + value[k] for k in value}
+        else:
+            total[key] += value
+
+
+# Entry point of one process: its threads share a transport factory and the
+# list of purchases they can return against
+def _contention_process(config, process_index, operations):
+    if config['transport'] == 'http':
+        make_transport = lambda: HttpTransport(config['url'])
+    else:
+        from app import create_app
+        app = create_app()
+        make_transport = lambda: ClientTransport(app)
+
+    # SQLite lock waits are only visible to the process that waited
+    local_waits = config['transport'] == 'client' and not config['lock_waits_global']
+    before = _lock_waits() if local_waits else None
+
+    stats = _contention_stats()
+    purchases = []
+    lock = threading.Lock()
+    threads = []
+    for thread_index in range(config['threads']):
+        share = operations // config['threads'] + (1 if thread_index < operations % config['threads'] else 0)
+        index = process_index * config['threads'] + thread_index
+        threads.append(threading.Thread(
+            target=lambda index=index, share=share: _contend(
+                config, index, make_transport(), share, purchases, lock, stats
+            )
+        ))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if local_waits:
+        stats["lock_waits"] = _lock_wait_delta(before, _lock_waits())
+    return stats
+
+
+# Invariants over this run's rows: stock never negative, no purchase returned
+# beyond its quantity, stock conserved, and the ledger agrees with the
+# responses the clients got. Returns the list of violations.
+def check_invariants(config, stats):
+    from utility.db import get_db_connection
+
+    hot = [_hot_sku(config['run_id'], k) for k in range(config['hot_skus'])]
+    placeholders = ", ".join(["%s"] * len(hot))
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT item_sku, warehouse_id, item_quantity FROM In_Inventory WHERE item_sku IN ({placeholders})", hot
+        )
+        levels = {(sku, warehouse_id): int(quantity) for sku, warehouse_id, quantity in cur.fetchall()}
+        cur.execute(f"""
+            SELECT item_sku, warehouse_id, transaction_type, COUNT(*), COALESCE(SUM(transaction_quantity), 0)
+            FROM Transaction WHERE item_sku IN ({placeholders})
+            GROUP BY item_sku, warehouse_id, transaction_type
+        """, hot)
+        ledger = {(sku, warehouse_id, kind): (int(count), int(quantity)) for sku, warehouse_id, kind, count, quantity in cur.fetchall()}
+        cur.execute(f"""
+            SELECT p.transaction_id, p.transaction_quantity, SUM(r.transaction_quantity)
+            FROM Transaction p JOIN Transaction r
+                ON r.parent_transaction_id = p.transaction_id AND r.transaction_type = 'return'
+            WHERE p.transaction_type = 'purchase' AND p.item_sku IN ({placeholders})
+            GROUP BY p.transaction_id, p.transaction_quantity
+            HAVING SUM(r.transaction_quantity) > p.transaction_quantity
+        """, hot)
+        over_returned = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    violations = []
+    for (sku, warehouse_id), quantity in sorted(levels.items()):
+        if quantity < 0:
+            violations.append(f"negative stock: {sku} in {warehouse_id} at {quantity}")
+        purchased = ledger.get((sku, warehouse_id, 'purchase'), (0, 0))[1]
+        returned = ledger.get((sku, warehouse_id, 'return'), (0, 0))[1]
+        if config['stock'] - purchased + returned != quantity:
+            violations.append(
+                f"stock not conserved: {sku} in {warehouse_id} at {quantity}, "
+                f"expected {config['stock']} - {purchased} + {returned}"
+            )
+    for transaction_id, purchased, returned in over_returned:
+        violations.append(f"over-returned: purchase {transaction_id} of {purchased} has {returned} returned")
+
+    # A request that still failed after its retries may or may not have
+    # committed, so the ledger can only be matched exactly without errors
+    counted = {
+        "purchases": sum(count for (_, _, kind), (count, _) in ledger.items() if kind == 'purchase'),
+        "purchased_quantity": sum(quantity for (_, _, kind), (_, quantity) in ledger.items() if kind == 'purchase'),
+        "returns": sum(count for (_, _, kind), (count, _) in ledger.items() if kind == 'return'),
+        "returned_quantity": sum(quantity for (_, _, kind), (_, quantity) in ledger.items() if kind == 'return')
+    }
+    for key, value in counted.items():
+        if value != stats[key]:
+            message = f"ledger has {value} {key.replace('_', ' ')}, clients saw {stats[key]}"
+            if stats["errors"]:
+                print(f"Warning: {message} ({stats['errors']} requests failed)")
+            else:
+                violations.append(message)
+    return violations
+
+
+def _latency_summary(latencies):
+    ordered = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(ordered),
+        "p50_ms": to_ms(_percentile(ordered, 0.50)),
+        "p95_ms": to_ms(_percentile(ordered, 0.95)),
+        "p99_ms": to_ms(_percentile(ordered, 0.99))
+    }
+
+
+def contention(args):
+    from utility.db import get_backend
+
+    backend = get_backend()
+    if args.processes > 1 and args.transport == 'client' and backend.name == 'sqlite' and backend.memory:
+        print("Processes cannot share an in-memory database, set DB_SQLITE_PATH to a file", file=sys.stderr)
+        return 2
+    if not 1 <= args.warehouses <= WAREHOUSES:
+        print(f"--warehouses must be between 1 and {WAREHOUSES}", file=sys.stderr)
+        return 2
+
+    config = {
+        "run_id": uuid.uuid4().hex[:8], "transport": args.transport, "url": args.url,
+        "hot_skus": args.hot_skus, "warehouses": args.warehouses, "stock": args.stock,
+        "threads": args.threads, "return_ratio": args.return_ratio, "max_retries": args.max_retries,
+        "seed": args.seed, "lock_waits_global": backend.lock_waits_global
+    }
+    seed_hot(config['run_id'], args.hot_skus, args.warehouses, args.stock)
+    global_before = _lock_waits() if backend.lock_waits_global else None
+
+    shares = [args.operations // args.processes + (1 if i < args.operations % args.processes else 0) for i in range(args.processes)]
+    started = time.perf_counter()
+    if args.processes == 1:
+        parts = [_contention_process(config, 0, shares[0])]
+    else:
+        # Spawned rather than forked, so no process inherits open connections
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            parts = pool.starmap(_contention_process, [(config, i, share) for i, share in enumerate(shares)])
+    wall = time.perf_counter() - started
+
+    stats = _contention_stats()
+    for part in parts:
+        _merge_stats(stats, part)
+    if global_before is not None:
+        stats["lock_waits"] = _lock_wait_delta(global_before, _lock_waits())
+    violations = check_invariants(config, stats)
+
+    operations = len(stats["purchase_latency"]) + len(stats["return_latency"])
+    results = {
+        "meta": {
+            "transport": args.transport, "processes": args.processes, "threads": args.threads,
+            "hot_skus": args.hot_skus, "warehouses": args.warehouses, "stock": args.stock,
+            "backend": os.environ.get('DB_BACKEND', 'mysql') if args.transport == 'client' else args.url,
+            "group_commit": os.environ.get('PURCHASE_GROUP_COMMIT', '0') == '1',
+            "revision": _git_revision(), "created_at": datetime.datetime.now().isoformat(timespec='seconds')
+        },
+        "operations": operations,
+        "throughput": round(operations / wall, 1) if wall > 0 else 0,
+        "purchase": _latency_summary(stats["purchase_latency"]),
+        "return": _latency_summary(stats["return_latency"]),
+        **{key: stats[key] for key in (
+            "purchases", "purchased_quantity", "insufficient_stock", "returns", "returned_quantity",
+            "returns_rejected", "errors", "retries", "replays", "lock_waits"
+        )},
+        "violations": violations
+    }
+
+    print(f"{operations} operations in {wall:.2f}s, {results['throughput']} ops/s "
+          f"({args.processes} processes x {args.threads} threads on {args.hot_skus} SKUs x {args.warehouses} warehouses)")
+    for kind in ("purchase", "return"):
+        row = results[kind]
+        print(f"  {kind:<9} {row['requests']:>7} reqs  p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms")
+    print(f"  purchases {stats['purchases']} ok ({stats['purchased_quantity']} units), {stats['insufficient_stock']} out of stock")
+    print(f"  returns   {stats['returns']} ok ({stats['returned_quantity']} units), {stats['returns_rejected']} rejected")
+    print(f"  errors {stats['errors']}, retries {stats['retries']}, replayed {stats['replays']}")
+    waits = stats["lock_waits"]
+    if waits is None:
+        print("  lock waits: not available for this backend over http")
+    else:
+        print(f"  lock waits {waits['waits']}, {waits['wait_seconds']:.3f}s waiting")
+
+    if args.save:
+        path = _baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {path}")
+
+    if violations:
+        print("Invariant violations:")
+        for violation in violations:
+            print(f"  {violation}")
+        return 1
+    print("Invariants hold: no negative stock, no over-returns, stock conserved")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the inventory API with the terminal frontend workflows")
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed_parser = commands.add_parser('seed', help="Insert the synthetic catalog")
+    seed_parser.add_argument('--skus', type=int, default=10000, help="Items in the synthetic catalog")
+    run_parser = commands.add_parser('run', help="Run the scenarios and report latency and throughput")
+    run_parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    run_parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server URL for the http transport")
+    run_parser.add_argument('--skus', type=int, default=10000, help="Items in the synthetic catalog")
+    run_parser.add_argument('--no-seed', action='store_true', help="Use the catalog already in the database")
+    run_parser.add_argument('--requests', type=int, default=1000, help="Measured requests per scenario")
+    run_parser.add_argument('--warmup', type=int, default=100, help="Untimed requests per scenario before measuring")
+    run_parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients")
+    run_parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help="Run only these scenarios")
+    run_parser.add_argument('--seed', default='bench', help="Random seed, runs with the same seed send the same requests")
+    run_parser.add_argument('--save', help="Save results as benchmarks/NAME.json (or a path)")
+    run_parser.add_argument('--compare', help="Compare against benchmarks/NAME.json (or a path)")
+    run_parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown as a fraction")
+    contention_parser = commands.add_parser('contention', help="Concurrent purchases and returns on a few hot SKUs")
+    contention_parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    contention_parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server URL for the http transport")
+    contention_parser.add_argument('--hot-skus', type=int, default=4, help="Items the purchases and returns compete for")
+    contention_parser.add_argument('--warehouses', type=int, default=2, help=f"Warehouses stocking each item, at most {WAREHOUSES}")
+    contention_parser.add_argument('--stock', type=int, default=2000, help="Opening stock per item and warehouse")
+    contention_parser.add_argument('--operations', type=int, default=5000, help="Purchases and returns in total")
+    contention_parser.add_argument('--processes', type=int, default=1, help="Client processes")
+    contention_parser.add_argument('--threads', type=int, default=16, help="Client threads per process")
+    contention_parser.add_argument('--return-ratio', type=float, default=0.3, help="Fraction of operations that are returns")
+    contention_parser.add_argument('--max-retries', type=int, default=3, help="Retries of a 500 or 503 response")
+    contention_parser.add_argument('--seed', default='bench', help="Random seed")
+    contention_parser.add_argument('--save', help="Save results as benchmarks/NAME.json (or a path)")
+    args = parser.parse_args(argv)
+
+    # In-process runs default to an embedded database, no server needed
+    if args.command in ('run', 'contention') and args.transport == 'client':
+        if 'DB_BACKEND' not in os.environ:
+            os.environ['DB_BACKEND'] = 'sqlite'
+            os.environ.setdefault('DB_SQLITE_PATH', ':memory:')
+
+    if args.command == 'seed':
+        print(f"Inserted {seed(args.skus)} items")
+        return 0
+    if args.command == 'contention':
+        return contention(args)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
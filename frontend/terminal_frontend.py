@@ -1,7 +1,11 @@
+import uuid
 import requests
 
 BASE_URL = "http://127.0.0.1:5000"
 
+# Keeps the server's cookies, so reads right after a write see that write
+session = requests.Session()
+
 def show_main_menu():
     print("\n=== Inventory Management ===")
     print("1. Item Management")
@@ -58,7 +62,7 @@ def create_item():
         "barcode_type": input("Barcode Type: ")
     }
 
-    response = requests.post(f"{BASE_URL}/items", json=data)
+    response = session.post(f"{BASE_URL}/items", json=data)
     if response.status_code == 201:
         print("Item created successfully!")
     else:
@@ -74,13 +78,22 @@ def view_items():
         value = input(f"Enter value for {field}: ")
         params[field] = value
 
-    response = requests.get(f"{BASE_URL}/items", params=params)
-    if response.status_code == 200:
+    response = session.get(f"{BASE_URL}/items", params=params)
+    if response.status_code != 200:
+        print(f"Error: {response.json().get('message', 'Unknown error')}")
+        return
+
+    # Follow the pagination cursor until the last page
+    while True:
         items = response.json()
         for item in items:
             print(item)
-    else:
-        print(f"Error: {response.json().get('message', 'Unknown error')}")
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        response = session.get(f"{BASE_URL}/items", params={**params, "after": next_cursor})
+        if response.status_code != 200:
+            break
 
 def update_item():
     print("\n--- Update Item ---")
@@ -93,7 +106,7 @@ def update_item():
         value = input(f"New value for {field}: ")
         data[field] = value
 
-    response = requests.put(f"{BASE_URL}/items/{item_sku}", json=data)
+    response = session.put(f"{BASE_URL}/items/{item_sku}", json=data)
     if response.status_code == 200:
         print("Item updated successfully!")
     else:
@@ -102,7 +115,7 @@ def update_item():
 def delete_item():
     print("\n--- Delete Item ---")
     item_sku = input("Enter the Item SKU to delete: ")
-    response = requests.delete(f"{BASE_URL}/items/{item_sku}")
+    response = session.delete(f"{BASE_URL}/items/{item_sku}")
     if response.status_code == 200:
         print("Item deleted successfully!")
     else:
@@ -118,7 +131,7 @@ def create_user():
         "pass_hash": input("Password Hash: ")
     }
 
-    response = requests.post(f"{BASE_URL}/users", json=data)
+    response = session.post(f"{BASE_URL}/users", json=data)
     if response.status_code == 201:
         print("User created successfully!")
     else:
@@ -134,13 +147,22 @@ def view_users():
         value = input(f"Enter value for {field}: ")
         params[field] = value
 
-    response = requests.get(f"{BASE_URL}/users", params=params)
-    if response.status_code == 200:
+    response = session.get(f"{BASE_URL}/users", params=params)
+    if response.status_code != 200:
+        print(f"Error: {response.json().get('message', 'Unknown error')}")
+        return
+
+    # Follow the pagination cursor until the last page
+    while True:
         users = response.json()
         for user in users:
             print(user)
-    else:
-        print(f"Error: {response.json().get('message', 'Unknown error')}")
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        response = session.get(f"{BASE_URL}/users", params={**params, "after": next_cursor})
+        if response.status_code != 200:
+            break
 
 def update_user():
     print("\n--- Update User ---")
@@ -153,7 +175,7 @@ def update_user():
         value = input(f"New value for {field}: ")
         data[field] = value
 
-    response = requests.put(f"{BASE_URL}/users/{user_id}", json=data)
+    response = session.put(f"{BASE_URL}/users/{user_id}", json=data)
     if response.status_code == 200:
         print("User updated successfully!")
     else:
@@ -162,13 +184,23 @@ def update_user():
 def delete_user():
     print("\n--- Delete User ---")
     user_id = input("Enter the User ID to delete: ")
-    response = requests.delete(f"{BASE_URL}/users/{user_id}")
+    response = session.delete(f"{BASE_URL}/users/{user_id}")
     if response.status_code == 200:
         print("User deleted successfully!")
     else:
         print(f"Error: {response.json().get('message', 'Unknown error')}")
 
 ### Transaction Management ###
+def upload_image(path):
+    if not path:
+        return None
+    with open(path, "rb") as image_file:
+        response = session.post(f"{BASE_URL}/transactions/images", files={"image": image_file})
+    if response.status_code in (200, 201):
+        return response.json()["image_id"]
+    print(f"Error uploading image: {response.json().get('message', 'Unknown error')}")
+    return None
+
 def create_purchase():
     print("\n--- Create Purchase ---")
     data = {
@@ -183,23 +215,24 @@ def create_purchase():
         "shipping_state": input("Shipping State: "),
         "shipping_zipcode": input("Shipping Zipcode: "),
         "shipping_country": input("Shipping Country: "),
-        "transaction_image": input("Transaction Image (optional): ") or None,
+        "transaction_image": upload_image(input("Transaction Image File Path (optional): ")),
         "transaction_barcode": input("Transaction Barcode (optional): ") or None,
         "transaction_weight": float(input("Transaction Weight (optional): ") or 0),
         "tracking_information": input("Tracking Information (optional): ") or None
     }
 
-    response = requests.post(f"{BASE_URL}/transactions/purchase", json=data)
+    # A retry with the same key is answered without booking the purchase twice
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    response = session.post(f"{BASE_URL}/transactions/purchase", json=data, headers=headers)
     if response.status_code == 201:
-        print("Purchase created successfully!")
+        print(f"Purchase created successfully! Transaction ID: {response.json()['transaction_id']}")
     else:
         print(f"Error: {response.json().get('message', 'Unknown error')}")
 
 def update_purchase():
     print("\n--- Update Purchase ---")
-    item_sku = input("Enter the Item SKU: ")
-    warehouse_id = input("Enter the Warehouse ID: ")
-    customer_id = input("Enter the Customer ID: ")
+    transaction_id = input("Enter the Transaction ID: ")
+    purchase_date = input("Enter the Purchase Date (YYYY-MM-DD, optional): ")
     data = {}
     while True:
         field = input("Field to update (or 'done' to finish): ")
@@ -208,7 +241,8 @@ def update_purchase():
         value = input(f"New value for {field}: ")
         data[field] = value
 
-    response = requests.put(f"{BASE_URL}/transactions/purchase/{item_sku}/{warehouse_id}/{customer_id}", json=data)
+    params = {"date": purchase_date} if purchase_date else {}
+    response = session.put(f"{BASE_URL}/transactions/purchase/{transaction_id}", params=params, json=data)
     if response.status_code == 200:
         print("Purchase updated successfully!")
     else:
@@ -216,13 +250,14 @@ def update_purchase():
 
 def process_return():
     print("\n--- Process Return ---")
-    item_sku = input("Enter the Item SKU: ")
-    warehouse_id = input("Enter the Warehouse ID: ")
-    customer_id = input("Enter the Customer ID: ")
+    transaction_id = input("Enter the Purchase Transaction ID: ")
+    purchase_date = input("Enter the Purchase Date (YYYY-MM-DD, optional): ")
     data = {"return_quantity": int(input("Return Quantity: "))}
 
-    response = requests.post(f"{BASE_URL}/transactions/return/{item_sku}/{warehouse_id}/{customer_id}", json=data)
-    if response.status_code == 200:
+    params = {"date": purchase_date} if purchase_date else {}
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    response = session.post(f"{BASE_URL}/transactions/return/{transaction_id}", params=params, json=data, headers=headers)
+    if response.status_code == 201:
         print("Return processed successfully!")
     else:
         print(f"Error: {response.json().get('message', 'Unknown error')}")
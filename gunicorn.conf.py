@@ -0,0 +1,95 @@
+import os
+import signal
+import logging
+
+# The one way to run the API outside development:
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# Settings come from the WEB_* variables below; command-line flags such as
+# -w or -b still override them. The app is not preloaded: each worker calls
+# create_app() after the fork, so it gets its own pool, caches and background
+# threads, and SIGHUP starts workers on the new code. A worker warms up
+# before it accepts connections. The master never imports the application.
+
+server_config = {
+    'bind': os.environ.get('WEB_BIND', '0.0.0.0:8000'),
+    'workers': int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+    'threads': int(os.environ.get('WEB_THREADS', 8)),                     # requests served at once per worker
+    'db_connections': int(os.environ.get('WEB_DB_CONNECTIONS', 100)),     # primary connections across all workers
+    'keepalive': int(os.environ.get('WEB_KEEPALIVE', 5)),                 # idle seconds before a kept-alive connection closes
+    'warmup_timeout': float(os.environ.get('WEB_WARMUP_TIMEOUT', 30)),    # longest a worker waits for its caches
+    'ready_timeout': int(os.environ.get('WEB_READY_TIMEOUT', 120)),       # longest a new worker may take to become ready
+    'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),  # longest in-flight requests get to finish
+    'access_log': os.environ.get('WEB_ACCESS_LOG', '0') == '1'
+}
+
+wsgi_app = "app:create_app()"
+bind = [server_config['bind']]
+workers = server_config['workers']
+worker_class = "gthread"
+threads = server_config['threads']
+keepalive = server_config['keepalive']
+graceful_timeout = server_config['graceful_timeout']
+# A warming worker sends no heartbeat, so this also bounds the warm-up
+timeout = server_config['ready_timeout']
+backlog = 2048
+accesslog = "-" if server_config['access_log'] else None
+
+
+# Split the connection budget evenly between workers. A worker keeps up to
+# one idle connection per thread and overflows up to its share. While a
+# reload overlaps two generations, up to twice the budget can be open.
+def worker_pool_config(workers, threads, db_connections):
+    share = max(1, db_connections // workers)
+    pool_size = min(threads, share)
+    return {'pool_size': pool_size, 'max_overflow': share - pool_size}
+
+
+# An in-memory SQLite database lives inside one process, each worker would
+# serve its own empty copy. Read from the environment like utility.db, which
+# the master must not import.
+def memory_database():
+    return os.environ.get('DB_BACKEND', 'mysql') == 'sqlite' and os.environ.get('DB_SQLITE_PATH', 'inventory.db') == ':memory:'
+
+
+# Checked here rather than above so -w on the command line is covered too
+def on_starting(server):
+    if server.cfg.workers > 1 and memory_database():
+        raise RuntimeError("DB_SQLITE_PATH=:memory: needs 1 worker, every worker would have its own database")
+
+
+# Before the app is loaded: size this worker's share of the connection budget
+def post_fork(server, worker):
+    from utility.db import pool_config
+    pool_config.update(worker_pool_config(server.cfg.workers, server.cfg.threads, server_config['db_connections']))
+
+
+# After the app is loaded, before the first accept: warm the pool and caches
+def post_worker_init(worker):
+    from utility.db import pool_config
+    from utility.lifecycle import lifecycle, warm_up
+    try:
+        warm_up(server_config['warmup_timeout'])
+    except Exception as e:
+        # Serve cold rather than crash-loop, /ready reports the database state
+        logging.error("Worker warm-up failed, serving cold: %s", str(e), exc_info=True)
+        lifecycle.mark_warm()
+
+    # /ready reports draining as soon as the worker is told to stop
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        lifecycle.mark_draining()
+        stop(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+    logging.info("Worker %s serving with %s threads, pool %s", worker.pid, worker.cfg.threads, pool_config)
+
+
+# Close pooled connections and write out queued log records
+def worker_exit(server, worker):
+    from utility.db import get_pool
+    from utility.logs import stop_logging
+    get_pool().dispose()
+    stop_logging()
@@ -0,0 +1,279 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import datetime
+import importlib.util
+import mysql.connector
+from mysql.connector import errorcode
+from utility.db import db_config
+from utility.ledger import ensure_partitions, drop_partitions_before, list_partitions
+
+# Versioned schema migrations. Files in sql/migrations are named
+# <version>_<name>.sql or <version>_<name>.py and applied in version order;
+# applied versions are recorded in the schema_migrations table.
+#
+#   python migrate.py status
+#   python migrate.py up [--target VERSION] [--dry-run]
+#   python migrate.py stamp [--target VERSION]
+#   python migrate.py partitions [--ahead MONTHS] [--drop-before YYYY-MM]
+#
+# Applied migrations are checksummed, so a file is never edited once it has
+# shipped. Online DDL names ALGORITHM and LOCK, so it fails rather than
+# falling back to a locked table copy. 0008_row_versions predates that rule:
+# its ADD COLUMNs leave the choice to the server, which takes the least
+# locking algorithm it supports. Where Item or User is large, run up
+# --target 7, apply that file by hand with ALGORITHM=INPLACE, LOCK=NONE on
+# its ALTERs, then record it with stamp --target 8.
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'migrations')
+
+migration_config = {
+    # Seconds a DDL statement may wait for a metadata lock. Kept short so a
+    # long-running query holding the table does not make every later query
+    # queue up behind the waiting ALTER.
+    'lock_wait_timeout': int(os.environ.get('MIGRATION_LOCK_WAIT_TIMEOUT', 5)),
+    'lock_retries': int(os.environ.get('MIGRATION_LOCK_RETRIES', 5))
+}
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+_COMMENT = re.compile(r'^\s*--.*$', re.MULTILINE)
+_STATEMENT_END = re.compile(r';\s*$', re.MULTILINE)
+
+# Named lock so two deploys cannot apply migrations at the same time
+_RUNNER_LOCK = "inventory_schema_migrations"
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as f:
+            self.source = f.read()
+        self.checksum = hashlib.sha256(self.source).hexdigest()
+
+    @property
+    def kind(self):
+        return os.path.splitext(self.path)[1][1:]
+
+    def statements(self):
+        text = _COMMENT.sub('', self.source.decode('utf-8'))
+        return [statement.strip() for statement in _STATEMENT_END.split(text) if statement.strip()]
+
+
+def load_migrations(path=MIGRATIONS_PATH):
+    migrations = {}
+    for filename in sorted(os.listdir(path)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(path, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at DATETIME NOT NULL,
+            duration_ms INT NOT NULL
+        )
+    """)
+
+
+def applied_migrations(cur):
+    cur.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row[0]: row for row in cur.fetchall()}
+
+
+def record_migration(cur, migration, duration_ms):
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, checksum, applied_at, duration_ms) VALUES (%s, %s, %s, NOW(), %s)",
+        (migration.version, migration.name, migration.checksum, duration_ms)
+    )
+
+
+def _execute_ddl(cur, statement):
+    # A lock wait timeout leaves nothing applied, so the statement is retried
+    for attempt in range(migration_config['lock_retries'] + 1):
+        try:
+            cur.execute(statement)
+            return
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_LOCK_WAIT_TIMEOUT or attempt == migration_config['lock_retries']:
+                raise
+            delay = min(2 ** attempt, 30)
+            logging.warning("Metadata lock busy, retrying in %ss: %s", delay, statement.splitlines()[0])
+            time.sleep(delay)
+
+
+def apply_migration(conn, migration):
+    cur = conn.cursor()
+    try:
+        if migration.kind == 'sql':
+            for statement in migration.statements():
+                try:
+                    _execute_ddl(cur, statement)
+                except mysql.connector.Error as e:
+                    # DDL commits implicitly, earlier statements in this file stay applied
+                    raise MigrationError(f"Migration {migration.version} failed on: {statement}\n{e}") from e
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{migration.version}", migration.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            try:
+                module.upgrade(conn)
+            except Exception as e:
+                raise MigrationError(f"Migration {migration.version} failed: {e}") from e
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def connect():
+    conn = mysql.connector.connect(**db_config)
+    cur = conn.cursor()
+    cur.execute("SET SESSION lock_wait_timeout = %s", (migration_config['lock_wait_timeout'],))
+    cur.execute("SELECT GET_LOCK(%s, 0)", (_RUNNER_LOCK,))
+    if cur.fetchone()[0] != 1:
+        cur.close()
+        conn.close()
+        raise MigrationError("Another migration run holds the lock")
+    ensure_migrations_table(cur)
+    cur.close()
+    return conn
+
+
+def _pending(migrations, applied, target):
+    return [m for m in migrations if m.version not in applied and (target is None or m.version <= target)]
+
+
+def _check_checksums(migrations, applied):
+    for migration in migrations:
+        row = applied.get(migration.version)
+        if row is not None and row[2] != migration.checksum:
+            logging.warning("Migration %s (%s) was modified after it was applied", migration.version, migration.name)
+
+
+def command_status(conn, args):
+    migrations = load_migrations()
+    cur = conn.cursor()
+    applied = applied_migrations(cur)
+    cur.close()
+    _check_checksums(migrations, applied)
+    for migration in migrations:
+        row = applied.get(migration.version)
+        state = f"applied {row[3]}" if row else "pending"
+        print(f"{migration.version:04d} {migration.name:<40} {state}")
+    for version in sorted(set(applied) - {m.version for m in migrations}):
+        print(f"{version:04d} {applied[version][1]:<40} applied, file missing")
+
+
+def command_up(conn, args):
+    migrations = load_migrations()
+    cur = conn.cursor()
+    applied = applied_migrations(cur)
+    _check_checksums(migrations, applied)
+    pending = _pending(migrations, applied, args.target)
+    if not pending:
+        print("Schema is up to date")
+    for migration in pending:
+        if args.dry_run:
+            print(f"Would apply {migration.version:04d} {migration.name}")
+            if migration.kind == 'sql':
+                for statement in migration.statements():
+                    print(f"  {statement};")
+            continue
+        print(f"Applying {migration.version:04d} {migration.name}")
+        start = time.monotonic()
+        apply_migration(conn, migration)
+        duration_ms = int((time.monotonic() - start) * 1000)
+        record_migration(cur, migration, duration_ms)
+        conn.commit()
+        print(f"  done in {duration_ms}ms")
+    cur.close()
+
+
+# Mark migrations as applied without running them, for databases created
+# from sql/setup.sql, which already contains the latest schema
+def command_stamp(conn, args):
+    migrations = load_migrations()
+    cur = conn.cursor()
+    applied = applied_migrations(cur)
+    for migration in _pending(migrations, applied, args.target):
+        record_migration(cur, migration, 0)
+        print(f"Stamped {migration.version:04d} {migration.name}")
+    conn.commit()
+    cur.close()
+
+
+# Keep monthly Transaction partitions ahead of the calendar and drop months
+# that have been archived. Meant to run from cron.
+def command_partitions(conn, args):
+    cur = conn.cursor()
+    try:
+        for name in ensure_partitions(cur, args.ahead):
+            print(f"Added partition {name}")
+        if args.drop_before:
+            for name in drop_partitions_before(cur, args.drop_before):
+                print(f"Dropped partition {name}")
+        for name, bound, rows in list_partitions(cur):
+            print(f"{name:<12} < {bound or 'MAXVALUE'!s:<12} ~{rows} rows")
+    except mysql.connector.Error as e:
+        raise MigrationError(f"Error maintaining partitions: {e}") from e
+    finally:
+        cur.close()
+
+
+def _month(value):
+    return datetime.datetime.strptime(value, "%Y-%m").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="List migrations and whether they are applied")
+    up = commands.add_parser('up', help="Apply pending migrations")
+    up.add_argument('--target', type=int, help="Stop after this version")
+    up.add_argument('--dry-run', action='store_true', help="Print pending migrations without applying them")
+    stamp = commands.add_parser('stamp', help="Record migrations as applied without running them")
+    stamp.add_argument('--target', type=int, help="Stop after this version")
+    partitions = commands.add_parser('partitions', help="Add upcoming and drop archived Transaction partitions")
+    partitions.add_argument('--ahead', type=int, default=3, help="Months past the current one to cover")
+    partitions.add_argument('--drop-before', type=_month, help="Drop partitions ending on or before this month (YYYY-MM)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    handlers = {
+        'status': command_status, 'up': command_up, 'stamp': command_stamp, 'partitions': command_partitions
+    }
+    try:
+        conn = connect()
+    except (mysql.connector.Error, MigrationError) as e:
+        print(f"Error connecting to the database: {e}", file=sys.stderr)
+        return 1
+    try:
+        handlers[args.command](conn, args)
+    except MigrationError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
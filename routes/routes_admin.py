@@ -0,0 +1,104 @@
+import logging
+from flask import Blueprint, request, jsonify
+from utility.db import get_db_connection, get_pool_stats
+from utility.ledger import list_partitions
+from utility.cache import get_cache_stats
+from utility.barcode_index import barcode_map
+from utility.image_store import purge_unreferenced_images
+from utility.slow_query import slow_query_log
+from utility.statements import get_statement_stats
+from utility.search_index import item_search_index, rebuild_item_search_index
+
+admin_routes = Blueprint("admin_routes", __name__)
+
+# Connection pool statistics
+@admin_routes.route('/pool', methods=['GET'])
+def pool_stats():
+    stats = get_pool_stats()
+    logging.debug("Connection pool stats: %s", stats)
+    return jsonify(stats), 200
+
+
+# Item and user cache statistics
+@admin_routes.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({**get_cache_stats(), "barcode": barcode_map.stats()}), 200
+
+
+# Item search index statistics
+@admin_routes.route('/search-index', methods=['GET'])
+def search_index_stats():
+    return jsonify(item_search_index.stats()), 200
+
+
+# Rebuild the item search index from the database
+@admin_routes.route('/search-index/rebuild', methods=['POST'])
+def rebuild_search_index():
+    logging.info("Received request to rebuild item search index")
+    try:
+        rebuild_item_search_index()
+        return jsonify(item_search_index.stats()), 200
+    except Exception as e:
+        logging.error("Error rebuilding item search index: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+
+# Slowest statement shapes, ordered by total_time (default), max_time or count
+@admin_routes.route('/slow-queries', methods=['GET'])
+def slow_queries():
+    order = request.args.get('order', 'total_time')
+    if order not in ('total_time', 'max_time', 'count'):
+        return jsonify({"message": "Invalid order. Allowed values: total_time, max_time, count"}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+
+    return jsonify({
+        "threshold": slow_query_log.threshold,
+        "queries": slow_query_log.top(limit, order)
+    }), 200
+
+
+# Clear the slow query log
+@admin_routes.route('/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    slow_query_log.reset()
+    return jsonify({"message": "Slow query log cleared"}), 200
+
+
+# Registered statements with prepared statement cache hits and misses
+@admin_routes.route('/statements', methods=['GET'])
+def statement_stats():
+    return jsonify(get_statement_stats()), 200
+
+
+# Transaction ledger partitions with estimated row counts
+@admin_routes.route('/ledger/partitions', methods=['GET'])
+def ledger_partitions():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        partitions = [
+            {"name": name, "less_than": bound.isoformat() if bound else "MAXVALUE", "rows": rows}
+            for name, bound, rows in list_partitions(cur)
+        ]
+        return jsonify(partitions), 200
+    except Exception as e:
+        logging.error("Error listing ledger partitions: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Delete stored images no transaction references, ?dry_run=1 only counts them
+@admin_routes.route('/images/purge', methods=['POST'])
+def purge_images():
+    dry_run = request.args.get('dry_run') == '1'
+    logging.info("Received request to purge unreferenced images, dry run: %s", dry_run)
+    try:
+        return jsonify(purge_unreferenced_images(dry_run=dry_run)), 200
+    except Exception as e:
+        logging.error("Error purging unreferenced images: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
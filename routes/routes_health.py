@@ -0,0 +1,31 @@
+import logging
+from flask import Blueprint, jsonify
+from utility.db import get_db_connection
+from utility.lifecycle import lifecycle
+
+health_routes = Blueprint("health_routes", __name__)
+
+# Liveness: the process is up and serving requests
+@health_routes.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"}), 200
+
+
+# Readiness for the load balancer: warmed up, not draining, and the primary
+# database answers
+@health_routes.route('/ready', methods=['GET'])
+def ready():
+    state = lifecycle.state
+    if state != "ready":
+        return jsonify({"status": state}), 503
+
+    try:
+        conn = get_db_connection(read_only=False)
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+    except Exception as e:
+        logging.warning("Readiness check failed: %s", str(e))
+        return jsonify({"status": "database unavailable"}), 503
+    return jsonify({"status": state}), 200
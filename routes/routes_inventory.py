@@ -0,0 +1,29 @@
+import logging
+from flask import Blueprint, request, jsonify
+from validations.validate_export import validate_export_params
+from utility.export import stream_export
+
+inventory_routes = Blueprint("inventory_routes", __name__)
+
+# Export stock levels per item and warehouse as NDJSON or CSV
+@inventory_routes.route('/export', methods=['GET'])
+def export_inventory():
+    params = request.args.to_dict()
+    logging.info("Received request to export inventory with parameters: %s", params)
+
+    validation_result = validate_export_params(params)
+    if validation_result['error']:
+        logging.warning("Validation failed for export inventory: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    try:
+        query = """
+            SELECT item_sku, warehouse_id, item_quantity, opening_stock, case_quantity,
+                case_dimensions, case_weight, weight_uom
+            FROM In_Inventory
+            ORDER BY item_sku, warehouse_id
+        """
+        return stream_export(query, (), params.get('format', 'ndjson'), "inventory")
+    except Exception as e:
+        logging.error("Error exporting inventory: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
@@ -1,15 +1,43 @@
 import logging
 from flask import Blueprint, request, jsonify
-from validations.validate_item import validate_create_item, validate_update_item, validate_read_params, validate_delete_item
-from utility.db import get_db_connection
+from validations.validate_item import (
+    ITEM_FIELDS, validate_create_item, validate_update_item, validate_read_params, validate_delete_item,
+    validate_bulk_request, validate_bulk_update_item, validate_barcode_lookup
+)
+from validations.validate_export import validate_export_params
+from utility.db import get_backend, get_db_connection, recent_writer
+from utility.repository import ConflictError, NotFoundError, insert_row, update_row, delete_row, is_duplicate_key
+from utility.export import stream_export
+from utility.logs import log_payload
+from utility.cache import fold_key, item_cache
+from utility.barcode_index import barcode_map
+from utility.search_index import SEARCH_FIELDS, SEARCH_MAX_CANDIDATES, item_search_index
+from utility.statements import statement
+from utility.pagination import DEFAULT_PAGE_SIZE, decode_cursor, parse_fields, select_columns, page_format, page_response
+from utility.versions import (
+    VERSION_COLUMNS, VERSION_BUMP, bump_table_version, is_not_modified, list_etag, not_modified, row_etag, row_timestamp,
+    table_version
+)
 
 item_routes = Blueprint("item_routes", __name__)
 
+# Bulk endpoint limits
+BULK_MAX_ROWS = 50000
+BULK_CHUNK_SIZE = 1000
+
+# Most barcodes resolved by one batch lookup
+BARCODE_LOOKUP_MAX = 1000
+
+# Single item responses carry the row version their ETag is computed from
+ITEM_COLUMNS = ITEM_FIELDS + VERSION_COLUMNS
+ITEM_BY_SKU = statement("item_by_sku", f"SELECT {', '.join(ITEM_COLUMNS)} FROM Item WHERE item_sku = %s")
+
+
 # Create an item
 @item_routes.route('/', methods=['POST'])
 def create_item():
     data = request.json
-    logging.info("Received request to create item: %s", data)
+    log_payload("Received request to create item: %s", data)
 
     # Validate input
     validation_result = validate_create_item(data)
@@ -24,34 +52,21 @@ def create_item():
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the item already exists
-        check_query = "SELECT item_sku FROM Item WHERE item_sku = %s"
-        cur.execute(check_query, (data['item_sku'],))
-        if cur.fetchone():
-            logging.warning("Item already exists with SKU: %s", data['item_sku'])
-            return jsonify({"message": "Item already exists"}), 409
-
-        # Insert the new item
-        insert_query = """
-            INSERT INTO Item (
-                item_sku, item_name, item_uom, item_group, retail_price, purchase_price,
-                warranty_period, is_stock_item, brand, description, single_unit_dimensions,
-                single_unit_weight, weight_uom, country_of_origin, barcode, barcode_type
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """
-        cur.execute(insert_query, (
-            data['item_sku'], data['item_name'], data['item_uom'], data['item_group'], 
-            data['retail_price'], data['purchase_price'], data['warranty_period'], 
-            data['is_stock_item'], data['brand'], data['description'], 
-            data['single_unit_dimensions'], data['single_unit_weight'], 
-            data['weight_uom'], data['country_of_origin'], data['barcode'], data['barcode_type']
-        ))
+        # Insert the new item, a duplicate primary key means it already exists
+        insert_row(cur, "Item", {field: data[field] for field in ITEM_FIELDS})
         conn.commit()
+        item_cache.invalidate(data['item_sku'])
+        item_search_index.add(data['item_sku'], data)
+        barcode_map.put(data['item_sku'], data['barcode'])
         logging.info("Item created successfully: %s", data['item_sku'])
 
         return jsonify({"message": "Item created successfully"}), 201
+    except ConflictError as e:
+        if e.key == 'PRIMARY':
+            logging.warning("Item already exists with SKU: %s", data['item_sku'])
+            return jsonify({"message": "Item already exists"}), 409
+        logging.warning("Duplicate barcode for item with SKU: %s", data['item_sku'])
+        return jsonify({"message": "Barcode already in use"}), 409
     except Exception as e:
         logging.error("Error creating item: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -76,22 +91,61 @@ def read_items():
         conn = get_db_connection()
         cur = conn.cursor()
 
+        # A client holding the current list gets a 304 before the query runs
+        response_format = page_format(params)
+        version = table_version(cur, "Item")
+        etag = list_etag("Item", version, response_format) if version is not None else None
+        if etag and is_not_modified(etag):
+            return not_modified(etag, ("Accept", "Accept-Encoding"))
+
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        fields = parse_fields(params.get('fields')) or ITEM_FIELDS
+        columns = select_columns(fields, 'item_sku')
+
         # Base query
-        query = "SELECT * FROM Item WHERE 1=1"
+        query = f"SELECT {', '.join(columns)} FROM Item WHERE 1=1"
         query_params = []
 
-        if 'item_name' in params:
-            query += " AND item_name LIKE %s"
-            query_params.append(f"%{params['item_name']}%")
-        if 'item_group' in params:
-            query += " AND item_group LIKE %s"
-            query_params.append(f"%{params['item_group']}%")
-        if 'brand' in params:
-            query += " AND brand LIKE %s"
-            query_params.append(f"%{params['brand']}%")
-        if 'item_sku' in params:
-            query += " AND item_sku LIKE %s"
-            query_params.append(f"%{params['item_sku']}%")
+        # Substring matches by default. match=exact compares whole values,
+        # which the item_group and brand indexes and the primary key serve.
+        exact = params.get('match') == 'exact'
+        for field in SEARCH_FIELDS:
+            if field not in params:
+                continue
+            if exact:
+                query += f" AND {field} = %s"
+                query_params.append(params[field])
+            else:
+                query += f" AND {field} LIKE %s"
+                query_params.append(f"%{params[field]}%")
+
+        # Resolve substring terms to candidate SKUs with the n-gram index so
+        # MySQL does primary key lookups instead of a full table scan. The
+        # index is per process and only a hint: rows written since its
+        # snapshot, possibly by another worker, are read through the
+        # updated_at index as well, and the LIKE filters decide.
+        terms = {field: params[field] for field in SEARCH_FIELDS if field in params and not exact}
+        candidates = item_search_index.search(terms)
+        stale_after = item_search_index.stale_after()
+        ranked = None
+        if candidates is not None and stale_after is not None and len(candidates) <= SEARCH_MAX_CANDIDATES:
+            if candidates and params.get('sort') == 'relevance':
+                ranked = item_search_index.rank(candidates, terms)[:limit]
+                candidates = ranked
+            if candidates:
+                placeholders = ", ".join(["%s"] * len(candidates))
+                query += f" AND (item_sku IN ({placeholders}) OR updated_at >= %s)"
+                query_params.extend(candidates)
+            else:
+                query += " AND updated_at >= %s"
+            query_params.append(stale_after)
+
+        # Keyset pagination on the primary key, one extra row tells us if there is a next page
+        if 'after' in params:
+            query += " AND item_sku > %s"
+            query_params.append(decode_cursor(params['after']))
+        query += " ORDER BY item_sku LIMIT %s"
+        query_params.append(limit + 1)
 
         logging.debug("Executing query: %s with parameters: %s", query, query_params)
         cur.execute(query, query_params)
@@ -101,12 +155,19 @@ def read_items():
             logging.info("No items found for parameters: %s", params)
             return jsonify({"message": "No items found"}), 404
 
-        # Map results to a list of dictionaries
-        columns = [desc[0] for desc in cur.description]
-        result = [dict(zip(columns, item)) for item in items]
+        # Relevance results are the top matches only, in rank order
+        if ranked is not None:
+            key_index = columns.index('item_sku')
+            position = {sku: rank for rank, sku in enumerate(ranked)}
+            items = sorted(items, key=lambda item: position.get(item[key_index], len(position)))
+
+        # JSON objects, columnar JSON or CSV, compressed if the client accepts it
+        response, count = page_response(items, columns, fields, 'item_sku', limit, response_format)
+        if etag:
+            response.set_etag(etag)
 
-        logging.info("Items retrieved successfully. Count: %d", len(result))
-        return jsonify(result), 200
+        logging.info("Items retrieved successfully. Count: %d", count)
+        return response, 200
     except Exception as e:
         logging.error("Error reading items: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -115,40 +176,175 @@ def read_items():
         conn.close()
 
 
+# Export all items as NDJSON or CSV
+@item_routes.route('/export', methods=['GET'])
+def export_items():
+    params = request.args.to_dict()
+    logging.info("Received request to export items with parameters: %s", params)
+
+    validation_result = validate_export_params(params)
+    if validation_result['error']:
+        logging.warning("Validation failed for export items: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    try:
+        query = f"SELECT {', '.join(ITEM_FIELDS)} FROM Item ORDER BY item_sku"
+        return stream_export(query, (), params.get('format', 'ndjson'), "items")
+    except Exception as e:
+        logging.error("Error exporting items: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+
+# Cache fills read the primary
+def _load_item(item_sku):
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(ITEM_BY_SKU, (item_sku,))
+        item = cur.fetchone()
+        return dict(zip(ITEM_COLUMNS, item)) if item else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Strong ETag from the row version, a matching If-None-Match gets a 304
+# without serializing the item
+def _item_response(item):
+    etag = row_etag(item)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    response = jsonify(item)
+    response.set_etag(etag)
+    return response, 200
+
+
+# Read a single item, served from the item cache when possible
+@item_routes.route('/<item_sku>', methods=['GET'])
+def read_item(item_sku):
+    logging.info("Received request to read item with SKU: %s", item_sku)
+
+    try:
+        item = item_cache.get_or_load(item_sku, lambda: _load_item(item_sku), fresh=recent_writer())
+        if item is None:
+            logging.warning("Item not found with SKU: %s", item_sku)
+            return jsonify({"message": "Item not found"}), 404
+
+        return _item_response(item)
+    except Exception as e:
+        logging.error("Error reading item with SKU: %s, Error: %s", item_sku, str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+
+# Load items by barcode in one query using the unique barcode index
+def _load_items_by_barcode(barcodes):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(barcodes))
+        cur.execute(f"SELECT {', '.join(ITEM_COLUMNS)} FROM Item WHERE barcode IN ({placeholders})", list(barcodes))
+        items = [dict(zip(ITEM_COLUMNS, item)) for item in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+    for item in items:
+        barcode_map.put(item['item_sku'], item['barcode'])
+    return {item['barcode']: item for item in items}
+
+
+# Resolve barcodes through the in-memory map and the item cache, hitting the
+# database only for barcodes the map does not know or got wrong
+def _lookup_barcodes(barcodes):
+    found = {}
+    missing = []
+    for barcode in barcodes:
+        item_sku = barcode_map.get(barcode)
+        item = item_cache.get_or_load(item_sku, lambda: _load_item(item_sku), fresh=recent_writer()) if item_sku else None
+        if item is not None and item['barcode'] == barcode:
+            found[barcode] = item
+        else:
+            missing.append(barcode)
+
+    if missing:
+        found.update(_load_items_by_barcode(missing))
+    return found
+
+
+# Look up an item by barcode
+@item_routes.route('/barcode/<barcode>', methods=['GET'])
+def read_item_by_barcode(barcode):
+    logging.info("Received request to read item with barcode: %s", barcode)
+
+    try:
+        item = _lookup_barcodes([barcode]).get(barcode)
+        if item is None:
+            logging.warning("Item not found with barcode: %s", barcode)
+            return jsonify({"message": "Item not found"}), 404
+
+        return _item_response(item)
+    except Exception as e:
+        logging.error("Error reading item with barcode: %s, Error: %s", barcode, str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+
+# Look up many barcodes at once, unknown barcodes map to null
+@item_routes.route('/barcode/lookup', methods=['POST'])
+def lookup_barcodes():
+    data = request.json
+    logging.info("Received request to look up barcodes")
+
+    validation_result = validate_barcode_lookup(data, BARCODE_LOOKUP_MAX)
+    if validation_result['error']:
+        logging.warning("Validation failed for barcode lookup: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    try:
+        barcodes = list(dict.fromkeys(data['barcodes']))
+        found = _lookup_barcodes(barcodes)
+
+        logging.info("Barcode lookup finished. Requested: %d, Found: %d", len(barcodes), len(found))
+        return jsonify({barcode: found.get(barcode) for barcode in barcodes}), 200
+    except Exception as e:
+        logging.error("Error looking up barcodes: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+
 # Update an item
 @item_routes.route('/<item_sku>', methods=['PUT'])
 def update_item(item_sku):
     data = request.json
-    logging.info("Received request to update item with SKU: %s, Data: %s", item_sku, data)
+    log_payload("Received request to update item with SKU: %s, Data: %s", item_sku, data)
 
     # Validate input
     validation_result = validate_update_item(data)
     if validation_result['error']:
         logging.warning("Validation failed for updating item with SKU: %s, Error: %s", item_sku, validation_result)
-        return jsonify({"message": validation_result['message']}), 400
+        return jsonify({
+            "message": validation_result['message'],
+            "fields": validation_result.get('fields')
+        }), 400
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the item exists
-        check_query = "SELECT item_sku FROM Item WHERE item_sku = %s"
-        cur.execute(check_query, (item_sku,))
-        if not cur.fetchone():
-            logging.warning("Item not found with SKU: %s", item_sku)
-            return jsonify({"message": "Item not found"}), 404
-
-        # Build the update query dynamically
-        update_fields = ", ".join([f"{field} = %s" for field in data.keys()])
-        update_values = list(data.values()) + [item_sku]
-
-        update_query = f"UPDATE Item SET {update_fields} WHERE item_sku = %s"
-        logging.debug("Executing update query: %s with values: %s", update_query, update_values)
-        cur.execute(update_query, update_values)
+        # Update in one statement, no matched row means the item does not exist
+        logging.debug("Updating item with SKU: %s, values: %s", item_sku, data)
+        update_row(cur, "Item", {"item_sku": item_sku}, data)
         conn.commit()
+        item_cache.invalidate(item_sku)
+        item_search_index.update(item_sku, data)
+        barcode_map.update(item_sku, data)
 
         logging.info("Item updated successfully with SKU: %s", item_sku)
         return jsonify({"message": "Item updated successfully"}), 200
+    except NotFoundError:
+        logging.warning("Item not found with SKU: %s", item_sku)
+        return jsonify({"message": "Item not found"}), 404
+    except ConflictError:
+        logging.warning("Duplicate key updating item with SKU: %s", item_sku)
+        return jsonify({"message": "Item SKU or barcode already in use"}), 409
     except Exception as e:
         logging.error("Error updating item with SKU: %s, Error: %s", item_sku, str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -171,24 +367,315 @@ def delete_item(item_sku):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the item exists
-        check_query = "SELECT item_sku FROM Item WHERE item_sku = %s"
-        cur.execute(check_query, (item_sku,))
-        if not cur.fetchone():
-            logging.warning("Item not found with SKU: %s", item_sku)
-            return jsonify({"message": "Item not found"}), 404
-
-        # Delete the item
-        delete_query = "DELETE FROM Item WHERE item_sku = %s"
-        logging.debug("Executing delete query: %s with SKU: %s", delete_query, item_sku)
-        cur.execute(delete_query, (item_sku,))
+        # Delete in one statement, no matched row means the item does not exist
+        logging.debug("Deleting item with SKU: %s", item_sku)
+        delete_row(cur, "Item", {"item_sku": item_sku})
         conn.commit()
+        item_cache.invalidate(item_sku)
+        item_search_index.remove(item_sku)
+        barcode_map.remove(item_sku)
 
         logging.info("Item deleted successfully with SKU: %s", item_sku)
         return jsonify({"message": "Item deleted successfully"}), 200
+    except NotFoundError:
+        logging.warning("Item not found with SKU: %s", item_sku)
+        return jsonify({"message": "Item not found"}), 404
     except Exception as e:
         logging.error("Error deleting item with SKU: %s, Error: %s", item_sku, str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
     finally:
         cur.close()
         conn.close()
+
+
+# Split a list into chunks of at most BULK_CHUNK_SIZE
+def _chunks(rows, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+# SKUs from the given list that already exist, in one round trip. Keyed by
+# folded SKU, since the column collation matches "abc" to a stored "ABC",
+# with the SKU as stored.
+def _existing_skus(cur, skus):
+    if not skus:
+        return {}
+    placeholders = ", ".join(["%s"] * len(skus))
+    cur.execute(f"SELECT item_sku FROM Item WHERE item_sku IN ({placeholders})", list(skus))
+    return {fold_key(row[0]): row[0] for row in cur.fetchall()}
+
+
+# Current owner SKU of each given barcode, locked until commit. On MySQL the
+# locking read also takes gap locks on barcodes nobody owns yet, so a
+# concurrent insert cannot claim one between this check and the write.
+def _barcode_owners(cur, barcodes):
+    if not barcodes:
+        return {}
+    placeholders = ", ".join(["%s"] * len(barcodes))
+    cur.execute(f"SELECT barcode, item_sku FROM Item WHERE barcode IN ({placeholders}) FOR UPDATE", list(barcodes))
+    return {fold_key(barcode): fold_key(item_sku) for barcode, item_sku in cur.fetchall()}
+
+
+def _row_result(index, item_sku, status, message):
+    return {"index": index, "item_sku": item_sku, "status": status, "message": message}
+
+
+def _bulk_response(results):
+    succeeded = sum(1 for result in results if result['status'] < 300)
+    return jsonify({
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }), 200
+
+
+# Create items in bulk
+# ?mode=upsert updates rows whose SKU already exists instead of rejecting them
+@item_routes.route('/bulk', methods=['POST'])
+def create_items_bulk():
+    data = request.json
+    mode = request.args.get('mode', 'insert')
+    logging.info("Received request to bulk create items, mode: %s", mode)
+
+    if mode not in ('insert', 'upsert'):
+        return jsonify({"message": "Invalid mode. Allowed values: insert, upsert"}), 400
+
+    validation_result = validate_bulk_request(data, BULK_MAX_ROWS)
+    if validation_result['error']:
+        logging.warning("Validation failed for bulk create items: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    # Validate every row up front, only valid rows go to the database
+    results = [None] * len(data)
+    valid = []
+    for index, row in enumerate(data):
+        row_validation = validate_create_item(row) if isinstance(row, dict) else {"error": True, "message": "Row must be an object"}
+        if row_validation['error']:
+            results[index] = _row_result(index, row.get('item_sku') if isinstance(row, dict) else None, 400, row_validation['message'])
+        else:
+            valid.append((index, row))
+
+    insert_columns = ITEM_FIELDS + ["updated_at"]
+    row_placeholder = "(" + ", ".join(["%s"] * len(insert_columns)) + ")"
+    upsert_clause = get_backend().upsert_clause(['item_sku'], [field for field in ITEM_FIELDS if field != 'item_sku'])
+    upsert_clause += ", " + VERSION_BUMP
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        # Folded SKU -> SKU as stored, for rows written earlier in this request
+        seen = {}
+        written = []
+        # Folded barcode -> folded owner SKU. A row whose barcode belongs to
+        # another item gets its own 409 rather than failing the whole batch.
+        # In upsert mode this also keeps MySQL's ON DUPLICATE KEY UPDATE,
+        # which fires on any unique key, from overwriting that item, so the
+        # upsert only ever updates by item_sku, as on SQLite.
+        barcode_owners = {}
+        for chunk in _chunks(valid):
+            existing = _existing_skus(cur, {row['item_sku'] for _, row in chunk})
+            for barcode, owner in _barcode_owners(cur, {row['barcode'] for _, row in chunk}).items():
+                barcode_owners.setdefault(barcode, owner)
+            to_write = []
+            for index, row in chunk:
+                sku = row['item_sku']
+                key = fold_key(sku)
+                stored = existing.get(key) or seen.get(key)
+                if stored is not None and mode == 'insert':
+                    results[index] = _row_result(index, sku, 409, "Item already exists")
+                    continue
+                if barcode_owners.setdefault(fold_key(row['barcode']), key) != key:
+                    results[index] = _row_result(index, sku, 409, "Barcode already in use")
+                    continue
+                if stored is not None:
+                    # The update keeps the SKU as stored
+                    row = {**row, 'item_sku': stored}
+                    results[index] = _row_result(index, sku, 200, "Item updated")
+                else:
+                    results[index] = _row_result(index, sku, 201, "Item created")
+                seen[key] = row['item_sku']
+                to_write.append(row)
+            written.extend(to_write)
+
+            if not to_write:
+                continue
+
+            now = row_timestamp()
+            query = f"INSERT INTO Item ({', '.join(insert_columns)}) VALUES " + ", ".join([row_placeholder] * len(to_write))
+            query_params = [value for row in to_write for value in [row[field] for field in ITEM_FIELDS] + [now]]
+            if mode == 'upsert':
+                query += upsert_clause
+                query_params.append(now)
+            cur.execute(query, query_params)
+
+        # All chunks land in a single transaction
+        if written:
+            bump_table_version(cur, "Item")
+        conn.commit()
+        for row in written:
+            item_cache.invalidate(row['item_sku'])
+            item_search_index.add(row['item_sku'], row)
+            barcode_map.put(row['item_sku'], row['barcode'])
+
+        logging.info("Bulk create items finished. Rows: %d, Written: %d", len(data), len(seen))
+        return _bulk_response(results)
+    except Exception as e:
+        conn.rollback()
+        # Only a concurrent writer claiming a SKU or barcode first gets here
+        if is_duplicate_key(e):
+            logging.warning("Duplicate key in bulk create items: %s", str(e))
+            return jsonify({"message": "Item SKU or barcode already in use, no rows were written"}), 409
+        logging.error("Error bulk creating items: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Update items in bulk
+# Each row holds item_sku plus the fields to change
+@item_routes.route('/bulk', methods=['PATCH'])
+def update_items_bulk():
+    data = request.json
+    logging.info("Received request to bulk update items")
+
+    validation_result = validate_bulk_request(data, BULK_MAX_ROWS)
+    if validation_result['error']:
+        logging.warning("Validation failed for bulk update items: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    results = [None] * len(data)
+    valid = []
+    for index, row in enumerate(data):
+        row_validation = validate_bulk_update_item(row)
+        if row_validation['error']:
+            results[index] = _row_result(index, row.get('item_sku') if isinstance(row, dict) else None, 400, row_validation['message'])
+        else:
+            valid.append((index, row))
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        updated = []
+        for chunk in _chunks(valid):
+            existing = _existing_skus(cur, {row['item_sku'] for _, row in chunk})
+
+            # Later rows for the same SKU override earlier ones
+            changes = {}
+            for index, row in chunk:
+                sku = row['item_sku']
+                stored = existing.get(fold_key(sku))
+                if stored is None:
+                    results[index] = _row_result(index, sku, 404, "Item not found")
+                    continue
+                changes.setdefault(stored, {}).update((field, value) for field, value in row.items() if field != 'item_sku')
+                results[index] = _row_result(index, sku, 200, "Item updated")
+
+            if not changes:
+                continue
+
+            # One CASE expression per column, so the whole chunk is a single UPDATE
+            set_clauses = []
+            update_values = []
+            for field in sorted({field for fields in changes.values() for field in fields}):
+                rows_with_field = [(sku, fields[field]) for sku, fields in changes.items() if field in fields]
+                set_clauses.append(
+                    f"{field} = CASE item_sku " + " ".join(["WHEN %s THEN %s"] * len(rows_with_field)) + f" ELSE {field} END"
+                )
+                for sku, value in rows_with_field:
+                    update_values.extend([sku, value])
+
+            set_clauses.append(VERSION_BUMP)
+            update_values.append(row_timestamp())
+
+            placeholders = ", ".join(["%s"] * len(changes))
+            update_query = f"UPDATE Item SET {', '.join(set_clauses)} WHERE item_sku IN ({placeholders})"
+            cur.execute(update_query, update_values + list(changes.keys()))
+            updated.extend(changes.items())
+
+        if updated:
+            bump_table_version(cur, "Item")
+        conn.commit()
+        for sku, fields in updated:
+            item_cache.invalidate(sku)
+            item_search_index.update(sku, fields)
+            barcode_map.update(sku, fields)
+
+        logging.info("Bulk update items finished. Rows: %d, Updated: %d", len(data), len(updated))
+        return _bulk_response(results)
+    except Exception as e:
+        conn.rollback()
+        if is_duplicate_key(e):
+            logging.warning("Duplicate key in bulk update items: %s", str(e))
+            return jsonify({"message": "Item SKU or barcode already in use, no rows were written"}), 409
+        logging.error("Error bulk updating items: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Delete items in bulk
+# Body is a list of item SKUs
+@item_routes.route('/bulk', methods=['DELETE'])
+def delete_items_bulk():
+    data = request.json
+    logging.info("Received request to bulk delete items")
+
+    validation_result = validate_bulk_request(data, BULK_MAX_ROWS)
+    if validation_result['error']:
+        logging.warning("Validation failed for bulk delete items: %s", validation_result)
+        return jsonify({"message": validation_result['message']}), 400
+
+    results = [None] * len(data)
+    valid = []
+    for index, item_sku in enumerate(data):
+        row_validation = validate_delete_item(item_sku) if isinstance(item_sku, str) else {"error": True, "message": "Item SKU is required"}
+        if row_validation['error']:
+            results[index] = _row_result(index, None, 400, row_validation['message'])
+        else:
+            valid.append((index, item_sku))
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        deleted = []
+        for chunk in _chunks(valid):
+            existing = _existing_skus(cur, {item_sku for _, item_sku in chunk})
+            to_delete = set()
+            for index, item_sku in chunk:
+                stored = existing.get(fold_key(item_sku))
+                if stored is not None:
+                    to_delete.add(stored)
+                    results[index] = _row_result(index, item_sku, 200, "Item deleted")
+                else:
+                    results[index] = _row_result(index, item_sku, 404, "Item not found")
+
+            if not to_delete:
+                continue
+
+            placeholders = ", ".join(["%s"] * len(to_delete))
+            cur.execute(f"DELETE FROM Item WHERE item_sku IN ({placeholders})", list(to_delete))
+            deleted.extend(to_delete)
+
+        if deleted:
+            bump_table_version(cur, "Item")
+        conn.commit()
+        for item_sku in deleted:
+            item_cache.invalidate(item_sku)
+            item_search_index.remove(item_sku)
+            barcode_map.remove(item_sku)
+
+        logging.info("Bulk delete items finished. Rows: %d, Deleted: %d", len(data), len(deleted))
+        return _bulk_response(results)
+    except Exception as e:
+        conn.rollback()
+        logging.error("Error bulk deleting items: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+    finally:
+        cur.close()
+        conn.close()
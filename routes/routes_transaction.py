@@ -1,9 +1,232 @@
-from flask import Blueprint, request, jsonify
-from validations.validate_transaction import validate_purchase, validate_update_purchase, validate_return
-from utility.db import get_db_connection
+import logging
+import datetime
+from flask import Blueprint, request, jsonify, send_file
+from validations.validate_transaction import validate_purchase, validate_update_purchase, validate_return, validate_ledger_params, validate_idempotency_key
+from validations.validate_export import validate_export_params
+from utility.db import get_backend, get_db_connection
+from utility.repository import NotFoundError, update_row
+from utility.export import stream_export
+from utility.cache import fold_key
+from utility.group_commit import WriterBusyError, WriterTimeoutError, create_writer, group_commit_config
+from utility.idempotency import (
+    IDEMPOTENCY_HEADER, IdempotencyConflictError, claim_key, release_key, request_fingerprint, save_response
+)
+from utility.statements import dynamic_statement, statement
+from utility.image_store import (
+    IMAGE_MAX_BYTES, IMAGE_MIMETYPES, ImageTooLargeError, UnsupportedImageError, claim_image, image_exists, image_mimetype,
+    image_path, save_image
+)
 
 transaction_routes = Blueprint("transaction_routes", __name__)
 
+RESERVE_STOCK = statement("reserve_stock", """
+    UPDATE In_Inventory
+    SET item_quantity = item_quantity - %s
+    WHERE item_sku = %s AND warehouse_id = %s AND item_quantity >= %s
+""")
+RESTOCK = statement("restock", """
+    UPDATE In_Inventory
+    SET item_quantity = item_quantity + %s
+    WHERE item_sku = %s AND warehouse_id = %s
+""")
+STOCK_LEVEL = statement(
+    "stock_level", "SELECT item_quantity FROM In_Inventory WHERE item_sku = %s AND warehouse_id = %s"
+)
+# Selecting through Customer makes an unknown customer insert nothing, the
+# partitioned ledger has no foreign keys
+INSERT_PURCHASE = statement("insert_purchase", """
+    INSERT INTO Transaction (
+        transaction_type, item_sku, warehouse_id, customer_id, date, sales_uom, transaction_quantity,
+        shipping_address, shipping_city, shipping_state, shipping_zipcode,
+        shipping_country, transaction_image, transaction_barcode, transaction_weight, tracking_information
+    )
+    SELECT 'purchase', %s, %s, customer_id, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    FROM Customer WHERE customer_id = %s
+""")
+RETURNED_QUANTITY = statement("returned_quantity", """
+    SELECT COALESCE(SUM(transaction_quantity), 0) FROM Transaction
+    WHERE parent_transaction_id = %s AND date >= %s
+""")
+INSERT_RETURN = statement("insert_return", """
+    INSERT INTO Transaction (
+        transaction_type, parent_transaction_id, item_sku, warehouse_id, customer_id,
+        date, sales_uom, transaction_quantity
+    ) VALUES ('return', %s, %s, %s, %s, %s, %s, %s)
+""")
+
+
+# Take stock out of a warehouse with one conditional statement, so concurrent
+# purchases can never drive item_quantity below zero
+def _reserve_stock(cur, item_sku, warehouse_id, quantity):
+    cur.execute(RESERVE_STOCK, (quantity, item_sku, warehouse_id, quantity))
+    return cur.rowcount == 1
+
+
+def _restock(cur, item_sku, warehouse_id, quantity):
+    cur.execute(RESTOCK, (quantity, item_sku, warehouse_id))
+    return cur.rowcount == 1
+
+
+# Only runs after a failed reservation, to tell a missing inventory row
+# apart from insufficient stock
+def _stock_failure(cur, item_sku, warehouse_id):
+    cur.execute(STOCK_LEVEL, (item_sku, warehouse_id))
+    if not cur.fetchone():
+        return {"message": "Item is not stocked in this warehouse"}, 404
+    return {"message": "Insufficient stock"}, 409
+
+
+def _stock_error(cur, item_sku, warehouse_id):
+    body, status = _stock_failure(cur, item_sku, warehouse_id)
+    return jsonify(body), status
+
+
+# Idempotency-Key of the current request with the fingerprint it is stored under
+def _idempotency(data):
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    return key, request_fingerprint(request.path, request.args.to_dict(), data)
+
+
+def _replay(stored):
+    body, status = stored
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+PURCHASE_COLUMNS = [
+    "item_sku", "warehouse_id", "customer_id", "date", "sales_uom", "transaction_quantity",
+    "shipping_address", "shipping_city", "shipping_state", "shipping_zipcode",
+    "shipping_country", "transaction_image", "transaction_barcode", "transaction_weight", "tracking_information"
+]
+
+
+# Group commit batch writer: one transaction and one commit for many
+# purchases. Items are (data, idempotency) pairs; runs on the writer thread
+# and returns (body, status, replayed) per purchase.
+def _write_purchases(items):
+    results = [None] * len(items)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # Claim idempotency keys first, duplicates are answered from the stored
+        # response. A key repeated within the batch shares the first one's result.
+        purchases = []
+        claimed = {}
+        repeats = {}
+        for i, (data, idempotency) in enumerate(items):
+            if idempotency is not None:
+                if idempotency[0] in claimed:
+                    repeats[i] = claimed[idempotency[0]]
+                    continue
+                try:
+                    stored = claim_key(cur, "purchase", *idempotency)
+                except IdempotencyConflictError as e:
+                    results[i] = ({"message": str(e)}, 422, False)
+                    continue
+                if stored is not None:
+                    results[i] = (*stored, True)
+                    continue
+                claimed[idempotency[0]] = i
+            purchases.append(i)
+        if not purchases:
+            conn.rollback()
+            return results
+
+        # Resolve every customer in one query, the ledger has no foreign keys
+        customer_ids = list({fold_key(items[i][0]['customer_id']): items[i][0]['customer_id'] for i in purchases}.values())
+        cur.execute(
+            f"SELECT customer_id FROM Customer WHERE customer_id IN ({', '.join(['%s'] * len(customer_ids))})",
+            customer_ids
+        )
+        customers = {fold_key(row[0]): row[0] for row in cur.fetchall()}
+
+        # Reserve in inventory key order so concurrent batches from other
+        # processes lock rows in the same order and cannot deadlock
+        order = sorted(purchases, key=lambda i: (
+            fold_key(items[i][0]['item_sku']), fold_key(items[i][0]['warehouse_id'])
+        ))
+        reserved = []
+        for i in order:
+            data = items[i][0]
+            if fold_key(data['customer_id']) not in customers:
+                results[i] = ({"message": "Customer not found"}, 404, False)
+            elif _reserve_stock(cur, data['item_sku'], data['warehouse_id'], data['transaction_quantity']):
+                reserved.append(i)
+            else:
+                results[i] = (*_stock_failure(cur, data['item_sku'], data['warehouse_id']), False)
+
+        if reserved:
+            reserved.sort()
+            rows = []
+            for i in reserved:
+                data = {**items[i][0], 'customer_id': customers[fold_key(items[i][0]['customer_id'])]}
+                rows.extend(data.get(column) for column in PURCHASE_COLUMNS)
+            placeholders = "('purchase', " + ", ".join(["%s"] * len(PURCHASE_COLUMNS)) + ")"
+            cur.execute(f"""
+                INSERT INTO Transaction (transaction_type, {', '.join(PURCHASE_COLUMNS)})
+                VALUES {', '.join([placeholders] * len(reserved))}
+            """, rows)
+            # A multi-row INSERT takes consecutive auto-increment values
+            first_id = get_backend().first_insert_id(cur, len(reserved))
+            for offset, i in enumerate(reserved):
+                body = {
+                    "message": "Transaction created successfully",
+                    "transaction_id": first_id + offset,
+                    "date": items[i][0]['date']
+                }
+                if items[i][1] is not None:
+                    save_response(cur, "purchase", items[i][1][0], body, 201)
+                results[i] = (body, 201, False)
+
+        # Failed purchases give their keys back so a retry runs again
+        for key, i in claimed.items():
+            if results[i][1] != 201:
+                release_key(cur, "purchase", key)
+
+        conn.commit()
+
+        for i, first in repeats.items():
+            body, status, _ = results[first]
+            if items[i][1][1] != items[first][1][1]:
+                results[i] = ({"message": "Idempotency-Key was already used for a different request"}, 422, False)
+            else:
+                results[i] = (body, status, status == 201)
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Opt-in with PURCHASE_GROUP_COMMIT=1
+purchase_writer = create_writer("purchase", _write_purchases) if group_commit_config['enabled'] else None
+
+# Ledger row addressed by ID. The optional purchase date narrows the lookup
+# to one partition, without it every partition's primary key is probed.
+def _ledger_key(transaction_id, params):
+    key = {"transaction_id": transaction_id, "transaction_type": "purchase"}
+    if params.get('date'):
+        key["date"] = params['date']
+    return key
+
+
+# Locking read of a purchase, one prepared statement per key shape
+def _purchase_for_update(key):
+    def build():
+        where_clause = " AND ".join(f"{column} = %s" for column in key)
+        return f"""
+            SELECT item_sku, warehouse_id, customer_id, date, sales_uom, transaction_quantity
+            FROM Transaction WHERE {where_clause}
+            FOR UPDATE
+        """
+    return dynamic_statement(f"purchase_for_update:{','.join(key)}", build)
+
 # Purchase Route
 @transaction_routes.route('/purchase', methods=['POST'])
 def purchase():
@@ -13,122 +236,267 @@ def purchase():
     validation_result = validate_purchase(data)
     if validation_result['error']:
         return jsonify({"message": validation_result['message']}), 400
+    validation_result = validate_idempotency_key(request.headers.get(IDEMPOTENCY_HEADER))
+    if validation_result['error']:
+        return jsonify({"message": validation_result['message']}), 400
+    if data.get('transaction_image') and not claim_image(data['transaction_image']):
+        return jsonify({"message": "Transaction image not found"}), 400
+    idempotency = _idempotency(data)
+
+    # Group commit: acknowledged once the batch holding this purchase commits
+    if purchase_writer is not None:
+        try:
+            body, status, replayed = purchase_writer.submit((data, idempotency))
+            if replayed:
+                return _replay((body, status))
+            return jsonify(body), status
+        except WriterBusyError:
+            return jsonify({"message": "Too many pending purchases, retry later"}), 503
+        except WriterTimeoutError as e:
+            logging.error("Group commit purchase timed out: %s", str(e))
+            return jsonify({"message": "Purchase outcome unknown, retry with the same Idempotency-Key"}), 503
+        except Exception as e:
+            logging.error("Error creating transaction: %s", str(e), exc_info=True)
+            return jsonify({"message": "Internal Server Error"}), 500
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Insert the new transaction
-        insert_query = """
-            INSERT INTO Transaction (
-                item_sku, warehouse_id, customer_id, date, sales_uom, transaction_quantity,
-                shipping_address, shipping_city, shipping_state, shipping_zipcode,
-                shipping_country, transaction_image, transaction_barcode, transaction_weight, tracking_information
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """
-        cur.execute(insert_query, (
-            data['item_sku'], data['warehouse_id'], data['customer_id'], data['date'],
+        # A retried request gets the stored response and writes nothing
+        if idempotency is not None:
+            stored = claim_key(cur, "purchase", *idempotency)
+            if stored is not None:
+                conn.rollback()
+                return _replay(stored)
+
+        # Append the purchase to the ledger
+        cur.execute(INSERT_PURCHASE, (
+            data['item_sku'], data['warehouse_id'], data['date'],
             data['sales_uom'], data['transaction_quantity'], data['shipping_address'],
             data['shipping_city'], data['shipping_state'], data['shipping_zipcode'],
             data['shipping_country'], data.get('transaction_image'), data.get('transaction_barcode'),
-            data.get('transaction_weight'), data.get('tracking_information')
+            data.get('transaction_weight'), data.get('tracking_information'), data['customer_id']
         ))
+        if cur.rowcount == 0:
+            conn.rollback()
+            return jsonify({"message": "Customer not found"}), 404
+        transaction_id = cur.lastrowid
+
+        # Reserve stock last so the hot inventory row stays locked only until
+        # commit. A missing inventory row also covers unknown items and warehouses.
+        if not _reserve_stock(cur, data['item_sku'], data['warehouse_id'], data['transaction_quantity']):
+            conn.rollback()
+            return _stock_error(cur, data['item_sku'], data['warehouse_id'])
+
+        body = {"message": "Transaction created successfully", "transaction_id": transaction_id, "date": data['date']}
+        if idempotency is not None:
+            save_response(cur, "purchase", idempotency[0], body, 201)
+
         conn.commit()
 
-        return jsonify({"message": "Transaction created successfully"}), 201
+        return jsonify(body), 201
+    except IdempotencyConflictError as e:
+        conn.rollback()
+        return jsonify({"message": str(e)}), 422
     except Exception as e:
-        print(f"Error creating transaction: {e}")
+        conn.rollback()
+        logging.error("Error creating transaction: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
     finally:
         cur.close()
         conn.close()
 
 # Update Purchase Route
-@transaction_routes.route('/purchase/<item_sku>/<warehouse_id>/<customer_id>', methods=['PUT'])
-def update_purchase(item_sku, warehouse_id, customer_id):
+# Only shipping and tracking details change, quantities are corrected by
+# recording a return or another purchase
+@transaction_routes.route('/purchase/<int:transaction_id>', methods=['PUT'])
+def update_purchase(transaction_id):
     data = request.json
+    params = request.args.to_dict()
 
     # Validate input
+    validation_result = validate_ledger_params(params)
+    if validation_result['error']:
+        return jsonify({"message": validation_result['message']}), 400
     validation_result = validate_update_purchase(data)
     if validation_result['error']:
         return jsonify({"message": validation_result['message']}), 400
+    if data.get('transaction_image') and not claim_image(data['transaction_image']):
+        return jsonify({"message": "Transaction image not found"}), 400
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the transaction exists
-        check_query = """
-            SELECT * FROM Transaction 
-            WHERE item_sku = %s AND warehouse_id = %s AND customer_id = %s
-        """
-        cur.execute(check_query, (item_sku, warehouse_id, customer_id))
-        if not cur.fetchone():
-            return jsonify({"message": "Transaction not found"}), 404
+        # Update in one statement, no matched row means the transaction does not exist
+        update_row(cur, "Transaction", _ledger_key(transaction_id, params), data)
 
-        # Build the update query dynamically
-        update_fields = ", ".join([f"{key} = %s" for key in data.keys()])
-        update_query = f"""
-            UPDATE Transaction
-            SET {update_fields}
-            WHERE item_sku = %s AND warehouse_id = %s AND customer_id = %s
-        """
-        cur.execute(update_query, list(data.values()) + [item_sku, warehouse_id, customer_id])
         conn.commit()
 
         return jsonify({"message": "Transaction updated successfully"}), 200
+    except NotFoundError:
+        conn.rollback()
+        return jsonify({"message": "Transaction not found"}), 404
     except Exception as e:
-        print(f"Error updating transaction: {e}")
+        conn.rollback()
+        logging.error("Error updating transaction: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
     finally:
         cur.close()
         conn.close()
 
 # Return Route
-@transaction_routes.route('/return/<item_sku>/<warehouse_id>/<customer_id>', methods=['POST'])
-def return_item(item_sku, warehouse_id, customer_id):
+# Appends a return row pointing at the purchase and puts the units back in stock
+@transaction_routes.route('/return/<int:transaction_id>', methods=['POST'])
+def return_item(transaction_id):
     data = request.json
+    params = request.args.to_dict()
 
     # Validate input
+    validation_result = validate_ledger_params(params)
+    if validation_result['error']:
+        return jsonify({"message": validation_result['message']}), 400
     validation_result = validate_return(data)
     if validation_result['error']:
         return jsonify({"message": validation_result['message']}), 400
+    validation_result = validate_idempotency_key(request.headers.get(IDEMPOTENCY_HEADER))
+    if validation_result['error']:
+        return jsonify({"message": validation_result['message']}), 400
+    idempotency = _idempotency(data)
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the transaction exists
-        check_query = """
-            SELECT transaction_quantity FROM Transaction 
-            WHERE item_sku = %s AND warehouse_id = %s AND customer_id = %s
-        """
-        cur.execute(check_query, (item_sku, warehouse_id, customer_id))
+        # A retried request gets the stored response and writes nothing
+        if idempotency is not None:
+            stored = claim_key(cur, "return", *idempotency)
+            if stored is not None:
+                conn.rollback()
+                return _replay(stored)
+
+        # Lock the purchase row, concurrent returns against it queue here
+        key = _ledger_key(transaction_id, params)
+        cur.execute(_purchase_for_update(key), list(key.values()))
         result = cur.fetchone()
         if not result:
+            conn.rollback()
             return jsonify({"message": "Transaction not found"}), 404
+        item_sku, warehouse_id, customer_id, purchase_date, sales_uom, purchased = result
 
-        current_quantity = result[0]
-        if data['return_quantity'] > current_quantity:
+        return_date = datetime.date.fromisoformat(data['date']) if data.get('date') else datetime.date.today()
+        if return_date < purchase_date:
+            conn.rollback()
+            return jsonify({"message": "Return date cannot be before the purchase date"}), 400
+
+        # Returns are dated on or after their purchase, so older partitions are pruned
+        cur.execute(RETURNED_QUANTITY, (transaction_id, purchase_date))
+        returned = int(cur.fetchone()[0])
+        if returned + data['return_quantity'] > purchased:
+            conn.rollback()
             return jsonify({"message": "Return quantity cannot exceed transaction quantity"}), 400
 
-        # Process the return
-        update_query = """
-            UPDATE Transaction
-            SET transaction_quantity = transaction_quantity - %s
-            WHERE item_sku = %s AND warehouse_id = %s AND customer_id = %s
-        """
-        cur.execute(update_query, (
-            data['return_quantity'], item_sku, warehouse_id, customer_id
-        ))
+        cur.execute(INSERT_RETURN, (transaction_id, item_sku, warehouse_id, customer_id, return_date, sales_uom, data['return_quantity']))
+        return_id = cur.lastrowid
+
+        # Put the returned units back in stock
+        if not _restock(cur, item_sku, warehouse_id, data['return_quantity']):
+            conn.rollback()
+            return jsonify({"message": "Item is not stocked in this warehouse"}), 404
+
+        body = {
+            "message": "Transaction return processed successfully",
+            "transaction_id": return_id,
+            "date": return_date.isoformat()
+        }
+        if idempotency is not None:
+            save_response(cur, "return", idempotency[0], body, 201)
+
         conn.commit()
 
-        return jsonify({"message": "Transaction return processed successfully"}), 200
+        return jsonify(body), 201
+    except IdempotencyConflictError as e:
+        conn.rollback()
+        return jsonify({"message": str(e)}), 422
     except Exception as e:
-        print(f"Error processing return: {e}")
+        conn.rollback()
+        logging.error("Error processing return: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+# Export Route
+# transaction_image is left out, binary columns do not fit NDJSON or CSV
+@transaction_routes.route('/export', methods=['GET'])
+def export_transactions():
+    params = request.args.to_dict()
+
+    # Validate input
+    validation_result = validate_export_params(params)
+    if validation_result['error']:
+        return jsonify({"message": validation_result['message']}), 400
+
+    try:
+        query = """
+            SELECT transaction_id, transaction_type, parent_transaction_id,
+                item_sku, warehouse_id, customer_id, date, sales_uom, transaction_quantity,
+                shipping_address, shipping_city, shipping_state, shipping_zipcode,
+                shipping_country, transaction_barcode, transaction_weight, tracking_information
+            FROM Transaction
+            ORDER BY date, transaction_id
+        """
+        return stream_export(query, (), params.get('format', 'ndjson'), "transactions")
+    except Exception as e:
+        logging.error("Error exporting transactions: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+# Image Upload Route
+# Accepts a multipart file field named "image" or the raw image as the body.
+# The type comes from the file's magic bytes, never from the client.
+@transaction_routes.route('/images', methods=['POST'])
+def upload_image():
+    if request.content_length is not None and request.content_length > IMAGE_MAX_BYTES + 64 * 1024:
+        return jsonify({"message": "Image is too large"}), 413
+
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('image')
+            if upload is None:
+                return jsonify({"message": "Missing file field: image"}), 400
+            stream = upload.stream
+        else:
+            stream = request.stream
+
+        image_id, size, created = save_image(stream, IMAGE_MIMETYPES)
+
+        return jsonify({"image_id": image_id, "size": size, "content_type": image_mimetype(image_id)}), 201 if created else 200
+    except ImageTooLargeError:
+        return jsonify({"message": "Image is too large"}), 413
+    except UnsupportedImageError as e:
+        return jsonify({"message": str(e)}), 415
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        logging.error("Error storing transaction image: %s", str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
+# Image Download Route
+# send_file hands the open file to the server's file wrapper (sendfile where
+# available) and answers Range and conditional requests
+@transaction_routes.route('/images/<image_id>', methods=['GET'])
+def download_image(image_id):
+    if not image_exists(image_id):
+        return jsonify({"message": "Image not found"}), 404
+
+    # Files stored before uploads were type-checked are downloaded, not rendered
+    mimetype = image_mimetype(image_id)
+    response = send_file(
+        image_path(image_id), mimetype=mimetype, as_attachment=mimetype not in IMAGE_MIMETYPES,
+        conditional=True, etag=image_id, max_age=31536000
+    )
+    # Content never changes for a given hash
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
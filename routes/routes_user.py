@@ -1,15 +1,27 @@
 import logging
 from flask import Blueprint, request, jsonify
-from validations.validate_user import validate_create_user, validate_update_user, validate_read_user_params, validate_delete_user
-from utility.db import get_db_connection
+from validations.validate_user import (
+    USER_FIELDS, USER_PUBLIC_FIELDS, validate_create_user, validate_update_user, validate_read_user_params, validate_delete_user
+)
+from utility.db import get_db_connection, recent_writer
+from utility.repository import ConflictError, NotFoundError, insert_row, update_row, delete_row
+from utility.cache import user_cache
+from utility.logs import log_payload
+from utility.statements import statement
+from utility.pagination import DEFAULT_PAGE_SIZE, decode_cursor, parse_fields, select_columns, page_format, page_response
+from utility.versions import VERSION_COLUMNS, is_not_modified, list_etag, not_modified, row_etag, table_version
 
 user_routes = Blueprint("user_routes", __name__)
 
+# Single user responses carry the row version their ETag is computed from
+USER_COLUMNS = USER_PUBLIC_FIELDS + VERSION_COLUMNS
+USER_BY_ID = statement("user_by_id", f"SELECT {', '.join(USER_COLUMNS)} FROM User WHERE user_id = %s")
+
 # Create a user
 @user_routes.route('/', methods=['POST'])
 def create_user():
     data = request.json
-    logging.info("Received request to create user with data: %s", data)
+    log_payload("Received request to create user with data: %s", data)
 
     # Validate input
     validation_result = validate_create_user(data)
@@ -24,26 +36,18 @@ def create_user():
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the user already exists
-        check_query = "SELECT user_id FROM User WHERE user_id = %s"
-        cur.execute(check_query, (data['user_id'],))
-        if cur.fetchone():
-            logging.warning("User already exists with ID: %s", data['user_id'])
-            return jsonify({"message": "User already exists"}), 409
-
-        # Insert the new user
-        insert_query = """
-            INSERT INTO User (user_id, user_name, user_role, pass_hash)
-            VALUES (%s, %s, %s, %s)
-        """
-        logging.debug("Executing insert query: %s with values: %s", insert_query, data)
-        cur.execute(insert_query, (
-            data['user_id'], data['user_name'], data['user_role'], data['pass_hash']
-        ))
+        # Insert the new user, a duplicate primary key means it already exists
+        values = {field: data.get(field) for field in USER_FIELDS}
+        logging.debug("Inserting user with values: %s", values)
+        insert_row(cur, "User", values)
         conn.commit()
+        user_cache.invalidate(data['user_id'])
 
         logging.info("User created successfully with ID: %s", data['user_id'])
         return jsonify({"message": "User created successfully"}), 201
+    except ConflictError:
+        logging.warning("User already exists with ID: %s", data['user_id'])
+        return jsonify({"message": "User already exists"}), 409
     except Exception as e:
         logging.error("Error creating user with ID: %s, Error: %s", data['user_id'], str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -67,8 +71,19 @@ def read_users():
         conn = get_db_connection()
         cur = conn.cursor()
 
+        # A client holding the current list gets a 304 before the query runs
+        response_format = page_format(params)
+        version = table_version(cur, "User")
+        etag = list_etag("User", version, response_format) if version is not None else None
+        if etag and is_not_modified(etag):
+            return not_modified(etag, ("Accept", "Accept-Encoding"))
+
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        fields = parse_fields(params.get('fields')) or USER_PUBLIC_FIELDS
+        columns = select_columns(fields, 'user_id')
+
         # Base query
-        query = "SELECT * FROM User WHERE 1=1"
+        query = f"SELECT {', '.join(columns)} FROM User WHERE 1=1"
         query_params = []
 
         if 'user_name' in params:
@@ -81,6 +96,13 @@ def read_users():
             query += " AND user_id = %s"
             query_params.append(params['user_id'])
 
+        # Keyset pagination on the primary key, one extra row tells us if there is a next page
+        if 'after' in params:
+            query += " AND user_id > %s"
+            query_params.append(decode_cursor(params['after']))
+        query += " ORDER BY user_id LIMIT %s"
+        query_params.append(limit + 1)
+
         logging.debug("Executing query: %s with parameters: %s", query, query_params)
         cur.execute(query, query_params)
         users = cur.fetchall()
@@ -89,12 +111,13 @@ def read_users():
             logging.info("No users found for parameters: %s", params)
             return jsonify({"message": "No users found"}), 404
 
-        # Map results to a list of dictionaries
-        columns = [desc[0] for desc in cur.description]
-        result = [dict(zip(columns, user)) for user in users]
+        # JSON objects, columnar JSON or CSV, compressed if the client accepts it
+        response, count = page_response(users, columns, fields, 'user_id', limit, response_format)
+        if etag:
+            response.set_etag(etag)
 
-        logging.info("Users retrieved successfully. Count: %d", len(result))
-        return jsonify(result), 200
+        logging.info("Users retrieved successfully. Count: %d", count)
+        return response, 200
     except Exception as e:
         logging.error("Error reading users, Error: %s", str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -102,40 +125,71 @@ def read_users():
         cur.close()
         conn.close()
 
+# Cache fills read the primary
+def _load_user(user_id):
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(USER_BY_ID, (user_id,))
+        user = cur.fetchone()
+        return dict(zip(USER_COLUMNS, user)) if user else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Read a single user, served from the user cache when possible
+@user_routes.route('/<user_id>', methods=['GET'])
+def read_user(user_id):
+    logging.info("Received request to read user with ID: %s", user_id)
+
+    try:
+        user = user_cache.get_or_load(user_id, lambda: _load_user(user_id), fresh=recent_writer())
+        if user is None:
+            logging.warning("User not found with ID: %s", user_id)
+            return jsonify({"message": "User not found"}), 404
+
+        # Strong ETag from the row version, a matching If-None-Match gets a 304
+        etag = row_etag(user)
+        if is_not_modified(etag):
+            return not_modified(etag)
+        response = jsonify(user)
+        response.set_etag(etag)
+        return response, 200
+    except Exception as e:
+        logging.error("Error reading user with ID: %s, Error: %s", user_id, str(e), exc_info=True)
+        return jsonify({"message": "Internal Server Error"}), 500
+
 # Update a user
 @user_routes.route('/<user_id>', methods=['PUT'])
 def update_user(user_id):
     data = request.json
-    logging.info("Received request to update user with ID: %s, Data: %s", user_id, data)
+    log_payload("Received request to update user with ID: %s, Data: %s", user_id, data)
 
     # Validate input
     validation_result = validate_update_user(data)
     if validation_result['error']:
         logging.warning("Validation failed for updating user with ID: %s, Error: %s", user_id, validation_result)
-        return jsonify({"message": validation_result['message']}), 400
+        return jsonify({
+            "message": validation_result['message'],
+            "fields": validation_result.get('fields')
+        }), 400
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the user exists
-        check_query = "SELECT user_id FROM User WHERE user_id = %s"
-        cur.execute(check_query, (user_id,))
-        if not cur.fetchone():
-            logging.warning("User not found with ID: %s", user_id)
-            return jsonify({"message": "User not found"}), 404
-
-        # Build the update query dynamically
-        update_fields = ", ".join([f"{field} = %s" for field in data.keys()])
-        update_values = list(data.values()) + [user_id]
-
-        update_query = f"UPDATE User SET {update_fields} WHERE user_id = %s"
-        logging.debug("Executing update query: %s with values: %s", update_query, update_values)
-        cur.execute(update_query, update_values)
+        # Update in one statement, no matched row means the user does not exist
+        logging.debug("Updating user with ID: %s, values: %s", user_id, data)
+        update_row(cur, "User", {"user_id": user_id}, data)
         conn.commit()
+        user_cache.invalidate(user_id)
 
         logging.info("User updated successfully with ID: %s", user_id)
         return jsonify({"message": "User updated successfully"}), 200
+    except NotFoundError:
+        logging.warning("User not found with ID: %s", user_id)
+        return jsonify({"message": "User not found"}), 404
     except Exception as e:
         logging.error("Error updating user with ID: %s, Error: %s", user_id, str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -158,21 +212,17 @@ def delete_user(user_id):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Check if the user exists
-        check_query = "SELECT user_id FROM User WHERE user_id = %s"
-        cur.execute(check_query, (user_id,))
-        if not cur.fetchone():
-            logging.warning("User not found with ID: %s", user_id)
-            return jsonify({"message": "User not found"}), 404
-
-        # Delete the user
-        delete_query = "DELETE FROM User WHERE user_id = %s"
-        logging.debug("Executing delete query: %s with ID: %s", delete_query, user_id)
-        cur.execute(delete_query, (user_id,))
+        # Delete in one statement, no matched row means the user does not exist
+        logging.debug("Deleting user with ID: %s", user_id)
+        delete_row(cur, "User", {"user_id": user_id})
         conn.commit()
+        user_cache.invalidate(user_id)
 
         logging.info("User deleted successfully with ID: %s", user_id)
         return jsonify({"message": "User deleted successfully"}), 200
+    except NotFoundError:
+        logging.warning("User not found with ID: %s", user_id)
+        return jsonify({"message": "User not found"}), 404
     except Exception as e:
         logging.error("Error deleting user with ID: %s, Error: %s", user_id, str(e), exc_info=True)
         return jsonify({"message": "Internal Server Error"}), 500
@@ -0,0 +1,6 @@
+-- Unique barcode lookups for GET /items/barcode. Built in place without
+-- blocking reads or writes; fails up front if duplicate barcodes exist.
+
+ALTER TABLE Item
+    ADD UNIQUE KEY idx_item_barcode (barcode),
+    ALGORITHM=INPLACE, LOCK=NONE;
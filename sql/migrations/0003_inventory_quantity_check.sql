@@ -0,0 +1,6 @@
+-- Backstop for the conditional stock decrement in purchase(). MySQL can only
+-- add a CHECK by copying the table; LOCK=SHARED keeps reads going meanwhile.
+
+ALTER TABLE In_Inventory
+    ADD CONSTRAINT chk_inventory_quantity CHECK (item_quantity >= 0),
+    ALGORITHM=COPY, LOCK=SHARED;
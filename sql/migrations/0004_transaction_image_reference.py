@@ -0,0 +1,53 @@
+import io
+from utility.image_store import save_image
+
+# Move transaction_image BLOBs into the content-addressed image store and
+# keep only the SHA-256 reference in the row.
+
+
+def _columns(cur):
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'Transaction'
+    """)
+    return {row[0] for row in cur.fetchall()}
+
+
+def upgrade(conn):
+    cur = conn.cursor()
+    try:
+        # DDL is not transactional, so a rerun after a failure picks up where it stopped
+        columns = _columns(cur)
+        if 'transaction_image_id' not in columns:
+            cur.execute("""
+                ALTER TABLE Transaction
+                    ADD COLUMN transaction_image_id CHAR(64) AFTER transaction_image,
+                    ALGORITHM=INPLACE, LOCK=NONE
+            """)
+
+        # Copy in batches by primary key so no long transaction is held
+        last_key = ("", "", "")
+        while True:
+            cur.execute("""
+                SELECT item_sku, warehouse_id, customer_id, transaction_image FROM Transaction
+                WHERE (item_sku, warehouse_id, customer_id) > (%s, %s, %s)
+                    AND transaction_image IS NOT NULL AND transaction_image_id IS NULL
+                ORDER BY item_sku, warehouse_id, customer_id
+                LIMIT 500
+            """, last_key)
+            rows = cur.fetchall()
+            if not rows:
+                break
+            for item_sku, warehouse_id, customer_id, image in rows:
+                image_id, _, _ = save_image(io.BytesIO(image))
+                cur.execute("""
+                    UPDATE Transaction SET transaction_image_id = %s
+                    WHERE item_sku = %s AND warehouse_id = %s AND customer_id = %s
+                """, (image_id, item_sku, warehouse_id, customer_id))
+            conn.commit()
+            last_key = rows[-1][:3]
+
+        cur.execute("ALTER TABLE Transaction DROP COLUMN transaction_image")
+        cur.execute("ALTER TABLE Transaction RENAME COLUMN transaction_image_id TO transaction_image")
+    finally:
+        cur.close()
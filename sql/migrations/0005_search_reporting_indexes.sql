@@ -0,0 +1,20 @@
+-- Secondary indexes for the filters and reports the routes run. All are
+-- built in place with LOCK=NONE, so reads and writes continue during the build.
+
+-- read_items equality/prefix filters and catalog reports
+ALTER TABLE Item
+    ADD INDEX idx_item_group (item_group),
+    ADD INDEX idx_item_brand (brand),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Date range reports and per-customer history. The composite index also
+-- serves the customer_id foreign key, replacing its implicit index.
+ALTER TABLE Transaction
+    ADD INDEX idx_transaction_date (date),
+    ADD INDEX idx_transaction_customer_date (customer_id, date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- read_users filters on user_role
+ALTER TABLE User
+    ADD INDEX idx_user_role (user_role),
+    ALGORITHM=INPLACE, LOCK=NONE;
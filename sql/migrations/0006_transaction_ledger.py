@@ -0,0 +1,83 @@
+import datetime
+from utility.ledger import partition_definition
+
+# Replace Transaction, keyed by (item_sku, warehouse_id, customer_id) and
+# edited in place by returns, with an append-only ledger: one row per
+# purchase or return under a surrogate ID, range partitioned by month.
+#
+# The old table is kept as Transaction_Legacy. Its rows are copied as
+# purchases of their remaining quantity, since in-place returns did not keep
+# history; fully returned rows are left in the legacy table only. Run this
+# with the API stopped, writes to the old table during the copy are lost.
+#
+# Partitioned InnoDB tables cannot have foreign keys. The purchase route
+# checks the customer in its INSERT ... SELECT and the item and warehouse
+# through the In_Inventory reservation.
+
+LEDGER_COLUMNS = """
+    transaction_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    transaction_type ENUM('purchase', 'return') NOT NULL,
+    parent_transaction_id BIGINT UNSIGNED,
+    item_sku VARCHAR(50) NOT NULL,
+    warehouse_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    sales_uom VARCHAR(20),
+    transaction_quantity INT NOT NULL,
+    shipping_address TEXT,
+    shipping_city VARCHAR(50),
+    shipping_state VARCHAR(50),
+    shipping_zipcode VARCHAR(20),
+    shipping_country VARCHAR(50),
+    transaction_image CHAR(64),
+    transaction_barcode VARCHAR(255),
+    transaction_weight DECIMAL(10, 2),
+    tracking_information VARCHAR(255),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (transaction_id, date),
+    INDEX idx_transaction_date (date),
+    INDEX idx_transaction_customer_date (customer_id, date),
+    INDEX idx_transaction_item_date (item_sku, warehouse_id, date),
+    INDEX idx_transaction_parent (parent_transaction_id),
+    CONSTRAINT chk_transaction_quantity CHECK (transaction_quantity > 0)
+"""
+
+COPIED_COLUMNS = """
+    item_sku, warehouse_id, customer_id, date, sales_uom, transaction_quantity,
+    shipping_address, shipping_city, shipping_state, shipping_zipcode,
+    shipping_country, transaction_image, transaction_barcode, transaction_weight, tracking_information
+"""
+
+
+def _tables(cur):
+    cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    return {row[0] for row in cur.fetchall()}
+
+
+def upgrade(conn):
+    cur = conn.cursor()
+    try:
+        tables = _tables(cur)
+        if 'Transaction_Legacy' in tables:
+            return
+
+        if 'Transaction_Ledger' not in tables:
+            cur.execute("SELECT MIN(date) FROM Transaction")
+            first_month = cur.fetchone()[0] or datetime.date.today()
+            cur.execute(f"CREATE TABLE Transaction_Ledger ({LEDGER_COLUMNS}) {partition_definition(first_month)}")
+        else:
+            # Left over from an interrupted run
+            cur.execute("TRUNCATE TABLE Transaction_Ledger")
+
+        cur.execute(f"""
+            INSERT INTO Transaction_Ledger (transaction_type, {COPIED_COLUMNS})
+            SELECT 'purchase', {COPIED_COLUMNS} FROM Transaction
+            WHERE transaction_quantity > 0
+            ORDER BY date, item_sku, warehouse_id, customer_id
+        """)
+        conn.commit()
+
+        # Swap both names in one atomic statement
+        cur.execute("RENAME TABLE Transaction TO Transaction_Legacy, Transaction_Ledger TO Transaction")
+    finally:
+        cur.close()
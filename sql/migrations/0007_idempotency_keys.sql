@@ -0,0 +1,13 @@
+-- Responses stored under client Idempotency-Key headers for purchase and
+-- return. Rows expire after IDEMPOTENCY_TTL and are purged by expires_at.
+
+CREATE TABLE IF NOT EXISTS Idempotency_Key (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) COLLATE utf8mb4_bin NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    response_body TEXT,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (scope, idempotency_key),
+    INDEX idx_idempotency_expires (expires_at)
+);
@@ -0,0 +1,18 @@
+-- Row versions and per-table change counters behind the ETags of item and
+-- user responses. Existing rows start at version 1, stamped with the time
+-- of the migration.
+
+ALTER TABLE Item
+    ADD COLUMN row_version INT NOT NULL DEFAULT 1,
+    ADD COLUMN updated_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3);
+
+ALTER TABLE User
+    ADD COLUMN row_version INT NOT NULL DEFAULT 1,
+    ADD COLUMN updated_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3);
+
+CREATE TABLE IF NOT EXISTS Table_Version (
+    table_name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO Table_Version (table_name) VALUES ('Item'), ('User');
@@ -0,0 +1,9 @@
+-- Split each table change counter over shard rows. Every write to Item or
+-- User bumped the one row of its table and held its lock until commit, so
+-- all writers queued behind each other. Existing counts stay in shard 0 and
+-- the list ETag reads the sum, so no ETag handed out before repeats.
+
+ALTER TABLE Table_Version
+    ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0 AFTER table_name,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (table_name, shard);
@@ -0,0 +1,6 @@
+-- read_items reads rows written since the search index snapshot through this
+-- index, so items another worker wrote are found before the index has them.
+
+ALTER TABLE Item
+    ADD INDEX idx_item_updated_at (updated_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
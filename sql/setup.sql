@@ -1,3 +1,7 @@
+-- Current schema for new databases. After loading it, record the
+-- migrations it already includes with: python migrate.py stamp
+-- Existing databases are upgraded with: python migrate.py up
+
 -- Create the Item table
 CREATE TABLE Item (
     item_sku VARCHAR(50) PRIMARY KEY,
@@ -15,7 +19,13 @@ CREATE TABLE Item (
     weight_uom VARCHAR(20),
     country_of_origin VARCHAR(50),
     barcode VARCHAR(50),
-    barcode_type VARCHAR(20)
+    barcode_type VARCHAR(20),
+    row_version INT NOT NULL DEFAULT 1,
+    updated_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    UNIQUE KEY idx_item_barcode (barcode),
+    INDEX idx_item_group (item_group),
+    INDEX idx_item_brand (brand),
+    INDEX idx_item_updated_at (updated_at)
 );
 
 -- Create the Warehouse table
@@ -40,6 +50,7 @@ CREATE TABLE In_Inventory (
     case_weight DECIMAL(10, 2),
     weight_uom VARCHAR(20),
     PRIMARY KEY (item_sku, warehouse_id),
+    CONSTRAINT chk_inventory_quantity CHECK (item_quantity >= 0),
     FOREIGN KEY (item_sku) REFERENCES Item(item_sku),
     FOREIGN KEY (warehouse_id) REFERENCES Warehouse(warehouse_id)
 );
@@ -57,10 +68,17 @@ CREATE TABLE Customer (
 );
 
 -- Create the Transaction table
+-- Append-only ledger: purchases and returns are separate rows, a return
+-- points at its purchase through parent_transaction_id. Partitioned by month
+-- on date; monthly partitions are added with: python migrate.py partitions
+-- Partitioned tables cannot have foreign keys, the routes check references.
 CREATE TABLE Transaction (
-    item_sku VARCHAR(50),
-    warehouse_id VARCHAR(50),
-    customer_id VARCHAR(50),
+    transaction_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    transaction_type ENUM('purchase', 'return') NOT NULL,
+    parent_transaction_id BIGINT UNSIGNED,
+    item_sku VARCHAR(50) NOT NULL,
+    warehouse_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
     date DATE NOT NULL,
     sales_uom VARCHAR(20),
     transaction_quantity INT NOT NULL,
@@ -69,14 +87,20 @@ CREATE TABLE Transaction (
     shipping_state VARCHAR(50),
     shipping_zipcode VARCHAR(20),
     shipping_country VARCHAR(50),
-    transaction_image BLOB,
+    transaction_image CHAR(64),                -- SHA-256 of the image in the image store
     transaction_barcode VARCHAR(255),
-    transaction_weight DECIMAL(10, 2),          
-    tracking_information VARCHAR(255),        
-    PRIMARY KEY (item_sku, warehouse_id, customer_id),
-    FOREIGN KEY (item_sku) REFERENCES Item(item_sku),
-    FOREIGN KEY (warehouse_id) REFERENCES Warehouse(warehouse_id),
-    FOREIGN KEY (customer_id) REFERENCES Customer(customer_id)
+    transaction_weight DECIMAL(10, 2),
+    tracking_information VARCHAR(255),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (transaction_id, date),
+    INDEX idx_transaction_date (date),
+    INDEX idx_transaction_customer_date (customer_id, date),
+    INDEX idx_transaction_item_date (item_sku, warehouse_id, date),
+    INDEX idx_transaction_parent (parent_transaction_id),
+    CONSTRAINT chk_transaction_quantity CHECK (transaction_quantity > 0)
+)
+PARTITION BY RANGE COLUMNS(date) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
 );
 
 -- Create the User table
@@ -84,5 +108,30 @@ CREATE TABLE User (
     user_id VARCHAR(50) PRIMARY KEY,
     user_name VARCHAR(100) NOT NULL,
     user_role VARCHAR(50),
-    pass_hash VARCHAR(255) NOT NULL
+    pass_hash VARCHAR(255) NOT NULL,
+    row_version INT NOT NULL DEFAULT 1,
+    updated_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_user_role (user_role)
+);
+
+-- Create the Table_Version table
+-- Change counters behind the ETags of list responses, one row per shard
+CREATE TABLE Table_Version (
+    table_name VARCHAR(50) NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, shard)
+);
+
+-- Create the Idempotency_Key table
+-- Responses replayed for retried purchase and return requests
+CREATE TABLE Idempotency_Key (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) COLLATE utf8mb4_bin NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    response_body TEXT,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (scope, idempotency_key),
+    INDEX idx_idempotency_expires (expires_at)
 );
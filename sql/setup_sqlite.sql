@@ -0,0 +1,121 @@
+-- Schema for the embedded SQLite backend (DB_BACKEND=sqlite), created
+-- automatically on first use of an empty database. Mirrors setup.sql;
+-- NOCASE stands in for utf8mb4_general_ci on key and search columns, and
+-- the Transaction ledger is not partitioned.
+
+CREATE TABLE Item (
+    item_sku VARCHAR(50) COLLATE NOCASE PRIMARY KEY,
+    item_name VARCHAR(100) COLLATE NOCASE NOT NULL,
+    item_uom VARCHAR(20),
+    item_group VARCHAR(50) COLLATE NOCASE,
+    retail_price DECIMAL(10, 2),
+    purchase_price DECIMAL(10, 2),
+    warranty_period INT,
+    is_stock_item BOOLEAN,
+    brand VARCHAR(50) COLLATE NOCASE,
+    description TEXT,
+    single_unit_dimensions VARCHAR(100),
+    single_unit_weight DECIMAL(10, 2),
+    weight_uom VARCHAR(20),
+    country_of_origin VARCHAR(50),
+    barcode VARCHAR(50) COLLATE NOCASE,
+    barcode_type VARCHAR(20),
+    row_version INT NOT NULL DEFAULT 1,
+    updated_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE UNIQUE INDEX idx_item_barcode ON Item (barcode);
+CREATE INDEX idx_item_group ON Item (item_group);
+CREATE INDEX idx_item_brand ON Item (brand);
+CREATE INDEX idx_item_updated_at ON Item (updated_at);
+
+CREATE TABLE Warehouse (
+    warehouse_id VARCHAR(50) COLLATE NOCASE PRIMARY KEY,
+    warehouse_name VARCHAR(100) NOT NULL,
+    warehouse_address TEXT,
+    warehouse_city VARCHAR(50),
+    warehouse_state VARCHAR(50),
+    warehouse_zipcode VARCHAR(20),
+    warehouse_country VARCHAR(50)
+);
+
+CREATE TABLE In_Inventory (
+    item_sku VARCHAR(50) COLLATE NOCASE,
+    warehouse_id VARCHAR(50) COLLATE NOCASE,
+    item_quantity INT,
+    opening_stock INT,
+    case_quantity INT,
+    case_dimensions VARCHAR(100),
+    case_weight DECIMAL(10, 2),
+    weight_uom VARCHAR(20),
+    PRIMARY KEY (item_sku, warehouse_id),
+    CONSTRAINT chk_inventory_quantity CHECK (item_quantity >= 0),
+    FOREIGN KEY (item_sku) REFERENCES Item(item_sku),
+    FOREIGN KEY (warehouse_id) REFERENCES Warehouse(warehouse_id)
+);
+
+CREATE TABLE Customer (
+    customer_id VARCHAR(50) COLLATE NOCASE PRIMARY KEY,
+    customer_sku VARCHAR(50) UNIQUE,
+    customer_name VARCHAR(100) NOT NULL,
+    customer_address TEXT,
+    customer_city VARCHAR(50),
+    customer_state VARCHAR(50),
+    customer_zipcode VARCHAR(20),
+    customer_country VARCHAR(50)
+);
+
+-- Append-only ledger; no foreign keys, matching the partitioned MySQL table
+CREATE TABLE "Transaction" (
+    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_type VARCHAR(10) NOT NULL CHECK (transaction_type IN ('purchase', 'return')),
+    parent_transaction_id INTEGER,
+    item_sku VARCHAR(50) COLLATE NOCASE NOT NULL,
+    warehouse_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    customer_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    date DATE NOT NULL,
+    sales_uom VARCHAR(20),
+    transaction_quantity INT NOT NULL,
+    shipping_address TEXT,
+    shipping_city VARCHAR(50),
+    shipping_state VARCHAR(50),
+    shipping_zipcode VARCHAR(20),
+    shipping_country VARCHAR(50),
+    transaction_image CHAR(64),
+    transaction_barcode VARCHAR(255),
+    transaction_weight DECIMAL(10, 2),
+    tracking_information VARCHAR(255),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT chk_transaction_quantity CHECK (transaction_quantity > 0)
+);
+CREATE INDEX idx_transaction_date ON "Transaction" (date);
+CREATE INDEX idx_transaction_customer_date ON "Transaction" (customer_id, date);
+CREATE INDEX idx_transaction_item_date ON "Transaction" (item_sku, warehouse_id, date);
+CREATE INDEX idx_transaction_parent ON "Transaction" (parent_transaction_id);
+
+CREATE TABLE User (
+    user_id VARCHAR(50) COLLATE NOCASE PRIMARY KEY,
+    user_name VARCHAR(100) COLLATE NOCASE NOT NULL,
+    user_role VARCHAR(50),
+    pass_hash VARCHAR(255) NOT NULL,
+    row_version INT NOT NULL DEFAULT 1,
+    updated_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX idx_user_role ON User (user_role);
+
+CREATE TABLE Table_Version (
+    table_name VARCHAR(50) NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, shard)
+);
+
+CREATE TABLE Idempotency_Key (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    response_body TEXT,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (scope, idempotency_key)
+);
+CREATE INDEX idx_idempotency_expires ON Idempotency_Key (expires_at);
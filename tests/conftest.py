@@ -0,0 +1,78 @@
+import os
+import sys
+import pytest
+
+# Tests run against the backend DB_BACKEND selects. Unset, they use an
+# in-memory SQLite database; DB_BACKEND=mysql with the DB_* settings runs the
+# same tests against MySQL. Rows are created with unique keys per run, so a
+# shared database does not need to be reset.
+if 'DB_BACKEND' not in os.environ:
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ.setdefault('DB_SQLITE_PATH', ':memory:')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Run SQL on the primary outside any request, committing it
+def execute(sql, params=()):
+    from utility.db import get_db_connection
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall() if cur.description else None
+        conn.commit()
+        return rows
+    finally:
+        cur.close()
+        conn.close()
+
+
+# An item stocked in a warehouse, and a customer to sell it to. Call with
+# the opening quantity; returns the keys and a purchase body for them.
+@pytest.fixture
+def stock(client):
+    import uuid
+
+    def make(quantity):
+        run = uuid.uuid4().hex[:12]
+        keys = {"item_sku": f"T-{run}", "warehouse_id": f"W-{run}", "customer_id": f"C-{run}"}
+        execute(
+            "INSERT INTO Item (item_sku, item_name, retail_price, purchase_price, barcode) VALUES (%s, %s, 2, 1, %s)",
+            (keys['item_sku'], "Stocked item", f"S{run}")
+        )
+        execute("INSERT INTO Warehouse (warehouse_id, warehouse_name) VALUES (%s, %s)", (keys['warehouse_id'], "Test"))
+        execute("INSERT INTO Customer (customer_id, customer_name) VALUES (%s, %s)", (keys['customer_id'], "Test"))
+        execute(
+            "INSERT INTO In_Inventory (item_sku, warehouse_id, item_quantity, opening_stock) VALUES (%s, %s, %s, %s)",
+            (keys['item_sku'], keys['warehouse_id'], quantity, quantity)
+        )
+        return keys
+
+    return make
+
+
+def purchase_body(keys, quantity=1, date="2026-10-01"):
+    return {
+        **keys, "date": date, "sales_uom": "ea", "transaction_quantity": quantity,
+        "shipping_address": "1 Main St", "shipping_city": "Springfield", "shipping_state": "IL",
+        "shipping_zipcode": "62701", "shipping_country": "US"
+    }
+
+
+def stock_level(keys):
+    return execute(
+        "SELECT item_quantity FROM In_Inventory WHERE item_sku = %s AND warehouse_id = %s",
+        (keys['item_sku'], keys['warehouse_id'])
+    )[0][0]
@@ -0,0 +1,91 @@
+import uuid
+
+
+def _item(sku, barcode):
+    return {
+        "item_sku": sku, "item_name": "Test item", "item_uom": "ea", "item_group": "test",
+        "retail_price": 19.99, "purchase_price": 9.5, "warranty_period": 12, "is_stock_item": True,
+        "brand": "test", "description": "Original", "single_unit_dimensions": "10x10x10",
+        "single_unit_weight": 1.25, "weight_uom": "lb", "country_of_origin": "US",
+        "barcode": barcode, "barcode_type": "EAN13"
+    }
+
+
+def _unique():
+    return uuid.uuid4().hex[:12]
+
+
+# On MySQL, ON DUPLICATE KEY UPDATE also fires on the barcode key; a new SKU
+# reusing a barcode must be rejected, not overwrite the barcode's owner
+def test_upsert_rejects_barcode_of_another_item(client):
+    run = _unique()
+    owner = _item(f"T-{run}-A", f"B{run}")
+    assert client.post('/items/', json=owner).status_code == 201
+
+    intruder = {**_item(f"T-{run}-B", f"B{run}"), "description": "Overwritten"}
+    response = client.post('/items/bulk?mode=upsert', json=[intruder])
+
+    assert response.status_code == 200
+    assert response.json['results'][0]['status'] == 409
+    assert client.get(f"/items/{owner['item_sku']}").json['description'] == "Original"
+    assert client.get(f"/items/{intruder['item_sku']}").status_code == 404
+
+
+def test_upsert_rejects_barcode_repeated_within_request(client):
+    run = _unique()
+    rows = [_item(f"T-{run}-A", f"B{run}"), _item(f"T-{run}-B", f"B{run}")]
+    response = client.post('/items/bulk?mode=upsert', json=rows)
+
+    assert [result['status'] for result in response.json['results']] == [201, 409]
+    assert client.get(f"/items/T-{run}-A").json['barcode'] == f"B{run}"
+    assert client.get(f"/items/T-{run}-B").status_code == 404
+
+
+def test_upsert_updates_by_sku(client):
+    run = _unique()
+    item = _item(f"T-{run}-A", f"B{run}")
+    assert client.post('/items/', json=item).status_code == 201
+
+    response = client.post('/items/bulk?mode=upsert', json=[{**item, "description": "Updated"}])
+
+    assert response.json['results'][0]['status'] == 200
+    assert client.get(f"/items/{item['item_sku']}").json['description'] == "Updated"
+
+
+# One taken barcode is that row's 409, the rest of the batch is written
+def test_insert_reports_taken_barcode_per_row(client):
+    run = _unique()
+    assert client.post('/items/', json=_item(f"T-{run}-A", f"B{run}")).status_code == 201
+
+    rows = [_item(f"T-{run}-B", f"B{run}"), _item(f"T-{run}-C", f"C{run}")]
+    response = client.post('/items/bulk', json=rows)
+
+    assert response.status_code == 200
+    assert [(result['status'], result['message']) for result in response.json['results']] == [
+        (409, "Barcode already in use"), (201, "Item created")
+    ]
+    assert client.get(f"/items/T-{run}-C").status_code == 200
+
+
+# SKUs compare like the column collation: "t-x" is the stored "T-X"
+def test_bulk_skus_ignore_case(client):
+    run = _unique()
+    sku = f"T-{run}-A"
+    assert client.post('/items/', json=_item(sku, f"B{run}")).status_code == 201
+
+    insert = client.post('/items/bulk', json=[_item(sku.lower(), f"X{run}"), _item(f"T-{run}-B", f"C{run}")])
+    assert [(result['status'], result['message']) for result in insert.json['results']] == [
+        (409, "Item already exists"), (201, "Item created")
+    ]
+
+    upsert = client.post('/items/bulk?mode=upsert', json=[{**_item(sku.lower(), f"B{run}"), "description": "Upserted"}])
+    assert upsert.json['results'][0]['status'] == 200
+    assert client.get(f"/items/{sku}").json['description'] == "Upserted"
+
+    update = client.patch('/items/bulk', json=[{"item_sku": sku.lower(), "description": "Patched"}])
+    assert update.json['results'][0]['status'] == 200
+    assert client.get(f"/items/{sku}").json['description'] == "Patched"
+
+    delete = client.delete('/items/bulk', json=[sku.lower()])
+    assert delete.json['results'][0]['status'] == 200
+    assert client.get(f"/items/{sku}").status_code == 404
@@ -0,0 +1,40 @@
+import csv
+import json
+from conftest import execute, purchase_body
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+# Dates are ISO 8601 in both formats, as the API accepts them
+def test_export_writes_iso_dates(client, stock):
+    keys = stock(5)
+    assert client.post('/transactions/purchase', json=purchase_body(keys, date="2026-10-01")).status_code == 201
+
+    rows = [row for row in _ndjson(client.get('/transactions/export')) if row['item_sku'] == keys['item_sku']]
+    assert [row['date'] for row in rows] == ["2026-10-01"]
+
+    response = client.get('/transactions/export', query_string={"format": "csv"})
+    lines = list(csv.reader(response.get_data(as_text=True).splitlines()))
+    date = lines[0].index("date")
+    assert [line[date] for line in lines[1:] if keys['item_sku'] in line] == ["2026-10-01"]
+
+
+# The export streams in batches: writers can commit while it is read, and
+# rows past the first batch are read after them
+def test_export_streams_while_rows_are_written(client, stock, monkeypatch):
+    monkeypatch.setattr("utility.export.EXPORT_BATCH_SIZE", 1)
+    before = {stock(1)['item_sku'] for _ in range(3)}
+
+    response = client.get('/items/export')
+    chunks = iter(response.response)
+    first = json.loads(next(chunks))
+    stock(1)
+    execute("UPDATE Item SET item_name = %s WHERE item_sku IN (%s, %s, %s)", ("Renamed", *before))
+    rest = b"".join(chunks)
+    response.close()
+
+    names = {row['item_sku']: row['item_name'] for row in map(json.loads, rest.decode().splitlines())}
+    assert before - {first['item_sku']} <= names.keys()
+    assert {names[sku] for sku in before if sku in names} == {"Renamed"}
@@ -0,0 +1,59 @@
+import threading
+import pytest
+from utility.group_commit import GroupCommitWriter, WriterTimeoutError
+
+
+def _writer(write_batch, timeout=5):
+    return GroupCommitWriter("test", write_batch, window=0.001, max_batch=10, max_queue=10, timeout=timeout)
+
+
+# A batch that never commits fails its requests instead of holding them forever
+def test_submit_times_out_when_the_batch_hangs():
+    release = threading.Event()
+
+    def write_batch(items):
+        release.wait()
+        return items
+
+    writer = _writer(write_batch, timeout=0.2)
+    try:
+        with pytest.raises(WriterTimeoutError):
+            writer.submit("stuck")
+    finally:
+        release.set()
+
+
+# The writer's exception reaches the waiting request
+def test_batch_error_is_raised_to_the_waiter():
+    def write_batch(items):
+        raise ValueError("disk full")
+
+    with pytest.raises(ValueError, match="disk full"):
+        _writer(write_batch).submit("row")
+
+
+# A batch that returns too few results still answers every request
+def test_missing_result_fails_instead_of_hanging():
+    writer = _writer(lambda items: [])
+    with pytest.raises(RuntimeError, match="no result"):
+        writer.submit("row")
+
+
+# A writer thread that died fails its batch and is replaced on the next submit
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_thread_is_restarted():
+    calls = []
+
+    def write_batch(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise SystemExit("writer killed")
+        return [item.upper() for item in items]
+
+    writer = _writer(write_batch)
+    with pytest.raises(RuntimeError, match="writer stopped"):
+        writer.submit("first")
+    writer._worker.join(1)
+    assert not writer._worker.is_alive()
+
+    assert writer.submit("second") == "SECOND"
@@ -0,0 +1,80 @@
+import time
+import uuid
+import datetime
+import pytest
+from conftest import execute, purchase_body, stock_level
+from utility import idempotency
+from utility.group_commit import GroupCommitWriter
+
+
+# Every test runs against the direct purchase path and the group commit one
+@pytest.fixture(params=["direct", "group_commit"])
+def purchase(request, client, monkeypatch):
+    from routes import routes_transaction
+    if request.param == "group_commit":
+        writer = GroupCommitWriter("purchase-test", routes_transaction._write_purchases, window=0.001)
+        monkeypatch.setattr(routes_transaction, "purchase_writer", writer)
+
+    def post(body, key):
+        return client.post('/transactions/purchase', json=body, headers={idempotency.IDEMPOTENCY_HEADER: key})
+
+    return post
+
+
+# A retry with the same key gets the first response back and takes no more stock
+def test_same_key_replays_the_stored_response(purchase, stock):
+    keys = stock(5)
+    key = uuid.uuid4().hex
+    first = purchase(purchase_body(keys, 2), key)
+    again = purchase(purchase_body(keys, 2), key)
+
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+    assert again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.json == first.json
+    assert stock_level(keys) == 3
+
+
+# Reusing a key for a different request is refused rather than replayed
+def test_key_reused_with_a_different_body_is_422(purchase, stock):
+    keys = stock(5)
+    key = uuid.uuid4().hex
+    assert purchase(purchase_body(keys, 1), key).status_code == 201
+
+    response = purchase(purchase_body(keys, 3), key)
+    assert response.status_code == 422
+    assert 'Idempotent-Replayed' not in response.headers
+    assert stock_level(keys) == 4
+
+
+# Once its response has expired a key runs the request again
+def test_expired_key_runs_again(purchase, stock):
+    keys = stock(5)
+    key = uuid.uuid4().hex
+    first = purchase(purchase_body(keys, 1), key)
+    execute(
+        "UPDATE Idempotency_Key SET expires_at = %s WHERE scope = 'purchase' AND idempotency_key = %s",
+        (idempotency._now() - datetime.timedelta(seconds=1), key)
+    )
+
+    again = purchase(purchase_body(keys, 1), key)
+    assert again.status_code == 201
+    assert 'Idempotent-Replayed' not in again.headers
+    assert again.json['transaction_id'] != first.json['transaction_id']
+    assert stock_level(keys) == 3
+
+
+# A host in another time zone must store the same expiry
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+def test_expiry_clock_ignores_local_time_zone(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    try:
+        now = idempotency._now()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    utc = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    assert abs((utc - now).total_seconds()) < 5
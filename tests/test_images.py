@@ -0,0 +1,63 @@
+import io
+import os
+import time
+import pytest
+from utility import image_store
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_STORE_PATH", str(tmp_path))
+    return tmp_path
+
+
+def _age(image_id, seconds):
+    old = time.time() - seconds
+    os.utime(image_store.image_path(image_id), (old, old))
+
+
+def test_upload_stores_sniffed_type_and_download_forbids_sniffing(client, store):
+    upload = client.post('/transactions/images', data=PNG, content_type='text/html')
+    assert upload.status_code == 201
+    assert upload.json['content_type'] == 'image/png'
+
+    download = client.get(f"/transactions/images/{upload.json['image_id']}")
+    assert download.mimetype == 'image/png'
+    assert download.headers['X-Content-Type-Options'] == 'nosniff'
+
+
+@pytest.mark.parametrize("body", [b'<html><script>alert(1)</script></html>', b'%PDF-1.7', b'GIF'])
+def test_upload_rejects_non_images(client, store, body):
+    response = client.post('/transactions/images', data=body, content_type='image/png')
+
+    assert response.status_code == 415
+    assert not list(image_store._stored_images())
+
+
+def test_purge_deletes_only_old_unreferenced_images(store, monkeypatch):
+    orphan, _, _ = image_store.save_image(io.BytesIO(PNG + b'orphan'))
+    referenced, _, _ = image_store.save_image(io.BytesIO(PNG + b'referenced'))
+    fresh, _, _ = image_store.save_image(io.BytesIO(PNG + b'fresh'))
+    _age(orphan, 7200)
+    _age(referenced, 7200)
+    monkeypatch.setattr(image_store, "_referenced_images", lambda: {referenced})
+
+    assert image_store.purge_unreferenced_images(grace_seconds=3600, dry_run=True)["deleted"] == 1
+    assert image_store.image_exists(orphan)
+
+    result = image_store.purge_unreferenced_images(grace_seconds=3600)
+    assert result["deleted"] == 1
+    assert not image_store.image_exists(orphan)
+    assert image_store.image_exists(referenced) and image_store.image_exists(fresh)
+
+
+# A transaction referencing an old image makes it fresh again
+def test_claim_protects_image_from_purge(store, monkeypatch):
+    image_id, _, _ = image_store.save_image(io.BytesIO(PNG))
+    _age(image_id, 7200)
+    monkeypatch.setattr(image_store, "_referenced_images", lambda: set())
+
+    assert image_store.claim_image(image_id)
+    assert image_store.purge_unreferenced_images(grace_seconds=3600)["deleted"] == 0
@@ -0,0 +1,24 @@
+import base64
+import pytest
+from utility.pagination import decode_cursor, encode_cursor
+
+
+def _cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("SKU-1")) == "SKU-1"
+
+
+@pytest.mark.parametrize("raw", ['{"a": 1}', '[1]', '1', 'null', 'not json'])
+def test_decode_cursor_rejects_non_string_keys(raw):
+    with pytest.raises(ValueError):
+        decode_cursor(_cursor(raw))
+
+
+# A well-formed cursor holding the wrong type is a client error, not a 500
+def test_list_rejects_object_cursor(client):
+    response = client.get('/items/', query_string={"item_group": "test", "after": "eyJhIjogMX0="})
+
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+import uuid
+import pytest
+from utility.db import get_backend, get_db_connection
+
+
+def _item(sku, group):
+    return {
+        "item_sku": sku, "item_name": "Filtered item", "item_uom": "ea", "item_group": group,
+        "retail_price": 5, "purchase_price": 2, "warranty_period": 0, "is_stock_item": True,
+        "brand": "test", "description": "", "single_unit_dimensions": "1x1x1",
+        "single_unit_weight": 1, "weight_uom": "lb", "country_of_origin": "US",
+        "barcode": f"G{sku}", "barcode_type": "EAN13"
+    }
+
+
+def test_exact_match_compares_whole_values(client):
+    run = uuid.uuid4().hex[:12]
+    for sku, group in ((f"T-{run}-A", f"grp{run}"), (f"T-{run}-B", f"grp{run}-sub")):
+        assert client.post('/items/', json=_item(sku, group)).status_code == 201
+
+    contains = client.get('/items/', query_string={"item_group": f"grp{run}"})
+    exact = client.get('/items/', query_string={"item_group": f"grp{run}", "match": "exact"})
+
+    assert [item['item_sku'] for item in contains.json] == [f"T-{run}-A", f"T-{run}-B"]
+    assert [item['item_sku'] for item in exact.json] == [f"T-{run}-A"]
+
+
+def test_exact_match_rejects_relevance_sort(client):
+    response = client.get('/items/', query_string={"brand": "test", "match": "exact", "sort": "relevance"})
+
+    assert response.status_code == 400
+
+
+# The point of match=exact: item_group and brand filters use their indexes
+def test_exact_match_uses_group_index():
+    if get_backend().name != 'sqlite':
+        pytest.skip("reads the SQLite query plan")
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN QUERY PLAN SELECT item_sku FROM Item WHERE 1=1 AND item_group = %s", ("tools",))
+        plan = " ".join(str(row[-1]) for row in cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+    assert "idx_item_group" in plan
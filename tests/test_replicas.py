@@ -0,0 +1,104 @@
+import time
+import uuid
+import pytest
+from utility import db
+from utility.backends import SQLiteBackend
+from utility.cache import item_cache
+from utility.db import LAST_WRITE_COOKIE, ConnectionPool, ReplicaSet, get_db_connection
+from validations.validate_item import ITEM_FIELDS
+
+# A second SQLite database stands in for a lagging read replica: it holds
+# whatever the test puts there and never sees the primary's writes.
+
+
+def _insert(conn, sku, description):
+    row = {field: None for field in ITEM_FIELDS}
+    row.update(item_sku=sku, item_name="Replica item", retail_price=1, purchase_price=1, barcode=f"R{sku}", description=description)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"INSERT INTO Item ({', '.join(ITEM_FIELDS)}) VALUES ({', '.join(['%s'] * len(ITEM_FIELDS))})",
+            [row[field] for field in ITEM_FIELDS]
+        )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    pool = ConnectionPool(SQLiteBackend(str(tmp_path / "replica.db")), pool_size=2, max_overflow=2)
+    monkeypatch.setattr(db, "_replicas", ReplicaSet(["replica"], [pool]))
+    monkeypatch.setitem(db.replica_config, 'hosts', ["replica"])
+    yield pool
+    pool.dispose()
+
+
+# One item whose primary and replica copies differ
+@pytest.fixture
+def item(replica):
+    sku = f"T-{uuid.uuid4().hex[:12]}"
+    primary = get_db_connection(read_only=False)
+    try:
+        _insert(primary, sku, "Fresh")
+    finally:
+        primary.close()
+    entry = replica.acquire()
+    try:
+        _insert(db.PooledConnection(replica, entry), sku, "Stale")
+    finally:
+        replica.release(entry)
+    return sku
+
+
+def _list_description(client, sku):
+    return client.get('/items/', query_string={"item_sku": sku, "match": "exact"}).json[0]['description']
+
+
+def test_list_reads_replica_outside_read_your_writes_window(client, item):
+    assert _list_description(client, item) == "Stale"
+
+    client.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}")
+    assert _list_description(client, item) == "Fresh"
+
+
+# The cache is only ever filled from the primary
+def test_cache_is_not_filled_from_replica(client, item):
+    item_cache.discard(item)
+
+    assert client.get(f"/items/{item}").json['description'] == "Fresh"
+    assert client.get(f"/items/{item}").json['description'] == "Fresh"
+
+
+# A client that just wrote skips a cached row another worker may not have
+# invalidated
+def test_recent_writer_skips_cache(client, item):
+    assert client.get(f"/items/{item}").json['description'] == "Fresh"
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE Item SET description = %s WHERE item_sku = %s", ("Rewritten", item))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    assert client.get(f"/items/{item}").json['description'] == "Fresh"
+
+    client.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}")
+    assert client.get(f"/items/{item}").json['description'] == "Rewritten"
+
+
+def test_primary_request_replaces_held_replica_connection(app, replica):
+    with app.test_request_context('/items/', method='GET'):
+        held = get_db_connection()
+        assert held.replica
+
+        primary = get_db_connection(read_only=False)
+        assert not primary.replica
+        assert get_db_connection() is primary
+        # The replaced connection stays usable by whoever holds it
+        cur = held.cursor()
+        cur.execute("SELECT 1")
+        assert cur.fetchone()[0] == 1
+        cur.close()
+    assert replica.stats()['in_use'] == 0
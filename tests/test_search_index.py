@@ -0,0 +1,77 @@
+from utility.search_index import NgramIndex
+
+
+def _index(rows):
+    index = NgramIndex(["item_name", "item_sku"])
+    index.rebuild(rows)
+    return index
+
+
+# LIKE under utf8mb4_general_ci ignores case and accents, so must the index
+def test_search_folds_case_and_accents():
+    index = _index([{"item_sku": "A", "item_name": "Café Noir"}, {"item_sku": "B", "item_name": "Tea"}])
+
+    assert index.search({"item_name": "cafe"}) == {"A"}
+    assert index.search({"item_name": "CAFÉ N"}) == {"A"}
+    assert index.search({"item_name": "coffee"}) == set()
+
+
+def _wait_for_index():
+    import time
+    from utility.search_index import item_search_index
+
+    deadline = time.monotonic() + 10
+    while not item_search_index.ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+# Insert behind the index's back, as another worker process would
+def _insert_directly(sku, name):
+    from utility.db import get_db_connection
+    from validations.validate_item import ITEM_FIELDS
+
+    row = {field: None for field in ITEM_FIELDS}
+    row.update(item_sku=sku, item_name=name, retail_price=1, purchase_price=1, barcode=f"U{sku}")
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"INSERT INTO Item ({', '.join(ITEM_FIELDS)}) VALUES ({', '.join(['%s'] * len(ITEM_FIELDS))})",
+            [row[field] for field in ITEM_FIELDS]
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# An item written by another process is not in this process's index yet;
+# the search must still find it through SQL
+def test_read_items_finds_item_missing_from_index(client):
+    import uuid
+    _wait_for_index()
+
+    run = uuid.uuid4().hex[:12]
+    _insert_directly(f"T-{run}", f"Unindexed {run}")
+
+    response = client.get('/items/', query_string={"item_name": f"unindexed {run}"})
+    assert response.status_code == 200
+    assert [item['item_sku'] for item in response.json] == [f"T-{run}"]
+
+
+# Same when the index does have candidates for the term: they must not
+# hide the rows it has not seen
+def test_read_items_finds_unindexed_item_next_to_indexed_ones(client):
+    import uuid
+    from utility.search_index import item_search_index
+    _wait_for_index()
+
+    run = uuid.uuid4().hex[:12]
+    item_search_index.add(f"T-{run}-A", {"item_sku": f"T-{run}-A", "item_name": f"Widget {run} indexed"})
+    _insert_directly(f"T-{run}-A", f"Widget {run} indexed")
+    _insert_directly(f"T-{run}-B", f"Widget {run} unindexed")
+    assert item_search_index.search({"item_name": f"widget {run}"}) == {f"T-{run}-A"}
+
+    response = client.get('/items/', query_string={"item_name": f"widget {run}"})
+    assert response.status_code == 200
+    assert [item['item_sku'] for item in response.json] == [f"T-{run}-A", f"T-{run}-B"]
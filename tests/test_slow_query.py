@@ -0,0 +1,28 @@
+import time
+from utility.db import get_backend
+from utility.slow_query import SlowQueryLog
+
+
+def _wait_for_plan(log, statement):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        entry = log._shapes[statement]
+        if entry["explain"] is not None:
+            return entry["explain"]
+        time.sleep(0.01)
+    raise AssertionError("EXPLAIN was not captured")
+
+
+# The captured plan is the backend's query plan, not an error or opcode list
+def test_slow_query_plan_is_captured(client):
+    log = SlowQueryLog(threshold=0, explain=True)
+    operation = "SELECT item_sku FROM Item WHERE item_sku = %s FOR UPDATE"
+    log.record("item_by_sku", operation, ("X",), 1.0, 1)
+
+    plan = _wait_for_plan(log, "item_by_sku")
+    assert plan
+    if get_backend().name == "sqlite":
+        assert "detail" in plan[0]
+        assert any("Item" in row["detail"] for row in plan)
+    else:
+        assert "select_type" in plan[0]
@@ -0,0 +1,47 @@
+import uuid
+from utility.db import get_db_connection
+
+
+def _item(sku):
+    return {
+        "item_sku": sku, "item_name": "Versioned item", "item_uom": "ea", "item_group": "test",
+        "retail_price": 5, "purchase_price": 2, "warranty_period": 0, "is_stock_item": True,
+        "brand": "test", "description": "", "single_unit_dimensions": "1x1x1",
+        "single_unit_weight": 1, "weight_uom": "lb", "country_of_origin": "US",
+        "barcode": f"V{sku}", "barcode_type": "EAN13"
+    }
+
+
+def _shard_rows(table):
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT shard, version FROM Table_Version WHERE table_name = %s", (table,))
+        return dict(cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+
+
+# The list ETag holds until a write to the table, whichever shard it bumps
+def test_list_etag_changes_on_write(client):
+    first = client.get('/items/', query_string={"item_group": "test"})
+    etag = first.headers['ETag']
+    assert client.get('/items/', query_string={"item_group": "test"}, headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.post('/items/', json=_item(f"T-{uuid.uuid4().hex[:12]}")).status_code == 201
+
+    second = client.get('/items/', query_string={"item_group": "test"}, headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+
+
+# Writes spread over the shard rows instead of all locking one
+def test_writes_bump_one_shard_each(client):
+    before = _shard_rows("Item")
+    for _ in range(20):
+        assert client.post('/items/', json=_item(f"T-{uuid.uuid4().hex[:12]}")).status_code == 201
+    after = _shard_rows("Item")
+
+    assert sum(after.values()) - sum(before.values()) == 20
+    assert len([shard for shard in after if after[shard] != before.get(shard)]) > 1
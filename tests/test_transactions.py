@@ -0,0 +1,79 @@
+import threading
+from conftest import purchase_body, stock_level
+
+
+def test_purchase_takes_stock(client, stock):
+    keys = stock(5)
+    response = client.post('/transactions/purchase', json=purchase_body(keys, 2))
+
+    assert response.status_code == 201
+    assert response.json['transaction_id']
+    assert stock_level(keys) == 3
+
+
+# Concurrent purchases can never take more than is in stock
+def test_concurrent_purchases_never_oversell(app, stock):
+    keys = stock(5)
+    statuses = []
+    start = threading.Barrier(20)
+
+    def buy():
+        client = app.test_client()
+        start.wait()
+        statuses.append(client.post('/transactions/purchase', json=purchase_body(keys)).status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 5 + [409] * 15
+    assert stock_level(keys) == 0
+
+
+def test_purchase_insufficient_stock_is_409(client, stock):
+    keys = stock(1)
+    response = client.post('/transactions/purchase', json=purchase_body(keys, 2))
+
+    assert response.status_code == 409
+    assert stock_level(keys) == 1
+
+
+def test_purchase_unknown_customer_or_warehouse_is_404(client, stock):
+    keys = stock(5)
+
+    unknown_customer = client.post('/transactions/purchase', json=purchase_body({**keys, "customer_id": "C-missing"}))
+    unknown_warehouse = client.post('/transactions/purchase', json=purchase_body({**keys, "warehouse_id": "W-missing"}))
+
+    assert unknown_customer.status_code == 404
+    assert unknown_warehouse.status_code == 404
+    assert stock_level(keys) == 5
+
+
+# Returns against one purchase add up to at most its quantity
+def test_returns_are_capped_at_purchased_quantity(client, stock):
+    keys = stock(5)
+    purchase = client.post('/transactions/purchase', json=purchase_body(keys, 3)).json
+    url = f"/transactions/return/{purchase['transaction_id']}"
+
+    assert client.post(url, json={"return_quantity": 2}).status_code == 201
+    over = client.post(url, json={"return_quantity": 2})
+    assert over.status_code == 400
+    assert client.post(url, json={"return_quantity": 1}).status_code == 201
+    assert client.post(url, json={"return_quantity": 1}).status_code == 400
+    assert stock_level(keys) == 5
+
+
+def test_return_before_purchase_date_is_400(client, stock):
+    keys = stock(5)
+    purchase = client.post('/transactions/purchase', json=purchase_body(keys, 1)).json
+
+    response = client.post(f"/transactions/return/{purchase['transaction_id']}", json={"return_quantity": 1, "date": "2026-09-30"})
+    assert response.status_code == 400
+
+
+def test_return_of_unknown_transaction_is_404(client):
+    response = client.post('/transactions/return/999999999', json={"return_quantity": 1})
+
+    assert response.status_code == 404
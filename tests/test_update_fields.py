@@ -0,0 +1,24 @@
+import uuid
+from utility.statements import get_statement_stats
+
+
+def _registered(prefix):
+    return [stmt["name"] for stmt in get_statement_stats() if stmt["name"].startswith(prefix)]
+
+
+# Unknown columns are rejected before any SQL is built, so they never reach
+# the prepared statement registry
+def test_update_item_rejects_unknown_fields(client):
+    response = client.put(f"/items/T-{uuid.uuid4().hex[:12]}", json={"nonexistent": 1})
+
+    assert response.status_code == 400
+    assert response.json["fields"] == ["nonexistent"]
+    assert not _registered("update:Item:nonexistent")
+
+
+def test_update_user_rejects_unknown_fields(client):
+    response = client.put(f"/users/T-{uuid.uuid4().hex[:12]}", json={"nonexistent": 1})
+
+    assert response.status_code == 400
+    assert response.json["fields"] == ["nonexistent"]
+    assert not _registered("update:User:nonexistent")
@@ -0,0 +1,34 @@
+import uuid
+
+
+def _create_user(client):
+    user_id = f"T-{uuid.uuid4().hex[:12]}"
+    user = {"user_id": user_id, "user_name": "Test user", "user_role": "employee", "pass_hash": "SECRET"}
+    assert client.post('/users/', json=user).status_code == 201
+    return user_id
+
+
+# pass_hash is accepted on writes and never returned by a read
+def test_single_user_read_omits_pass_hash(client):
+    user_id = _create_user(client)
+
+    for _ in range(2):  # loaded, then served from the cache
+        response = client.get(f"/users/{user_id}")
+        assert response.status_code == 200
+        assert "pass_hash" not in response.json
+        assert b"SECRET" not in response.data
+
+
+def test_user_list_omits_pass_hash(client):
+    user_id = _create_user(client)
+
+    for format in ("json", "columnar", "csv"):
+        response = client.get('/users/', query_string={"user_id": user_id, "format": format})
+        assert response.status_code == 200
+        assert b"SECRET" not in response.data and b"pass_hash" not in response.data
+
+
+def test_user_list_rejects_pass_hash_projection(client):
+    response = client.get('/users/', query_string={"user_role": "employee", "fields": "user_id,pass_hash"})
+
+    assert response.status_code == 400
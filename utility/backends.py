@@ -0,0 +1,406 @@
+import os
+import re
+import time
+import sqlite3
+import datetime
+import threading
+from decimal import Decimal
+from contextlib import contextmanager
+
+# Storage backends behind utility.db. Route code is written once in MySQL
+# dialect with %s placeholders; each backend connects, classifies errors and
+# supplies the few clauses that differ between engines.
+
+SQLITE_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'setup_sqlite.sql')
+
+
+class MySQLBackend:
+    name = "mysql"
+    explain = "EXPLAIN"
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        import mysql.connector
+
+        return mysql.connector.connect(**self.config)
+
+    # Server-side prepared statement, prepared on its first execute and
+    # reused while the cursor runs the same statement text
+    def prepared_cursor(self, connection):
+        return connection.cursor(prepared=True)
+
+    def is_duplicate_key(self, e):
+        from mysql.connector import IntegrityError, errorcode
+
+        return isinstance(e, IntegrityError) and e.errno == errorcode.ER_DUP_ENTRY
+
+    # Name of the violated key, PRIMARY for the primary key
+    def duplicate_key_name(self, e):
+        match = re.search(r"for key '(?:[^'.]*\.)?([^']*)'", getattr(e, 'msg', None) or "")
+        return match.group(1) if match else None
+
+    def upsert_clause(self, key_columns, columns):
+        return " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column} = VALUES({column})" for column in columns)
+
+    # INSERT suffix adding one to a counter column when the row already exists
+    def increment_clause(self, key_columns, column):
+        return f" ON DUPLICATE KEY UPDATE {column} = {column} + 1"
+
+    # A multi-row INSERT reports the first generated ID
+    def first_insert_id(self, cur, rows):
+        return cur.lastrowid
+
+    # Server-wide InnoDB row lock waits since startup
+    lock_waits_global = True
+
+    def lock_wait_stats(self, cur):
+        cur.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_%'")
+        status = {name: value for name, value in cur.fetchall()}
+        return {
+            "waits": int(status.get('Innodb_row_lock_waits', 0)),
+            "wait_seconds": int(status.get('Innodb_row_lock_time', 0)) / 1000
+        }
+
+
+# SQLite type conversions matching what mysql.connector returns
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+sqlite3.register_converter("DATETIME", lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+# String literals are matched first so nothing inside them is rewritten
+_SQLITE_TOKENS = re.compile(r"'(?:[^']|'')*'|%s|%%|\bTransaction\b")
+_LOCKING_READ = re.compile(r'\s+FOR\s+(?:UPDATE|SHARE)\b', re.IGNORECASE)
+_WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_COMMENT = re.compile(r'^\s*--.*$', re.MULTILINE)
+_STATEMENT_END = re.compile(r';\s*$', re.MULTILINE)
+
+_translated = {}
+
+
+def _sqlite_token(match):
+    token = match.group()
+    if token == '%s':
+        return '?'
+    if token == '%%':
+        return '%'
+    if token == 'Transaction':
+        # Reserved word in SQLite
+        return '"Transaction"'
+    return token
+
+
+# MySQL dialect to SQLite: ? placeholders, no locking reads. Returns the
+# statement and whether it needs a write transaction.
+def translate_sqlite(operation):
+    cached = _translated.get(operation)
+    if cached is not None:
+        return cached
+    statement, locking = _LOCKING_READ.subn('', operation)
+    statement = _SQLITE_TOKENS.sub(_sqlite_token, statement)
+    writes = bool(locking) or statement.lstrip().upper().startswith(_WRITES)
+    if len(_translated) < 10000:
+        _translated[operation] = (statement, writes)
+    return statement, writes
+
+
+class SQLiteCursor:
+    def __init__(self, connection, buffered=True):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._buffered = buffered
+        self._buffer = None
+        self._streaming = False
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _run(self, method, operation, params):
+        statement, writes = translate_sqlite(operation)
+        # A write or locking read opens an IMMEDIATE transaction, taking the
+        # write lock up front the way SELECT ... FOR UPDATE would
+        if writes and not self._connection.in_transaction:
+            self._connection.begin()
+        if self._connection.in_transaction or not self._connection.serialized:
+            method(statement, params)
+            self._buffer = None
+            return
+        # Shared-cache reads outside a transaction hold table locks while the
+        # statement is stepped, so they run to completion under the lock.
+        # An unbuffered cursor instead steps one fetch at a time under the
+        # lock and takes no table locks, so writers can commit in between;
+        # no write is ever in progress while it steps, so it still reads
+        # only committed rows.
+        with self._connection.backend.lock_for_read():
+            if self._buffered:
+                method(statement, params)
+                self._buffer = self._cursor.fetchall() if self._cursor.description is not None else None
+                return
+            self._connection.raw.execute("PRAGMA read_uncommitted = 1")
+            self._streaming = True
+            method(statement, params)
+            self._buffer = None
+
+    def execute(self, operation, params=()):
+        self._run(self._cursor.execute, operation, tuple(params or ()))
+
+    def executemany(self, operation, seq_params):
+        self._run(self._cursor.executemany, operation, [tuple(params) for params in seq_params])
+
+    def _fetch(self, method, *args):
+        if self._streaming:
+            with self._connection.backend.lock_for_read():
+                return method(*args)
+        return method(*args)
+
+    def fetchone(self):
+        if self._buffer is not None:
+            return self._buffer.pop(0) if self._buffer else None
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        if self._buffer is not None:
+            size = size or self._cursor.arraysize
+            rows, self._buffer = self._buffer[:size], self._buffer[size:]
+            return rows
+        return self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        if self._buffer is not None:
+            rows, self._buffer = self._buffer, []
+            return rows
+        return self._fetch(self._cursor.fetchall)
+
+    def close(self):
+        self._cursor.close()
+        if self._streaming:
+            self._streaming = False
+            self._connection.raw.execute("PRAGMA read_uncommitted = 0")
+
+
+# sqlite3 connection with the parts of the mysql.connector interface the
+# pool and routes use
+class SQLiteConnection:
+    def __init__(self, backend, raw):
+        self.backend = backend
+        self.raw = raw
+        self.serialized = backend.serialized
+        self._holds_lock = False
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def begin(self):
+        start = time.perf_counter()
+        if self.serialized:
+            self.backend.acquire_write_lock()
+            self._holds_lock = True
+        try:
+            self.raw.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._release()
+            raise
+        self.backend.record_lock_wait(time.perf_counter() - start)
+
+    def _release(self):
+        if self._holds_lock:
+            self._holds_lock = False
+            self.backend.release_write_lock()
+
+    def cursor(self, buffered=None, **kwargs):
+        return SQLiteCursor(self, buffered is not False)
+
+    def commit(self):
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute("COMMIT")
+        finally:
+            self._release()
+
+    def rollback(self):
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute("ROLLBACK")
+        finally:
+            self._release()
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1").fetchall()
+
+    def close(self):
+        self.rollback()
+        self.raw.close()
+
+
+# Embedded SQLite. A file database runs in WAL mode, so readers never block
+# the writer. path=":memory:" keeps the database in a shared-cache memory
+# database that lives as long as the process; shared-cache connections fail
+# on lock conflicts instead of waiting, so transactions are serialized with a
+# process-wide lock instead.
+class SQLiteBackend:
+    name = "sqlite"
+    # Plain EXPLAIN lists VDBE opcodes, the query plan is what is wanted
+    explain = "EXPLAIN QUERY PLAN"
+
+    def __init__(self, path=":memory:", shared_cache=False, busy_timeout=30, schema_path=SQLITE_SCHEMA_PATH):
+        self.memory = path == ":memory:"
+        self.serialized = self.memory or shared_cache
+        if self.memory:
+            self.uri = f"file:inventory-{id(self)}?mode=memory&cache=shared"
+        else:
+            self.uri = f"file:{path}" + ("?cache=shared" if shared_cache else "")
+        self.busy_timeout = busy_timeout
+        self.schema_path = schema_path
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._keeper = None
+        self._unique_keys = None
+        self._primary_keys = {}
+        self._stats_lock = threading.Lock()
+        self._lock_waits = 0
+        self._lock_wait_time = 0.0
+
+    def acquire_write_lock(self):
+        if not self._lock.acquire(timeout=self.busy_timeout):
+            raise sqlite3.OperationalError("database is locked")
+
+    def release_write_lock(self):
+        self._lock.release()
+
+    @contextmanager
+    def lock_for_read(self):
+        self.acquire_write_lock()
+        try:
+            yield
+        finally:
+            self.release_write_lock()
+
+    def _open(self):
+        raw = sqlite3.connect(
+            self.uri, uri=True, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256
+        )
+        raw.execute("PRAGMA foreign_keys = ON")
+        if not self.memory:
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.execute("PRAGMA synchronous = NORMAL")
+        return raw
+
+    # Create the schema on first use of an empty database
+    def _ensure_schema(self):
+        if self._keeper is not None:
+            return
+        with self._schema_lock:
+            if self._keeper is not None:
+                return
+            raw = self._open()
+            # One transaction, so processes opening the same file concurrently
+            # see either no schema or all of it
+            raw.execute("BEGIN IMMEDIATE")
+            try:
+                if raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Item'").fetchone() is None:
+                    with open(self.schema_path) as f:
+                        for statement in _STATEMENT_END.split(_COMMENT.sub('', f.read())):
+                            if statement.strip():
+                                raw.execute(statement)
+                raw.execute("COMMIT")
+            except Exception:
+                raw.execute("ROLLBACK")
+                raise
+            # Held open for the life of the process, a memory database is
+            # dropped when its last connection closes
+            self._keeper = raw
+
+    def connect(self):
+        self._ensure_schema()
+        return SQLiteConnection(self, self._open())
+
+    # sqlite3 keeps compiled statements per connection keyed by their text,
+    # so a plain cursor already reuses them
+    def prepared_cursor(self, connection):
+        return connection.cursor()
+
+    def is_duplicate_key(self, e):
+        return isinstance(e, sqlite3.IntegrityError) and getattr(e, 'sqlite_errorname', None) in (
+            'SQLITE_CONSTRAINT_PRIMARYKEY', 'SQLITE_CONSTRAINT_UNIQUE'
+        )
+
+    # PRIMARY for the primary key, otherwise the unique index name from the
+    # schema. A text primary key is a plain unique index to SQLite, so it is
+    # recognised by its columns.
+    def duplicate_key_name(self, e):
+        if getattr(e, 'sqlite_errorname', None) == 'SQLITE_CONSTRAINT_PRIMARYKEY':
+            return 'PRIMARY'
+        match = re.search(r'UNIQUE constraint failed: (.*)$', str(e))
+        if not match:
+            return None
+        qualified = [column.strip().split('.') for column in match.group(1).split(',')]
+        columns = tuple(parts[-1].lower() for parts in qualified)
+        if len(qualified[0]) == 2 and columns == self._primary_key(qualified[0][0]):
+            return 'PRIMARY'
+        return self._unique_key_names().get(columns, ", ".join(columns))
+
+    def _primary_key(self, table):
+        if table not in self._primary_keys:
+            with self._schema_lock:
+                info = self._keeper.execute(f'PRAGMA table_info("{table}")').fetchall()
+            # (cid, name, type, notnull, default, pk) with pk the 1-based key position
+            self._primary_keys[table] = tuple(row[1].lower() for row in sorted(info, key=lambda row: row[5]) if row[5])
+        return self._primary_keys[table]
+
+    def _unique_key_names(self):
+        if self._unique_keys is None:
+            with open(self.schema_path) as f:
+                schema = f.read()
+            self._unique_keys = {
+                tuple(column.strip().lower() for column in columns.split(',')): name
+                for name, columns in re.findall(r'CREATE UNIQUE INDEX (\w+) ON \S+ \(([^)]*)\)', schema)
+            }
+        return self._unique_keys
+
+    def upsert_clause(self, key_columns, columns):
+        return (
+            f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in columns)
+        )
+
+    def increment_clause(self, key_columns, column):
+        return f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {column} = {column} + 1"
+
+    # SQLite reports the last generated ID of a multi-row INSERT
+    def first_insert_id(self, cur, rows):
+        return cur.lastrowid - rows + 1
+
+    # Time spent taking the write lock, in this process only. Anything over
+    # a millisecond counts as a wait rather than an uncontended acquire.
+    lock_waits_global = False
+
+    def record_lock_wait(self, seconds):
+        with self._stats_lock:
+            self._lock_wait_time += seconds
+            if seconds > 0.001:
+                self._lock_waits += 1
+
+    def lock_wait_stats(self, cur=None):
+        with self._stats_lock:
+            return {"waits": self._lock_waits, "wait_seconds": round(self._lock_wait_time, 6)}
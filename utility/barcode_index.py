@@ -0,0 +1,53 @@
+import threading
+
+
+# In-memory barcode -> SKU map. Filled lazily from the unique barcode index
+# and kept in sync by the item write routes.
+class BarcodeMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._skus = {}
+        self._barcodes = {}
+
+    def get(self, barcode):
+        with self._lock:
+            return self._skus.get(barcode)
+
+    def _forget(self, sku):
+        barcode = self._barcodes.pop(sku, None)
+        if barcode is not None and self._skus.get(barcode) == sku:
+            del self._skus[barcode]
+
+    def put(self, sku, barcode):
+        with self._lock:
+            self._forget(sku)
+            # A barcode belongs to one item, drop whoever held it before
+            previous = self._skus.get(barcode)
+            if previous is not None:
+                self._barcodes.pop(previous, None)
+            if barcode is not None:
+                self._skus[barcode] = sku
+                self._barcodes[sku] = barcode
+
+    # Apply an item update: new barcode and/or new SKU
+    def update(self, sku, changes):
+        if 'barcode' not in changes and 'item_sku' not in changes:
+            return
+        with self._lock:
+            known = sku in self._barcodes
+            barcode = changes.get('barcode', self._barcodes.get(sku))
+            self._forget(sku)
+        # Without the old barcode the mapping is simply refilled on the next lookup
+        if known or 'barcode' in changes:
+            self.put(changes.get('item_sku', sku), barcode)
+
+    def remove(self, sku):
+        with self._lock:
+            self._forget(sku)
+
+    def stats(self):
+        with self._lock:
+            return {"barcodes": len(self._skus)}
+
+
+barcode_map = BarcodeMap()
@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from utility.metrics import register_collector
+
+# Cache configuration
+cache_config = {
+    'max_entries': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    'ttl': float(os.environ.get('CACHE_TTL', 60)),
+    # Optional Redis URL used to broadcast invalidations to other worker processes
+    'redis_url': os.environ.get('CACHE_REDIS_URL')
+}
+
+INVALIDATION_CHANNEL = "inventory-cache-invalidations"
+
+# Extra callbacks run for invalidations from other processes, by cache name
+_invalidation_listeners = {}
+
+
+# Run callback(key) whenever the bus delivers an invalidation for cache name
+def add_invalidation_listener(name, callback):
+    _invalidation_listeners.setdefault(name, []).append(callback)
+
+
+# Fold a key the way utf8mb4_general_ci compares it (case, accents and
+# trailing spaces ignored), so every spelling MySQL resolves to the same row
+# maps to the same key
+def fold_key(key):
+    key = unicodedata.normalize('NFKD', str(key).rstrip(' ').lower())
+    return ''.join(char for char in key if not unicodedata.combining(char))
+
+
+# Bounded LRU cache with a per-entry TTL
+class RowCache:
+    def __init__(self, name, max_entries=10000, ttl=60):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bus = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced a write is not stored
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    # Every spelling of a key shares one entry and one invalidation
+    def _key(self, key):
+        return fold_key(key)
+
+    def get(self, key):
+        key = self._key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+            self._misses += 1
+            return None
+
+    def _store(self, key, value, generation):
+        key = self._key(key)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    # Return the cached row, or load it with loader() and cache it.
+    # Rows that do not exist (loader returns None) are not cached. fresh=True
+    # skips the cached copy and replaces it with the loaded row. Loaders must
+    # read the primary: a lagging replica would put back a row a write just
+    # invalidated.
+    def get_or_load(self, key, loader, fresh=False):
+        value = None if fresh else self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            generation = self._generation
+        value = loader()
+        if value is not None:
+            self._store(key, value, generation)
+        return value
+
+    def discard(self, key):
+        key = self._key(key)
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    # Drop the key here and in every other process sharing the bus
+    def invalidate(self, key):
+        self.discard(key)
+        if self.bus is not None:
+            self.bus.publish(self.name, key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "shared": self.bus is not None
+            }
+
+
+# Broadcasts invalidations over Redis pub/sub. Every process still keeps its
+# own local cache; only the invalidations are shared.
+class RedisInvalidationBus:
+    def __init__(self, url, caches):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._caches = {cache.name: cache for cache in caches}
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _on_message(self, message):
+        try:
+            name, key = message['data'].decode('utf-8').split(':', 1)
+        except (AttributeError, ValueError):
+            return
+        cache = self._caches.get(name)
+        if cache is not None:
+            cache.discard(key)
+        for callback in _invalidation_listeners.get(name, ()):
+            try:
+                callback(key)
+            except Exception as e:
+                logging.error("Error handling invalidation for %s:%s: %s", name, key, str(e), exc_info=True)
+
+    def publish(self, name, key):
+        try:
+            self._client.publish(INVALIDATION_CHANNEL, f"{name}:{key}")
+        except Exception as e:
+            # Local invalidation already happened; other processes fall back to the TTL
+            logging.error("Error publishing cache invalidation for %s:%s: %s", name, key, str(e))
+
+
+item_cache = RowCache("item", cache_config['max_entries'], cache_config['ttl'])
+user_cache = RowCache("user", cache_config['max_entries'], cache_config['ttl'])
+
+
+def init_cache_bus():
+    if not cache_config['redis_url']:
+        return None
+    try:
+        bus = RedisInvalidationBus(cache_config['redis_url'], [item_cache, user_cache])
+    except ImportError:
+        logging.warning("CACHE_REDIS_URL is set but the redis package is not installed, cache invalidations stay local")
+        return None
+    except Exception as e:
+        logging.error("Error connecting cache invalidation bus: %s", str(e), exc_info=True)
+        return None
+    item_cache.bus = bus
+    user_cache.bus = bus
+    return bus
+
+
+def get_cache_stats():
+    return {"item": item_cache.stats(), "user": user_cache.stats()}
+
+
+def _cache_metrics():
+    stats = get_cache_stats()
+    keys = ["entries", "hits", "misses", "evictions", "expirations", "invalidations"]
+    return [
+        (f"cache_{key}", f"Row cache {key}", {(name,): cache_stats[key] for name, cache_stats in stats.items()}, ("cache",))
+        for key in keys
+    ]
+
+
+register_collector(_cache_metrics)
@@ -0,0 +1,45 @@
+import os
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    # Optional, responses fall back to gzip without it
+    brotli = None
+
+# Response compression configuration
+compression_config = {
+    'min_bytes': int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', 1024)),  # smaller bodies go out as they are
+    'gzip_level': int(os.environ.get('RESPONSE_GZIP_LEVEL', 6)),
+    'brotli_quality': int(os.environ.get('RESPONSE_BROTLI_QUALITY', 4))     # 0-11, higher is smaller and slower
+}
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=compression_config['gzip_level'], mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=compression_config['brotli_quality'])
+
+
+# Preferred first: brotli wins a tie in the client's Accept-Encoding weights
+COMPRESSORS = {"br": _brotli, "gzip": _gzip} if brotli is not None else {"gzip": _gzip}
+
+
+def negotiate_encoding():
+    accepted = request.accept_encodings
+    candidates = [encoding for encoding in COMPRESSORS if accepted[encoding] > 0]
+    return max(candidates, key=lambda encoding: accepted[encoding], default=None)
+
+
+# Compress a buffered response body with the best encoding the client accepts
+def compress_response(response):
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None or response.content_length is None or response.content_length < compression_config['min_bytes']:
+        return response
+    response.set_data(COMPRESSORS[encoding](response.get_data()))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -1,16 +1,560 @@
-import mysql.connector
+import os
+import time
+import logging
+import threading
+from collections import deque
+from mysql.connector.constants import ClientFlag
+from flask import g, has_app_context, has_request_context, request
+from utility.backends import MySQLBackend, SQLiteBackend
+from utility.metrics import db_query_duration, db_rows_total, db_errors_total, normalize_sql, register_collector
+from utility.slow_query import slow_query_log
+from utility.statements import Statement, StatementCache, statement_config
 
-# Database Configuration
+# Storage backend: mysql, or sqlite for an embedded database with no server
+backend_config = {
+    'backend': os.environ.get('DB_BACKEND', 'mysql'),
+    'sqlite_path': os.environ.get('DB_SQLITE_PATH', 'inventory.db'),                 # or :memory:
+    'sqlite_shared_cache': os.environ.get('DB_SQLITE_SHARED_CACHE', '0') == '1'
+}
+
+# Database Configuration (MySQL)
 db_config = {
-    'host': 'localhost',
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
     'user': 'root',
     'password': 'root',
     'database': 'inventory_database',
     'charset': 'utf8mb4',
-    'collation': 'utf8mb4_general_ci'
+    'collation': 'utf8mb4_general_ci',
+    # Report matched rather than changed rows, so an UPDATE that rewrites the
+    # same values is not mistaken for a missing row
+    'client_flags': [ClientFlag.FOUND_ROWS]
+}
+
+# Connection pool configuration
+pool_config = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),          # connections kept open when idle
+    'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),  # extra connections allowed under load
+    'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),     # seconds to wait for a free connection
+    'pool_recycle': float(os.environ.get('DB_POOL_RECYCLE', 3600)),   # reopen connections older than this
+    'pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1'         # check liveness on checkout
+}
+
+# Read replica configuration
+replica_config = {
+    # Comma separated host[:port] list; GET requests read from these
+    'hosts': [host.strip() for host in os.environ.get('DB_REPLICAS', '').split(',') if host.strip()],
+    'selection': os.environ.get('DB_REPLICA_SELECTION', 'round_robin'),         # or least_connections
+    'read_your_writes': float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 5)),  # primary-only window after a write
+    'eject_seconds': float(os.environ.get('DB_REPLICA_EJECT_SECONDS', 30))       # how long a failed replica sits out
 }
 
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+LAST_WRITE_COOKIE = "db_last_write"
+DB_QUERIES_HEADER = "X-DB-Queries"
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+# Database round trips (statements, commits, rollbacks) and time spent in
+# them by the current request, reported on the response
+def _count_round_trip(duration):
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + duration
+
+
+# A raw connection plus the bookkeeping the pool needs, including the
+# statements prepared on it
+class _PoolEntry:
+    def __init__(self, connection, statements=None):
+        self.connection = connection
+        self.statements = statements
+        self.created_at = time.monotonic()
+
+
+# Cursor that times every statement and counts the rows it returns or touches.
+# A registered Statement runs on the connection's prepared cursor for it,
+# anything else on the plain cursor.
+class InstrumentedCursor:
+    def __init__(self, cursor, statements=None):
+        self._plain = self._cursor = cursor
+        self._statements = statements
+        self._statement = None
+        self._slow = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _target(self, operation):
+        if isinstance(operation, Statement):
+            self._cursor = self._statements.cursor(operation) if self._statements is not None else self._plain
+            return operation.sql
+        self._cursor = self._plain
+        return operation
+
+    def _timed(self, method, operation, params, *args, **kwargs):
+        statement = self._statement = (normalize_sql(operation),)
+        start = time.perf_counter()
+        try:
+            return method(operation, params, *args, **kwargs)
+        except Exception:
+            db_errors_total.inc(statement)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            db_query_duration.observe(statement, duration)
+            _count_round_trip(duration)
+            # Result sets are counted as they are fetched
+            rows = 0
+            if not getattr(self._cursor, 'with_rows', False) and self._cursor.rowcount > 0:
+                rows = self._cursor.rowcount
+                db_rows_total.inc(statement, rows)
+            self._slow = duration >= slow_query_log.threshold and not statement[0].startswith("EXPLAIN")
+            if self._slow:
+                slow_query_log.record(statement[0], operation, params, duration, rows)
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        operation = self._target(operation)
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        operation = self._target(operation)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    # Prepared cursors belong to the connection and outlive this cursor
+    def close(self):
+        self._plain.close()
+
+    def _count(self, rows):
+        if rows and self._statement is not None:
+            db_rows_total.inc(self._statement, rows)
+            if self._slow:
+                slow_query_log.add_rows(self._statement[0], rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._count(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+
+# Connection handed out to callers. close() gives it back to the pool
+# instead of tearing down the socket.
+class PooledConnection:
+    def __init__(self, pool, entry, request_bound=False, replica=False):
+        self._pool = pool
+        self._entry = entry
+        self._request_bound = request_bound
+        self.replica = replica
+
+    def __getattr__(self, name):
+        return getattr(self._entry.connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._entry.connection.cursor(*args, **kwargs)
+        # Prepared statements return rows like the default cursor only
+        return InstrumentedCursor(cursor, None if args or kwargs else self._entry.statements)
+
+    def _timed(self, method):
+        start = time.perf_counter()
+        try:
+            return method()
+        finally:
+            _count_round_trip(time.perf_counter() - start)
+
+    def commit(self):
+        return self._timed(self._entry.connection.commit)
+
+    def rollback(self):
+        return self._timed(self._entry.connection.rollback)
+
+    def close(self):
+        # Request-bound connections are returned on app context teardown
+        if not self._request_bound:
+            self.release()
+
+    def release(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+
+class ConnectionPool:
+    def __init__(self, backend, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=3600, pre_ping=True):
+        self.backend = backend
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        # Counters for get_pool_stats()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._failed_pings = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        connection = self.backend.connect()
+        statements = StatementCache(lambda: self.backend.prepared_cursor(connection), statement_config['cache_size'])
+        return _PoolEntry(connection, statements)
+
+    def _discard(self, entry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, entry):
+        return self.pool_recycle >= 0 and time.monotonic() - entry.created_at > self.pool_recycle
+
+    def _is_alive(self, entry):
+        try:
+            entry.connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.pool_timeout
+        entry = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    # Reserve a slot and open the connection outside the lock
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(f"No connection available within {self.pool_timeout}s")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            if entry is None:
+                entry = self._connect()
+            elif self._is_stale(entry):
+                logging.debug("Recycling pooled connection older than %ss", self.pool_recycle)
+                self._discard(entry)
+                with self._cond:
+                    self._recycled += 1
+                entry = self._connect()
+            elif self.pre_ping and not self._is_alive(entry):
+                logging.warning("Pooled connection failed health check, reconnecting")
+                self._discard(entry)
+                with self._cond:
+                    self._failed_pings += 1
+                entry = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return entry
+
+    def release(self, entry):
+        keep = True
+        try:
+            # Never hand an open transaction to the next borrower
+            if entry.connection.in_transaction:
+                entry.connection.rollback()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and len(self._idle) < self.pool_size:
+                self._idle.append(entry)
+            else:
+                self._open -= 1
+                keep = False
+            self._cond.notify()
+
+        if not keep:
+            self._discard(entry)
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def dispose(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "failed_pings": self._failed_pings,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "wait_time_max": round(self._wait_time_max, 6)
+            }
+
+
+# Pools for the read replicas. A replica that cannot hand out a working
+# connection is ejected for eject_seconds and then tried again; while every
+# replica is out, reads go to the primary.
+class ReplicaSet:
+    def __init__(self, names, pools, selection='round_robin', eject_seconds=30):
+        if selection not in ('round_robin', 'least_connections'):
+            raise ValueError(f"Unknown replica selection: {selection}")
+        self.names = names
+        self.pools = pools
+        self.selection = selection
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self._next = 0
+        self._ejected_until = [0.0] * len(pools)
+        self._ejections = [0] * len(pools)
+
+    def _choose(self, candidates):
+        if self.selection == 'least_connections':
+            return min(candidates, key=lambda i: self.pools[i].in_use)
+        with self._lock:
+            index = candidates[self._next % len(candidates)]
+            self._next += 1
+        return index
+
+    def eject(self, index, reason):
+        with self._lock:
+            self._ejected_until[index] = time.monotonic() + self.eject_seconds
+            self._ejections[index] += 1
+        logging.warning("Ejecting read replica %s for %ss: %s", self.names[index], self.eject_seconds, reason)
+
+    # (pool, entry) from a healthy replica, or None when none is usable
+    def acquire(self):
+        tried = set()
+        while True:
+            now = time.monotonic()
+            candidates = [
+                i for i in range(len(self.pools)) if i not in tried and self._ejected_until[i] <= now
+            ]
+            if not candidates:
+                return None
+            index = self._choose(candidates)
+            tried.add(index)
+            try:
+                return self.pools[index], self.pools[index].acquire()
+            except PoolTimeoutError:
+                # Busy rather than broken, try the next one
+                continue
+            except Exception as e:
+                self.eject(index, str(e))
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            ejected = [until > now for until in self._ejected_until]
+            ejections = list(self._ejections)
+        return [
+            {"name": name, "ejected": ejected[i], "ejections": ejections[i], **pool.stats()}
+            for i, (name, pool) in enumerate(zip(self.names, self.pools))
+        ]
+
+
+_backend = None
+_pool = None
+_replicas = None
+_pool_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                if backend_config['backend'] == 'sqlite':
+                    _backend = SQLiteBackend(backend_config['sqlite_path'], backend_config['sqlite_shared_cache'])
+                elif backend_config['backend'] == 'mysql':
+                    _backend = MySQLBackend(db_config)
+                else:
+                    raise ValueError(f"Unknown DB_BACKEND: {backend_config['backend']}")
+    return _backend
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        backend = get_backend()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(backend, **pool_config)
+    return _pool
+
+
+def _replica_db_config(host):
+    host, _, port = host.partition(':')
+    return {**db_config, 'host': host, 'port': int(port) if port else db_config['port']}
+
+
+# Replicas apply to the MySQL backend only
+def get_replicas():
+    global _replicas
+    if _replicas is None and replica_config['hosts'] and get_backend().name == 'mysql':
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet(
+                    replica_config['hosts'],
+                    [ConnectionPool(MySQLBackend(_replica_db_config(host)), **pool_config) for host in replica_config['hosts']],
+                    replica_config['selection'], replica_config['eject_seconds']
+                )
+    return _replicas
+
+
+# Primary pool statistics, plus one entry per replica when configured
+def get_pool_stats():
+    stats = get_pool().stats()
+    replicas = get_replicas()
+    if replicas is not None:
+        stats["replicas"] = replicas.stats()
+    return stats
+
+
+def _pool_metrics():
+    stats = get_pool_stats()
+    pools = [("primary", stats)] + [(replica["name"], replica) for replica in stats.pop("replicas", [])]
+    metrics = [
+        (f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", {(name,): pool[key] for name, pool in pools}, ("pool",))
+        for key in stats
+    ]
+    if len(pools) > 1:
+        metrics.append((
+            "db_replica_ejected", "Read replica currently ejected",
+            {(name,): int(pool["ejected"]) for name, pool in pools[1:]}, ("pool",)
+        ))
+    return metrics
+
+
+register_collector(_pool_metrics)
+
+
+# Whether the client wrote within the read-your-writes window, tracked by a
+# cookie set on its write responses. Such a client reads the primary, and
+# skips caches that may hold a row from before its write.
+def recent_writer():
+    if not has_request_context():
+        return False
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        last_write = 0
+    return time.time() - last_write < replica_config['read_your_writes']
+
+
+# Reads go to a replica unless the client wrote within the window
+def _read_from_replica():
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    return not recent_writer()
+
+
+def _connect(read_only, request_bound=False):
+    if read_only is None:
+        read_only = _read_from_replica()
+    replicas = get_replicas() if read_only else None
+    if replicas is not None:
+        acquired = replicas.acquire()
+        if acquired is not None:
+            return PooledConnection(acquired[0], acquired[1], request_bound, replica=True)
+    return PooledConnection(get_pool(), get_pool().acquire(), request_bound)
+
+
 # Database connection
-def get_db_connection():
-    connection = mysql.connector.connect(**db_config)
-    return connection
+# Inside a request the same pooled connection is reused and returned on
+# app context teardown; elsewhere the caller returns it with close().
+# read_only=None routes by the request: GET and HEAD read from a replica
+# when replicas are configured, everything else uses the primary.
+# read_only=False always gets the primary: if the request holds a replica
+# connection, a primary one replaces it for the rest of the request, and the
+# replica connection stays usable by whoever has it until teardown.
+def get_db_connection(read_only=None):
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is not None and conn.replica and read_only is False:
+            g.setdefault('db_replaced', []).append(conn)
+            conn = None
+        if conn is None:
+            conn = g.db_conn = _connect(read_only, request_bound=True)
+        return conn
+    return _connect(read_only)
+
+
+def release_db_connection(exception=None):
+    for conn in [g.pop('db_conn', None)] + g.pop('db_replaced', []):
+        if conn is not None:
+            conn.release()
+
+
+# Start the read-your-writes window for the client that just wrote
+def _mark_write(response):
+    if request.method not in READ_METHODS and response.status_code < 400 and replica_config['hosts']:
+        window = replica_config['read_your_writes']
+        response.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}", max_age=max(int(window) + 1, 1), httponly=True)
+    return response
+
+
+# Round trips and database time of the request, for load tests and browser
+# dev tools
+def _report_round_trips(response):
+    queries = g.get('db_queries')
+    if queries:
+        response.headers[DB_QUERIES_HEADER] = str(queries)
+        response.headers.add('Server-Timing', f"db;dur={g.db_time * 1000:.3f}")
+    return response
+
+
+def init_app(app):
+    app.after_request(_report_round_trips)
+    app.after_request(_mark_write)
+    app.teardown_appcontext(release_db_connection)
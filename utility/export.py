@@ -0,0 +1,97 @@
+import io
+import csv
+import json
+import zlib
+import datetime
+from decimal import Decimal
+from flask import Response, request, stream_with_context
+from utility.db import get_db_connection
+
+# Rows pulled from the server per fetchmany() call
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv")
+}
+
+
+_ISO_TYPES = (datetime.date, datetime.time)
+
+
+# Dates and times as ISO 8601 in both formats, not the HTTP-dates Flask's
+# JSON provider writes
+def _plain(value):
+    if isinstance(value, _ISO_TYPES):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_lines(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_plain, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [_plain(value) if isinstance(value, _ISO_TYPES) else value for value in row] for row in rows
+    )
+    return buffer.getvalue()
+
+
+def _generate(conn, cur, export_format, compressor):
+    columns = [desc[0] for desc in cur.description]
+
+    def encode(text):
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    try:
+        if export_format == "csv":
+            yield encode(_csv_lines([columns]))
+
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            lines = _csv_lines(rows) if export_format == "csv" else _ndjson_lines(columns, rows)
+            chunk = encode(lines)
+            if chunk:
+                yield chunk
+
+        if compressor:
+            yield compressor.flush()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Run the query on an unbuffered cursor and stream the result in batches.
+# The query is executed before the response starts so database errors can
+# still be reported with a proper status code.
+def stream_export(query, query_params, export_format, name):
+    conn = get_db_connection()
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(query, query_params)
+    except Exception:
+        cur.close()
+        conn.close()
+        raise
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    compress = request.accept_encodings["gzip"] > 0
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    # No Content-Length, so the body goes out with chunked transfer encoding
+    response = Response(stream_with_context(_generate(conn, cur, export_format, compressor)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={name}.{extension}"
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
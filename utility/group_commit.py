@@ -0,0 +1,162 @@
+import os
+import time
+import queue
+import logging
+import threading
+from utility.metrics import Histogram, register_collector
+
+# Group commit configuration
+group_commit_config = {
+    'enabled': os.environ.get('PURCHASE_GROUP_COMMIT', '0') == '1',
+    'window': float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5)) / 1000,   # longest a request waits for company
+    'max_batch': int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 100)),       # rows written per commit at most
+    'max_queue': int(os.environ.get('GROUP_COMMIT_MAX_QUEUE', 10000)),     # queued requests before rejecting
+    'timeout': float(os.environ.get('GROUP_COMMIT_TIMEOUT_SECONDS', 30))   # longest a request waits for its batch
+}
+
+group_commit_batch_size = Histogram(
+    "group_commit_batch_size", "Requests written per group commit", ("writer",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+group_commit_queue_wait = Histogram(
+    "group_commit_queue_wait_seconds", "Time a request waited in the queue before its batch was written", ("writer",)
+)
+
+
+class WriterBusyError(Exception):
+    pass
+
+
+# The batch did not finish in time. It may still commit later, so the
+# outcome is unknown; a retry with the same Idempotency-Key is safe.
+class WriterTimeoutError(Exception):
+    pass
+
+
+class _Pending:
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Coalesces concurrent writes so many requests share one transaction and
+# one commit. write_batch(items) runs on the writer thread, writes and
+# commits all items and returns one result per item; submit() blocks until
+# the batch holding its item has committed and returns that item's result,
+# or raises the batch's error. A writer thread that died is restarted by the
+# next submit(), and no request waits longer than timeout.
+class GroupCommitWriter:
+    def __init__(self, name, write_batch, window=0.005, max_batch=100, max_queue=10000, timeout=30):
+        self.name = name
+        self.write_batch = write_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _ensure_started(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    if self._worker is not None:
+                        logging.error("Group commit writer %s had stopped, restarting it", self.name)
+                    self._worker = threading.Thread(target=self._run, name=f"group-commit-{self.name}", daemon=True)
+                    self._worker.start()
+
+    def submit(self, item):
+        self._ensure_started()
+        pending = _Pending(item)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise WriterBusyError(f"{self.name} write queue is full")
+        if not pending.done.wait(self.timeout):
+            raise WriterTimeoutError(f"{self.name} batch did not finish within {self.timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    # Collect until the window that opened with the first request closes or
+    # the batch is full
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # Hand the error to every request of the batch still waiting
+    @staticmethod
+    def _fail(batch, error):
+        for pending in batch:
+            if not pending.done.is_set():
+                pending.error = error
+                pending.done.set()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                started = time.monotonic()
+                for pending in batch:
+                    group_commit_queue_wait.observe((self.name,), started - pending.enqueued_at)
+                group_commit_batch_size.observe((self.name,), len(batch))
+                self._write(batch)
+            except Exception as e:
+                logging.error("Group commit writer %s failed: %s", self.name, str(e), exc_info=True)
+                self._fail(batch, e)
+            except BaseException as e:
+                # The thread is going away; the next submit() starts another
+                self._fail(batch, RuntimeError(f"{self.name} writer stopped: {e!r}"))
+                raise
+
+    def _write(self, batch):
+        try:
+            results = self.write_batch([pending.item for pending in batch])
+            for pending, result in zip(batch, results):
+                pending.result = result
+                pending.done.set()
+            self._fail(batch, RuntimeError(f"{self.name} batch returned no result for this request"))
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry one by one so a single bad row cannot fail its neighbours
+                logging.warning("Group commit batch of %s failed, retrying individually: %s", len(batch), str(e))
+                for pending in batch:
+                    self._write([pending])
+                return
+            batch[0].error = e
+            batch[0].done.set()
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "window": self.window, "max_batch": self.max_batch}
+
+
+_writers = []
+
+
+def create_writer(name, write_batch):
+    writer = GroupCommitWriter(
+        name, write_batch, group_commit_config['window'], group_commit_config['max_batch'], group_commit_config['max_queue'],
+        group_commit_config['timeout']
+    )
+    _writers.append(writer)
+    return writer
+
+
+def _group_commit_metrics():
+    return [(
+        "group_commit_queue_depth", "Requests waiting for the group commit writer",
+        {(writer.name,): writer.stats()["queued"] for writer in _writers}, ("writer",)
+    )]
+
+
+register_collector(_group_commit_metrics)
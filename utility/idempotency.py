@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from utility.db import get_db_connection
+from utility.repository import is_duplicate_key
+from utility.statements import statement
+
+# Idempotency configuration
+idempotency_config = {
+    'ttl': int(os.environ.get('IDEMPOTENCY_TTL', 86400)),                    # seconds a stored response is replayed
+    'purge_interval': float(os.environ.get('IDEMPOTENCY_PURGE_SECONDS', 300)),  # how often expired keys are deleted
+    'purge_batch': 1000
+}
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+CLAIM_KEY = statement("claim_idempotency_key", """
+    INSERT INTO Idempotency_Key (scope, idempotency_key, request_hash, expires_at)
+    VALUES (%s, %s, %s, %s)
+""")
+STORED_RESPONSE = statement("stored_idempotency_response", """
+    SELECT request_hash, status_code, response_body FROM Idempotency_Key
+    WHERE scope = %s AND idempotency_key = %s AND expires_at > %s
+    FOR SHARE
+""")
+DELETE_EXPIRED_KEY = statement(
+    "delete_expired_idempotency_key",
+    "DELETE FROM Idempotency_Key WHERE scope = %s AND idempotency_key = %s AND expires_at <= %s"
+)
+SAVE_RESPONSE = statement("save_idempotency_response", """
+    UPDATE Idempotency_Key SET status_code = %s, response_body = %s
+    WHERE scope = %s AND idempotency_key = %s
+""")
+RELEASE_KEY = statement(
+    "release_idempotency_key", "DELETE FROM Idempotency_Key WHERE scope = %s AND idempotency_key = %s"
+)
+
+
+class IdempotencyConflictError(Exception):
+    pass
+
+
+# Hash of everything that identifies the request, so a key reused for a
+# different request is rejected instead of replaying the wrong response
+def request_fingerprint(path, params, data):
+    payload = json.dumps([path, params, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Expiry times come from the application clock so every backend compares
+# them the same way. Always UTC, as naive DATETIMEs: hosts in different
+# time zones, or a DST change, must not move a key's expiry.
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+# Locking read, so the row committed by the other request is seen even if
+# this transaction's snapshot is older
+def _stored_response(cur, scope, key):
+    cur.execute(STORED_RESPONSE, (scope, key, _now()))
+    return cur.fetchone()
+
+
+# Claim the key inside the caller's transaction, before any other write.
+# Returns None when this request owns the key, or the stored (body, status)
+# of the request that already completed with it. A duplicate arriving while
+# the first request is still running blocks on the row lock until that
+# request commits (and is then replayed) or rolls back (and the claim
+# succeeds), so the work is done at most once.
+def claim_key(cur, scope, key, fingerprint):
+    for _ in range(2):
+        try:
+            cur.execute(CLAIM_KEY, (scope, key, fingerprint, _now() + datetime.timedelta(seconds=idempotency_config['ttl'])))
+            return None
+        except Exception as e:
+            if not is_duplicate_key(e):
+                raise
+
+        stored = _stored_response(cur, scope, key)
+        if stored is None:
+            # Expired but not purged yet, reclaim it
+            cur.execute(DELETE_EXPIRED_KEY, (scope, key, _now()))
+            continue
+        request_hash, status, body = stored
+        if request_hash != fingerprint:
+            raise IdempotencyConflictError("Idempotency-Key was already used for a different request")
+        if status is None:
+            # Claimed earlier in this same transaction
+            break
+        return json.loads(body), status
+    raise IdempotencyConflictError("Idempotency-Key is in use")
+
+
+# Store the response in the same transaction as the work it describes.
+# Only successful responses are saved; a failed request rolls back its
+# claim too, so a retry runs again.
+def save_response(cur, scope, key, body, status):
+    cur.execute(SAVE_RESPONSE, (status, json.dumps(body, default=str), scope, key))
+
+
+# Give up a claim whose request failed while its transaction goes on to
+# commit other work, as in a group commit batch
+def release_key(cur, scope, key):
+    cur.execute(RELEASE_KEY, (scope, key))
+
+
+# Deletes in batches of about purge_batch rows, each bounded by the expiry
+# time of the batch's last row, so no single statement holds locks for long
+def purge_expired_keys():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        deleted = 0
+        now = _now()
+        while True:
+            cur.execute("""
+                SELECT expires_at FROM Idempotency_Key WHERE expires_at <= %s
+                ORDER BY expires_at LIMIT 1 OFFSET %s
+            """, (now, idempotency_config['purge_batch'] - 1))
+            row = cur.fetchone()
+            cur.execute("DELETE FROM Idempotency_Key WHERE expires_at <= %s", (row[0] if row else now,))
+            deleted += cur.rowcount
+            conn.commit()
+            if row is None:
+                return deleted
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _purge_loop():
+    while True:
+        time.sleep(idempotency_config['purge_interval'])
+        try:
+            deleted = purge_expired_keys()
+            if deleted:
+                logging.info("Purged %s expired idempotency keys", deleted)
+        except Exception as e:
+            logging.error("Error purging idempotency keys: %s", str(e), exc_info=True)
+
+
+def start_idempotency_purge():
+    thread = threading.Thread(target=_purge_loop, name="idempotency-purge", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
+from utility.db import get_db_connection
+
+# Transaction images live on disk under their SHA-256, so identical uploads
+# are stored once and the Transaction row only keeps the 64 character hash
+IMAGE_STORE_PATH = os.environ.get('IMAGE_STORE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'image_store'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+# Images nothing references are only purged once untouched this long, so an
+# upload has time to be attached to its transaction
+IMAGE_ORPHAN_GRACE_SECONDS = int(os.environ.get('IMAGE_ORPHAN_GRACE_SECONDS', 86400))
+
+# Types accepted on upload, decided from the file's magic bytes
+IMAGE_MIMETYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+_CHUNK_SIZE = 64 * 1024
+_IMAGE_ID = re.compile(r'^[0-9a-f]{64}$')
+_HEAD_BYTES = 16
+
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF', 'application/pdf')  # stored before uploads were checked
+]
+
+
+class ImageTooLargeError(Exception):
+    pass
+
+
+class UnsupportedImageError(ValueError):
+    pass
+
+
+def is_image_id(value):
+    return isinstance(value, str) and bool(_IMAGE_ID.match(value))
+
+
+# Two levels of fan-out keep directories small
+def image_path(image_id):
+    return os.path.join(IMAGE_STORE_PATH, image_id[:2], image_id[2:4], image_id)
+
+
+def image_exists(image_id):
+    return is_image_id(image_id) and os.path.exists(image_path(image_id))
+
+
+# image_exists for a transaction about to reference the image. Refreshes its
+# modification time so the orphan purge leaves it alone.
+def claim_image(image_id):
+    if not is_image_id(image_id):
+        return False
+    try:
+        os.utime(image_path(image_id))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def sniff_mimetype(head):
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    return 'application/octet-stream'
+
+
+def _check_type(head, mimetypes):
+    if sniff_mimetype(head) not in mimetypes:
+        raise UnsupportedImageError(f"Unsupported image type. Allowed types: {', '.join(mimetypes)}")
+
+
+# Stream an upload to disk while hashing it. Returns (image_id, size, created).
+# With mimetypes, the upload is rejected as soon as its first bytes show it is
+# none of them.
+def save_image(stream, mimetypes=None):
+    os.makedirs(IMAGE_STORE_PATH, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+
+    # The temp file sits in the store so the final rename is atomic
+    fd, temp_path = tempfile.mkstemp(dir=IMAGE_STORE_PATH, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if len(head) < _HEAD_BYTES:
+                    head += chunk[:_HEAD_BYTES - len(head)]
+                    if mimetypes is not None and len(head) == _HEAD_BYTES:
+                        _check_type(head, mimetypes)
+                size += len(chunk)
+                if size > IMAGE_MAX_BYTES:
+                    raise ImageTooLargeError(f"Image exceeds {IMAGE_MAX_BYTES} bytes")
+                digest.update(chunk)
+                temp_file.write(chunk)
+
+        if size == 0:
+            raise ValueError("Image is empty")
+        if mimetypes is not None and len(head) < _HEAD_BYTES:
+            _check_type(head, mimetypes)
+
+        image_id = digest.hexdigest()
+        path = image_path(image_id)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            # A re-upload counts as fresh for the orphan purge
+            os.utime(path)
+            return image_id, size, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return image_id, size, True
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def image_mimetype(image_id):
+    with open(image_path(image_id), 'rb') as image_file:
+        return sniff_mimetype(image_file.read(_HEAD_BYTES))
+
+
+# (image_id, modification time) of every image in the store
+def _stored_images():
+    for directory, _, files in os.walk(IMAGE_STORE_PATH):
+        for name in files:
+            if is_image_id(name):
+                try:
+                    yield name, os.stat(os.path.join(directory, name)).st_mtime
+                except FileNotFoundError:
+                    pass
+
+
+def _referenced_images():
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT DISTINCT transaction_image FROM Transaction WHERE transaction_image IS NOT NULL")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Delete images no transaction references that are older than the grace
+# period. Candidates are listed before the references are read, and each is
+# checked again just before it is deleted: an image uploaded or claimed in the
+# meantime has a fresh modification time and is kept.
+def purge_unreferenced_images(grace_seconds=None, dry_run=False):
+    grace_seconds = IMAGE_ORPHAN_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    candidates = [image_id for image_id, mtime in _stored_images() if mtime < cutoff]
+    referenced = _referenced_images() if candidates else set()
+
+    deleted, deleted_bytes = [], 0
+    for image_id in candidates:
+        if image_id in referenced:
+            continue
+        path = image_path(image_id)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime >= cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        deleted.append(image_id)
+        deleted_bytes += stat.st_size
+    if deleted and not dry_run:
+        logging.info("Purged %s unreferenced images (%s bytes)", len(deleted), deleted_bytes)
+    return {"candidates": len(candidates), "deleted": len(deleted), "bytes": deleted_bytes, "dry_run": dry_run}
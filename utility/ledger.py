@@ -0,0 +1,94 @@
+import datetime
+from utility.db import get_backend
+
+# The Transaction table is an append-only ledger partitioned by month on
+# date. Monthly partitions are split off the catch-all p_future partition
+# ahead of time, and old months can be dropped once archived.
+
+LEDGER_TABLE = "Transaction"
+FUTURE_PARTITION = "p_future"
+
+TRANSACTION_TYPES = ("purchase", "return")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return datetime.date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(start):
+    return start.strftime("p%Y%m")
+
+
+def partition_clause(start):
+    return f"PARTITION {partition_name(start)} VALUES LESS THAN ('{next_month(start).isoformat()}')"
+
+
+# PARTITION BY clause covering first_month through months_ahead months past
+# the current one, plus the catch-all partition
+def partition_definition(first_month, months_ahead=3):
+    start = month_start(first_month)
+    end = month_start(datetime.date.today())
+    for _ in range(months_ahead):
+        end = next_month(end)
+    clauses = []
+    while start <= end:
+        clauses.append(partition_clause(start))
+        start = next_month(start)
+    clauses.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(date) (\n    " + ",\n    ".join(clauses) + "\n)"
+
+
+# (name, upper bound date or None for MAXVALUE, estimated rows) per
+# partition. The embedded SQLite backend keeps the ledger unpartitioned.
+def list_partitions(cur):
+    if get_backend().name != 'mysql':
+        return []
+    cur.execute("""
+        SELECT partition_name, partition_description, table_rows
+        FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (LEDGER_TABLE,))
+    partitions = []
+    for name, description, rows in cur.fetchall():
+        bound = None if description == "MAXVALUE" else datetime.date.fromisoformat(description.strip("'"))
+        partitions.append((name, bound, rows))
+    return partitions
+
+
+# Split monthly partitions off p_future until months_ahead months past the
+# current one are covered. p_future is expected to be empty or nearly so,
+# which keeps the reorganize cheap.
+def ensure_partitions(cur, months_ahead=3):
+    bounds = [bound for _, bound, _ in list_partitions(cur) if bound is not None]
+    target = month_start(datetime.date.today())
+    for _ in range(months_ahead + 1):
+        target = next_month(target)
+
+    start = max(bounds) if bounds else month_start(datetime.date.today())
+    clauses = []
+    while start < target:
+        clauses.append(partition_clause(start))
+        start = next_month(start)
+    if not clauses:
+        return []
+
+    clauses.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    cur.execute(
+        f"ALTER TABLE {LEDGER_TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(clauses)})"
+    )
+    return [clause.split()[1] for clause in clauses[:-1]]
+
+
+# Drop every monthly partition that ends on or before the given month.
+# Dropping a partition is a metadata operation, unlike a DELETE by date.
+def drop_partitions_before(cur, month):
+    month = month_start(month)
+    names = [name for name, bound, _ in list_partitions(cur) if bound is not None and bound <= month]
+    if names:
+        cur.execute(f"ALTER TABLE {LEDGER_TABLE} DROP PARTITION {', '.join(names)}")
+    return names
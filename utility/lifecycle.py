@@ -0,0 +1,90 @@
+import time
+import logging
+import threading
+from utility.db import get_pool, get_replicas, get_db_connection
+from utility.barcode_index import barcode_map
+from utility.search_index import item_search_index
+
+# Worker lifecycle behind /ready: a worker is ready once warmed up and stops
+# being ready as soon as it starts draining for shutdown or reload.
+
+
+class _Lifecycle:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.warm = False
+        self.draining = False
+
+    def mark_warm(self):
+        with self._lock:
+            self.warm = True
+
+    def mark_draining(self):
+        with self._lock:
+            self.draining = True
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.draining:
+                return "draining"
+            return "ready" if self.warm else "warming"
+
+
+lifecycle = _Lifecycle()
+
+
+# Open the pool's idle connections up front, so the first requests do not
+# pay for the connects
+def _warm_pool(pool):
+    entries = []
+    try:
+        for _ in range(pool.pool_size):
+            entries.append(pool.acquire())
+    finally:
+        for entry in entries:
+            pool.release(entry)
+    return len(entries)
+
+
+# Fill the barcode map in one pass over the unique barcode index
+def _warm_barcodes():
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT item_sku, barcode FROM Item WHERE barcode IS NOT NULL")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    for item_sku, barcode in rows:
+        barcode_map.put(item_sku, barcode)
+    return len(rows)
+
+
+# Warm connections and in-memory indexes before the worker accepts traffic.
+# Waits up to timeout seconds for the search index; read_items falls back to
+# LIKE queries if it is still building.
+def warm_up(timeout=30):
+    start = time.monotonic()
+    connections = _warm_pool(get_pool())
+    replicas = get_replicas()
+    if replicas is not None:
+        for index, pool in enumerate(replicas.pools):
+            try:
+                connections += _warm_pool(pool)
+            except Exception as e:
+                replicas.eject(index, str(e))
+    barcodes = _warm_barcodes()
+
+    deadline = start + timeout
+    while not item_search_index.ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if not item_search_index.ready:
+        logging.warning("Item search index still building after %ss warm-up", timeout)
+
+    lifecycle.mark_warm()
+    logging.info(
+        "Worker warm in %.2fs: %d connections, %d barcodes, search index ready: %s",
+        time.monotonic() - start, connections, barcodes, item_search_index.ready
+    )
@@ -0,0 +1,225 @@
+import os
+import re
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import random
+import atexit
+import logging
+import datetime
+import threading
+import logging.handlers
+from flask import g, request, has_request_context
+from utility.metrics import Counter
+
+# Logging configuration. Records are put on a queue by the request thread and
+# formatted and written by a listener thread; LOG_QUEUE=0 writes them on the
+# request thread instead, to measure the difference.
+log_config = {
+    'level': os.environ.get('LOG_LEVEL'),                               # root level, unset keeps the current one
+    'format': os.environ.get('LOG_FORMAT', 'json'),                     # json or text
+    'queue': os.environ.get('LOG_QUEUE', '1') == '1',                   # write records off the request thread
+    'queue_size': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),         # records dropped once this many are pending
+    'payload_sample': float(os.environ.get('LOG_PAYLOAD_SAMPLE', 1.0)), # fraction of request bodies logged
+    'payload_sample_routes': os.environ.get('LOG_PAYLOAD_SAMPLE_ROUTES', ''),  # endpoint=rate,... overrides
+    'redact': os.environ.get('LOG_REDACT', 'pass_hash,password')        # keys whose values are never logged
+}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+REDACTED = "[REDACTED]"
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+log_records_dropped = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+_listener = None
+_output = []
+_configure_lock = threading.Lock()
+
+
+# "item_routes.create_item=0.1,user_routes.update_user=0" -> {endpoint: rate}
+def _parse_rates(value):
+    rates = {}
+    for pair in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, rate = pair.partition('=')
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+_payload_rates = _parse_rates(log_config['payload_sample_routes'])
+_redact_keys = frozenset(key.strip().lower() for key in log_config['redact'].split(',') if key.strip())
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in _redact_keys else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+# Log a request body for a sampled fraction of requests to the current route
+def log_payload(message, *args):
+    rate = _payload_rates.get(request.endpoint, log_config['payload_sample']) if has_request_context() else 1.0
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    logging.info(message, *args)
+
+
+# Stamps each record with the request it was logged from. Runs on the
+# request thread, before the record is queued.
+class _RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+        else:
+            record.request_id = None
+            record.endpoint = None
+        return True
+
+
+# Replaces redacted keys in dict and list arguments. Runs where the record is
+# formatted, so with the queue it costs the request thread nothing.
+class _RedactFilter(logging.Filter):
+    def filter(self, record):
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) if isinstance(arg, (dict, list)) else arg for arg in record.args)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, 'request_id', None),
+            "endpoint": getattr(record, 'endpoint', None),
+            "process": record.process,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        record.request_id = getattr(record, 'request_id', None) or '-'
+        return super().format(record)
+
+
+# Time the request thread spends logging, reported in Server-Timing
+def _count_log_time(duration):
+    if has_request_context():
+        g.log_time = g.get('log_time', 0.0) + duration
+
+
+class _TimedStreamHandler(logging.StreamHandler):
+    def handle(self, record):
+        start = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            _count_log_time(time.perf_counter() - start)
+
+
+# Queues the record unformatted. The standard QueueHandler formats the
+# message on the calling thread; here only dict and list arguments are
+# copied, so a request mutating its body afterwards cannot change the line.
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        if isinstance(record.args, dict):
+            record.args = copy.copy(record.args)
+        elif record.args:
+            record.args = tuple(copy.copy(arg) if isinstance(arg, (dict, list)) else arg for arg in record.args)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc(())
+
+    def handle(self, record):
+        start = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            _count_log_time(time.perf_counter() - start)
+
+
+def _begin_request():
+    incoming = request.headers.get(REQUEST_ID_HEADER)
+    g.request_id = incoming if incoming and _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+
+def _finish_request(response):
+    response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+    log_time = g.get('log_time')
+    if log_time:
+        response.headers.add('Server-Timing', f"log;dur={log_time * 1000:.3f}")
+    return response
+
+
+def _output_handler():
+    handler = logging.StreamHandler(sys.stderr) if log_config['queue'] else _TimedStreamHandler(sys.stderr)
+    if log_config['format'] == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(_TextFormatter("%(asctime)s [%(process)d] %(levelname)s [%(request_id)s] %(message)s"))
+    handler.addFilter(_RedactFilter())
+    return handler
+
+
+# Replace the root handlers, once per process however many apps are made.
+# gunicorn workers call this after the fork, so each has its own listener.
+def _configure_root():
+    global _listener
+    with _configure_lock:
+        if _output:
+            return
+        root = logging.getLogger()
+        if log_config['level']:
+            root.setLevel(log_config['level'].upper())
+        output = _output_handler()
+        _output.append(output)
+        if log_config['queue']:
+            handler = _QueueHandler(queue.Queue(maxsize=log_config['queue_size']))
+            _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        else:
+            handler = output
+        handler.addFilter(_RequestContextFilter())
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+
+
+# Write out everything queued, then log synchronously from here on
+def stop_logging():
+    global _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        output = _output[0]
+        output.addFilter(_RequestContextFilter())
+        root.addHandler(output)
+    listener.stop()
+
+
+def init_app(app):
+    _configure_root()
+    app.before_request(_begin_request)
+    app.after_request(_finish_request)
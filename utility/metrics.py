@@ -0,0 +1,207 @@
+import re
+import time
+import bisect
+import logging
+import threading
+from flask import Response, g, request
+
+# Minimal Prometheus text-format metrics. Each metric keeps its own lock and
+# stores samples per label tuple, so recording is a dict lookup and a few adds.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels=(), value=0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(labels)
+            if sample is None:
+                sample = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def collect(self):
+        with self._lock:
+            values = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._values.items()]
+        lines = self._header()
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+# Callbacks returning (name, documentation, {label tuple: value}, labelnames)
+# for values owned elsewhere, such as pool and cache statistics
+_COLLECTORS = []
+
+
+def register_collector(collector):
+    _COLLECTORS.append(collector)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    for collector in _COLLECTORS:
+        try:
+            for name, documentation, values, labelnames in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_labels(labelnames, labels)} {value}" for labels, value in values.items())
+        except Exception as e:
+            logging.error("Error collecting metrics: %s", str(e), exc_info=True)
+    return "\n".join(lines) + "\n"
+
+
+# HTTP metrics
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by blueprint and endpoint", ("blueprint", "endpoint", "method")
+)
+http_requests_total = Counter(
+    "http_requests_total", "Requests by blueprint, endpoint and status", ("blueprint", "endpoint", "method", "status")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("blueprint", "endpoint")
+)
+
+
+def _endpoint_labels():
+    return (request.blueprint or "", request.endpoint or "unmatched")
+
+
+def _before_request():
+    g.metrics_labels = _endpoint_labels()
+    g.metrics_start = time.perf_counter()
+    http_requests_in_flight.inc(g.metrics_labels)
+
+
+def _after_request(response):
+    start = g.get('metrics_start')
+    if start is not None:
+        blueprint, endpoint = g.metrics_labels
+        http_request_duration.observe((blueprint, endpoint, request.method), time.perf_counter() - start)
+        http_requests_total.inc((blueprint, endpoint, request.method, str(response.status_code)))
+    return response
+
+
+def _teardown_request(exception=None):
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        http_requests_in_flight.dec(labels)
+
+
+def metrics_view():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+# Database metrics
+
+db_query_duration = Histogram("db_query_duration_seconds", "Time spent in cursor.execute by statement", ("statement",))
+db_rows_total = Counter("db_rows_total", "Rows fetched or affected by statement", ("statement",))
+db_errors_total = Counter("db_errors_total", "Failed statements", ("statement",))
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES_LIST = re.compile(r'(VALUES \(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.IGNORECASE)
+_CASE_ARMS = re.compile(r'(WHEN \? THEN \?)(?: WHEN \? THEN \?)+', re.IGNORECASE)
+
+_normalized = {}
+
+
+# Collapse a statement to its shape: literals and placeholders become ?,
+# IN lists, multi-row VALUES and CASE arms collapse to a single form
+def normalize_sql(query):
+    cached = _normalized.get(query)
+    if cached is not None:
+        return cached
+    shape = _WHITESPACE.sub(' ', query).strip()
+    shape = shape.replace('%s', '?')
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    shape = _VALUES_LIST.sub(r'\1', shape)
+    shape = _CASE_ARMS.sub(r'\1 ...', shape)
+    # Bounded memo, dynamic statements produce many distinct texts
+    if len(_normalized) < 10000:
+        _normalized[query] = shape
+    return shape
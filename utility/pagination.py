@@ -0,0 +1,90 @@
+import io
+import csv
+import json
+import base64
+from flask import Response, current_app, request
+from utility.compression import compress_response
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PAGINATION_PARAMS = ["limit", "after", "fields", "format"]
+
+# List response formats: an array of objects, one array per column, or CSV
+# with a header row
+PAGE_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "csv": "text/csv"
+}
+
+
+# Cursors are the last primary key of a page, base64 encoded so clients
+# treat them as opaque. The paginated keys are all strings; anything else
+# decoded from a client cursor is rejected.
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(value, str):
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def parse_fields(fields):
+    if not fields:
+        return []
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+# Columns to select for a page: the projection plus the key column, which
+# keyset pagination always needs
+def select_columns(fields, key_column):
+    return fields if key_column in fields else [key_column] + fields
+
+
+# format= wins, otherwise CSV when the client prefers it in Accept
+def page_format(params):
+    if "format" in params:
+        return params["format"]
+    accepted = request.accept_mimetypes
+    return "csv" if accepted["text/csv"] > accepted["application/json"] else "json"
+
+
+def _csv_body(fields, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+# Serialize a page straight from the cursor tuples. Only the default JSON
+# format builds a dict per row; columnar transposes the tuples and CSV
+# writes them as they are.
+def page_response(rows, columns, fields, key_column, limit, page_format="json"):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1][columns.index(key_column)]) if has_more and rows else None
+    if fields != columns:
+        indexes = [columns.index(field) for field in fields]
+        rows = [tuple(row[index] for index in indexes) for row in rows]
+
+    if page_format == "csv":
+        body = _csv_body(fields, rows)
+    elif page_format == "columnar":
+        body = current_app.json.dumps(dict(zip(fields, map(list, zip(*rows)))))
+    else:
+        body = current_app.json.dumps([dict(zip(fields, row)) for row in rows])
+
+    response = Response(body, mimetype=PAGE_FORMATS[page_format])
+    response.vary.add("Accept")
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return compress_response(response), len(rows)
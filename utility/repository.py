@@ -0,0 +1,105 @@
+import re
+from utility.db import get_backend
+from utility.statements import dynamic_statement
+from utility.versions import VERSIONED_TABLES, VERSION_BUMP, bump_table_version, row_timestamp
+
+# Single-statement mutations shared by the routes. Missing rows are detected
+# from the affected row count and conflicts from duplicate-key errors, so no
+# route needs a separate existence check. Columns are sorted, so every request
+# touching the same columns shares one prepared statement. Writes to a
+# versioned table also stamp the row version and bump the table's change
+# counter, inside the caller's transaction.
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class NotFoundError(Exception):
+    pass
+
+
+class ConflictError(Exception):
+    def __init__(self, key, message):
+        super().__init__(message)
+        self.key = key
+
+
+def is_duplicate_key(e):
+    return get_backend().is_duplicate_key(e)
+
+
+# Column names come from request bodies, only plain identifiers reach the SQL
+def _identifier(name):
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name}")
+    return name
+
+
+def _where(key):
+    return " AND ".join(f"{_identifier(column)} = %s" for column in key)
+
+
+def _conflict(e):
+    return ConflictError(get_backend().duplicate_key_name(e), str(e))
+
+
+def insert_row(cur, table, values):
+    versioned = table in VERSIONED_TABLES
+    if versioned:
+        values = {**values, "updated_at": row_timestamp()}
+    columns = sorted(values)
+
+    def build():
+        placeholders = ", ".join(["%s"] * len(columns))
+        return f"INSERT INTO {table} ({', '.join(_identifier(column) for column in columns)}) VALUES ({placeholders})"
+
+    try:
+        cur.execute(
+            dynamic_statement(f"insert:{table}:{','.join(columns)}", build),
+            [values[column] for column in columns]
+        )
+    except Exception as e:
+        if is_duplicate_key(e):
+            raise _conflict(e) from e
+        raise
+    if versioned:
+        bump_table_version(cur, table)
+
+
+# Relies on CLIENT_FOUND_ROWS so rowcount counts matched rows, not changed ones
+def update_row(cur, table, key, values):
+    columns = sorted(values)
+    key_columns = sorted(key)
+    versioned = table in VERSIONED_TABLES
+
+    def build():
+        set_clause = ", ".join(f"{_identifier(column)} = %s" for column in columns)
+        if versioned:
+            set_clause += ", " + VERSION_BUMP
+        return f"UPDATE {table} SET {set_clause} WHERE {_where(key_columns)}"
+
+    try:
+        cur.execute(
+            dynamic_statement(f"update:{table}:{','.join(columns)}:{','.join(key_columns)}", build),
+            [values[column] for column in columns] + ([row_timestamp()] if versioned else [])
+            + [key[column] for column in key_columns]
+        )
+    except Exception as e:
+        if is_duplicate_key(e):
+            raise _conflict(e) from e
+        raise
+    if cur.rowcount == 0:
+        raise NotFoundError(f"No {table} row for {key}")
+    if versioned:
+        bump_table_version(cur, table)
+
+
+def delete_row(cur, table, key):
+    key_columns = sorted(key)
+    cur.execute(
+        dynamic_statement(f"delete:{table}:{','.join(key_columns)}", lambda: f"DELETE FROM {table} WHERE {_where(key_columns)}"),
+        [key[column] for column in key_columns]
+    )
+    if cur.rowcount == 0:
+        raise NotFoundError(f"No {table} row for {key}")
+    if table in VERSIONED_TABLES:
+        bump_table_version(cur, table)
@@ -0,0 +1,273 @@
+import os
+import time
+import logging
+import datetime
+import threading
+from collections import defaultdict
+from utility.db import get_db_connection
+from utility.cache import fold_key, add_invalidation_listener
+from utility.versions import row_timestamp
+
+# Item columns searched with substring matching in read_items
+SEARCH_FIELDS = ["item_name", "item_group", "brand", "item_sku"]
+
+# Above this many candidates an IN list stops paying off and read_items
+# falls back to the plain LIKE scan
+SEARCH_MAX_CANDIDATES = 5000
+
+# Rebuild periodically so writes made by other worker processes show up even
+# without the cache invalidation bus. 0 disables the refresh.
+SEARCH_INDEX_REFRESH_SECONDS = float(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 300))
+
+# Rows stamped this long before the index snapshot are still treated as
+# possibly missing from it: covers clock skew between hosts and transactions
+# that commit a while after stamping updated_at
+SEARCH_INDEX_SKEW_SECONDS = float(os.environ.get('SEARCH_INDEX_SKEW_SECONDS', 60))
+
+
+# Inverted index from n-grams of each field to the SKUs containing them.
+# Lookups intersect the posting lists of a term's n-grams and then confirm
+# the substring against the stored value, so results are exact. Values and
+# terms are folded like utf8mb4_general_ci compares them, so the index
+# matches what LIKE would.
+class NgramIndex:
+    def __init__(self, fields, n=3):
+        self.fields = fields
+        self.n = n
+        self.ready = False
+        self._lock = threading.RLock()
+        self._postings = {field: defaultdict(set) for field in fields}
+        self._values = {}
+        self._building = False
+        self._pending = []
+        self._built_at = None
+        self._build_seconds = None
+        self._snapshot_at = None
+
+    def _grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def _normalize(self, row):
+        return {field: fold_key(row[field]) for field in self.fields if row.get(field) is not None}
+
+    def _add(self, postings, values, sku, row):
+        normalized = self._normalize(row)
+        values[sku] = normalized
+        for field, text in normalized.items():
+            for gram in self._grams(text):
+                postings[field][gram].add(sku)
+
+    def _remove(self, sku):
+        normalized = self._values.pop(sku, None)
+        if not normalized:
+            return
+        for field, text in normalized.items():
+            for gram in self._grams(text):
+                skus = self._postings[field].get(gram)
+                if skus is not None:
+                    skus.discard(sku)
+                    if not skus:
+                        del self._postings[field][gram]
+
+    def _apply(self, op, sku, row):
+        if op == 'add':
+            self._remove(sku)
+            self._add(self._postings, self._values, sku, row)
+        elif op == 'update':
+            if sku not in self._values:
+                return
+            merged = {field: row[field] if field in row else self._values[sku].get(field) for field in self.fields}
+            merged['item_sku'] = row.get('item_sku', sku)
+            self._remove(sku)
+            self._add(self._postings, self._values, merged['item_sku'], merged)
+        elif op == 'remove':
+            self._remove(sku)
+
+    def _mutate(self, op, sku, row=None):
+        with self._lock:
+            # Writes that race a rebuild are replayed on top of the new snapshot
+            if self._building:
+                self._pending.append((op, sku, row))
+            self._apply(op, sku, row)
+
+    def add(self, sku, row):
+        self._mutate('add', sku, row)
+
+    def update(self, sku, changes):
+        if any(field in changes for field in self.fields):
+            self._mutate('update', sku, changes)
+
+    def remove(self, sku):
+        self._mutate('remove', sku)
+
+    # snapshot_at is the updated_at time the rows were read as of
+    def rebuild(self, rows, snapshot_at=None):
+        with self._lock:
+            self._building = True
+            self._pending = []
+        start = time.monotonic()
+
+        try:
+            postings = {field: defaultdict(set) for field in self.fields}
+            values = {}
+            for row in rows:
+                self._add(postings, values, row['item_sku'], row)
+        except Exception:
+            with self._lock:
+                self._building = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            self._postings = postings
+            self._values = values
+            for op, sku, row in self._pending:
+                self._apply(op, sku, row)
+            self._pending = []
+            self._building = False
+            self.ready = True
+            self._built_at = time.time()
+            self._build_seconds = round(time.monotonic() - start, 3)
+            self._snapshot_at = snapshot_at
+
+    def _field_candidates(self, field, term):
+        grams = self._grams(term)
+        postings = self._postings[field]
+        # Intersect from the rarest n-gram up so the working set stays small
+        lists = sorted((postings.get(gram, set()) for gram in grams), key=len)
+        if not lists or not lists[0]:
+            return set()
+        result = set(lists[0])
+        for skus in lists[1:]:
+            result &= skus
+            if not result:
+                break
+        return {sku for sku in result if term in self._values[sku].get(field, '')}
+
+    # SKUs matching every answerable term, or None when the index cannot
+    # help (not built yet, or no term it can answer)
+    def search(self, terms):
+        if not self.ready:
+            return None
+        with self._lock:
+            result = None
+            for field, term in terms.items():
+                term = fold_key(term)
+                # LIKE wildcards in the term are left for MySQL to match
+                if len(term) < self.n or '%' in term or '_' in term:
+                    continue
+                candidates = self._field_candidates(field, term)
+                result = candidates if result is None else result & candidates
+                if not result:
+                    return set()
+            return result
+
+    # Rows with updated_at from here on may have been written by another
+    # process after the snapshot and be missing from this index
+    def stale_after(self):
+        with self._lock:
+            if self._snapshot_at is None:
+                return None
+            return self._snapshot_at - datetime.timedelta(seconds=SEARCH_INDEX_SKEW_SECONDS)
+
+    # Order SKUs best match first: exact value, then prefix, then substring,
+    # with shorter values ranking higher
+    def rank(self, skus, terms):
+        terms = {field: fold_key(term) for field, term in terms.items()}
+        with self._lock:
+            def score(sku):
+                values = self._values.get(sku, {})
+                total = 0.0
+                for field, term in terms.items():
+                    value = values.get(field, '')
+                    if not value or term not in value:
+                        continue
+                    if value == term:
+                        total += 3
+                    elif value.startswith(term):
+                        total += 2
+                    else:
+                        total += 1
+                    total += len(term) / len(value)
+                return total
+            return sorted(skus, key=lambda sku: (-score(sku), sku))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "building": self._building,
+                "items": len(self._values),
+                "ngrams": {field: len(postings) for field, postings in self._postings.items()},
+                "built_at": self._built_at,
+                "snapshot_at": self._snapshot_at.isoformat() if self._snapshot_at else None,
+                "build_seconds": self._build_seconds
+            }
+
+
+item_search_index = NgramIndex(SEARCH_FIELDS)
+
+
+def _item_rows(cur):
+    columns = [desc[0] for desc in cur.description]
+    while True:
+        rows = cur.fetchmany(1000)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+# Load every item into the index
+def rebuild_item_search_index():
+    conn = get_db_connection()
+    cur = conn.cursor(buffered=False)
+    try:
+        snapshot_at = row_timestamp()
+        cur.execute(f"SELECT {', '.join(SEARCH_FIELDS)} FROM Item")
+        item_search_index.rebuild(_item_rows(cur), snapshot_at)
+        logging.info("Item search index built: %s", item_search_index.stats())
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Re-read one item after another process wrote it. Item writes invalidate
+# the item cache, and the bus delivers those invalidations here too.
+def _resync_item(item_sku):
+    if not item_search_index.ready:
+        return
+    conn = get_db_connection(read_only=False)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT {', '.join(SEARCH_FIELDS)} FROM Item WHERE item_sku = %s", (item_sku,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    if row is None:
+        item_search_index.remove(item_sku)
+    else:
+        item_search_index.add(row[SEARCH_FIELDS.index('item_sku')], dict(zip(SEARCH_FIELDS, row)))
+
+
+add_invalidation_listener("item", _resync_item)
+
+
+def _build_loop():
+    while True:
+        try:
+            rebuild_item_search_index()
+        except Exception as e:
+            logging.error("Error building item search index: %s", str(e), exc_info=True)
+        if SEARCH_INDEX_REFRESH_SECONDS <= 0:
+            break
+        time.sleep(SEARCH_INDEX_REFRESH_SECONDS)
+
+
+# Build in the background so startup is not blocked. Until the index is
+# ready, read_items keeps using plain LIKE queries.
+def start_item_search_index():
+    thread = threading.Thread(target=_build_loop, name="item-search-index", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,123 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+# Slow query log configuration
+slow_query_config = {
+    'threshold': float(os.environ.get('SLOW_QUERY_SECONDS', 0.5)),   # statements at least this slow are logged
+    'explain': os.environ.get('SLOW_QUERY_EXPLAIN', '1') == '1',     # capture an EXPLAIN for each new slow shape
+    'max_shapes': int(os.environ.get('SLOW_QUERY_MAX_SHAPES', 500))  # distinct shapes kept in memory
+}
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+# Parameter types rather than values, so logs show the shape without data
+def param_shape(params):
+    if not params:
+        return []
+    values = params.values() if isinstance(params, dict) else params
+    types = [type(value).__name__ for value in values]
+    if len(types) <= 10:
+        return types
+    return [f"{len(types)} params: {', '.join(sorted(set(types)))}"]
+
+
+# Slow statements aggregated by normalized SQL. The first time a shape is
+# seen its plan is captured by a background thread so the request that hit
+# the slow query does not pay for the EXPLAIN.
+class SlowQueryLog:
+    def __init__(self, threshold=0.5, explain=True, max_shapes=500):
+        self.threshold = threshold
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._shapes = {}
+        self._queue = queue.Queue(maxsize=100)
+        self._worker = None
+
+    def record(self, statement, operation, params, duration, rows):
+        with self._lock:
+            entry = self._shapes.get(statement)
+            is_new = entry is None
+            if is_new:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                entry = self._shapes[statement] = {
+                    "statement": statement,
+                    "count": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "rows": 0,
+                    "param_shape": param_shape(params),
+                    "last_seen": None,
+                    "explain": None
+                }
+            entry["count"] += 1
+            entry["total_time"] += duration
+            entry["max_time"] = max(entry["max_time"], duration)
+            entry["rows"] += max(rows, 0)
+            entry["last_seen"] = time.time()
+
+        logging.warning("Slow query (%.3fs, rows: %s): %s params: %s", duration, rows, statement, param_shape(params))
+        if is_new and self.explain and operation.lstrip().upper().startswith(_EXPLAINABLE):
+            self._enqueue_explain(statement, operation, params)
+
+    def add_rows(self, statement, rows):
+        with self._lock:
+            entry = self._shapes.get(statement)
+            if entry is not None:
+                entry["rows"] += rows
+
+    def _enqueue_explain(self, statement, operation, params):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+                    self._worker.start()
+        try:
+            self._queue.put_nowait((statement, operation, params))
+        except queue.Full:
+            logging.debug("Slow query EXPLAIN queue full, skipping: %s", statement)
+
+    def _explain_loop(self):
+        # Imported here, utility.db depends on this module
+        from utility.db import get_backend, get_db_connection
+
+        while True:
+            statement, operation, params = self._queue.get()
+            try:
+                conn = get_db_connection()
+                cur = conn.cursor()
+                try:
+                    cur.execute(f"{get_backend().explain} {operation}", params)
+                    columns = [desc[0] for desc in cur.description]
+                    plan = [dict(zip(columns, row)) for row in cur.fetchall()]
+                finally:
+                    cur.close()
+                    conn.close()
+                with self._lock:
+                    if statement in self._shapes:
+                        self._shapes[statement]["explain"] = plan
+                logging.info("Captured EXPLAIN for slow query: %s plan: %s", statement, plan)
+            except Exception as e:
+                logging.error("Error capturing EXPLAIN for slow query: %s, Error: %s", statement, str(e))
+
+    def top(self, limit=20, order="total_time"):
+        with self._lock:
+            entries = [dict(entry) for entry in self._shapes.values()]
+        entries.sort(key=lambda entry: entry[order], reverse=True)
+        for entry in entries:
+            entry["avg_time"] = round(entry["total_time"] / entry["count"], 6)
+            entry["total_time"] = round(entry["total_time"], 6)
+            entry["max_time"] = round(entry["max_time"], 6)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+slow_query_log = SlowQueryLog(**slow_query_config)
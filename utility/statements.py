@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+from utility.metrics import Counter
+
+# Registry of the fixed SQL the routes run. Each statement is held once,
+# under a name, and executed through a server-side prepared statement that
+# every pooled connection prepares on first use and keeps for reuse.
+
+statement_config = {
+    'cache_size': int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 100)),  # prepared statements kept per connection
+    'max_dynamic': 1000                                                 # canonical dynamic statements registered at most
+}
+
+db_statement_cache_hits = Counter(
+    "db_statement_cache_hits_total", "Executions that reused the connection's prepared statement", ("statement",)
+)
+db_statement_cache_misses = Counter(
+    "db_statement_cache_misses_total", "Executions that had to prepare the statement first", ("statement",)
+)
+
+
+class Statement:
+    __slots__ = ('name', 'sql')
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+
+    def __str__(self):
+        return self.sql
+
+    def __repr__(self):
+        return f"Statement({self.name!r})"
+
+
+_statements = {}
+_dynamic = 0
+_lock = threading.Lock()
+
+
+# Register a fixed statement. Registering the same name again returns the
+# existing statement, a different text under a taken name is a bug.
+def statement(name, sql):
+    with _lock:
+        existing = _statements.get(name)
+        if existing is None:
+            existing = _statements[name] = Statement(name, sql)
+        elif existing.sql != sql:
+            raise ValueError(f"Statement {name} is already registered with different SQL")
+        return existing
+
+
+# Statement built at runtime from a canonical name, such as an UPDATE whose
+# SET columns are sorted. build() runs only the first time. Past max_dynamic
+# names the SQL is returned as plain text and runs unprepared.
+def dynamic_statement(name, build):
+    global _dynamic
+    existing = _statements.get(name)
+    if existing is not None:
+        return existing
+    with _lock:
+        existing = _statements.get(name)
+        if existing is not None:
+            return existing
+        if _dynamic >= statement_config['max_dynamic']:
+            return build()
+        _dynamic += 1
+        existing = _statements[name] = Statement(name, build())
+        return existing
+
+
+# Prepared cursors of one pooled connection, one per statement, least
+# recently used evicted past cache_size. open_cursor() returns a new cursor
+# that keeps its statement prepared between executions.
+class StatementCache:
+    def __init__(self, open_cursor, size=100):
+        self._open_cursor = open_cursor
+        self.size = size
+        self._cursors = OrderedDict()
+
+    def cursor(self, stmt):
+        cursor = self._cursors.get(stmt.name)
+        if cursor is not None:
+            self._cursors.move_to_end(stmt.name)
+            db_statement_cache_hits.inc((stmt.name,))
+            return cursor
+
+        db_statement_cache_misses.inc((stmt.name,))
+        cursor = self._cursors[stmt.name] = self._open_cursor()
+        if len(self._cursors) > self.size:
+            _, evicted = self._cursors.popitem(last=False)
+            try:
+                # Deallocates the server-side statement
+                evicted.close()
+            except Exception:
+                pass
+        return cursor
+
+
+# Registered statements with their hits and misses across all connections
+def get_statement_stats():
+    hits = db_statement_cache_hits.values()
+    misses = db_statement_cache_misses.values()
+    with _lock:
+        statements = list(_statements.values())
+    return [
+        {"name": stmt.name, "sql": stmt.sql, "hits": hits.get((stmt.name,), 0), "misses": misses.get((stmt.name,), 0)}
+        for stmt in sorted(statements, key=lambda stmt: stmt.name)
+    ]
@@ -0,0 +1,83 @@
+import os
+import random
+import hashlib
+import datetime
+from flask import Response, request
+from utility.db import get_backend
+from utility.statements import statement, dynamic_statement
+from utility.compression import negotiate_encoding
+
+# Row versions and table change counters behind the ETags of GET responses.
+# Rows of versioned tables carry row_version and updated_at, bumped by every
+# update through the repository helpers. Table_Version holds the change
+# counter of each table split over shards: a write bumps one shard, picked at
+# random, inside the caller's transaction, so the bump commits or rolls back
+# with the write it counts, and the list ETag reads their sum. The row lock
+# of a shard is held until that commit, so concurrent writers only wait on
+# each other when they land on the same shard.
+
+version_config = {
+    'shards': int(os.environ.get('TABLE_VERSION_SHARDS', 32))  # counter rows per table, more means fewer lock waits
+}
+
+VERSIONED_TABLES = ("Item", "User")
+VERSION_COLUMNS = ["row_version", "updated_at"]
+
+# SET clause fragment for updates of a versioned table, takes row_timestamp()
+VERSION_BUMP = "row_version = row_version + 1, updated_at = %s"
+
+TABLE_VERSION = statement("table_version", "SELECT SUM(version) FROM Table_Version WHERE table_name = %s")
+
+
+# updated_at is stored in UTC whatever the database session time zone
+def row_timestamp():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+# Shard rows are created by their first bump
+def _bump_statement():
+    return (
+        "INSERT INTO Table_Version (table_name, shard, version) VALUES (%s, %s, 1)"
+        + get_backend().increment_clause(["table_name", "shard"], "version")
+    )
+
+
+def bump_table_version(cur, table):
+    cur.execute(
+        dynamic_statement("bump_table_version", _bump_statement),
+        (table, random.randrange(version_config['shards']))
+    )
+
+
+def table_version(cur, table):
+    cur.execute(TABLE_VERSION, (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _etag(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def row_etag(row):
+    return _etag(row['row_version'], row['updated_at'])
+
+
+# The table counter plus everything else that shapes the response bytes: the
+# query, the negotiated format and the content encoding. Read the counter
+# before running the query, so a write landing in between can only make the
+# ETag older than the body, never newer.
+def list_etag(table, version, page_format):
+    return _etag(table, version, request.path, request.query_string.decode("latin-1"), page_format, negotiate_encoding())
+
+
+def is_not_modified(etag):
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag, vary=()):
+    response = Response(status=304)
+    response.set_etag(etag)
+    for header in vary:
+        response.vary.add(header)
+    return response
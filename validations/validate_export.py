@@ -0,0 +1,13 @@
+from utility.export import EXPORT_FORMATS
+
+
+def validate_export_params(params):
+    allowable_params = ["format"]
+    invalid_params = [key for key in params if key not in allowable_params]
+    if invalid_params:
+        return {"error": True, "message": f"Invalid query parameter(s): {', '.join(invalid_params)}"}
+
+    if "format" in params and params["format"] not in EXPORT_FORMATS:
+        return {"error": True, "message": f"Invalid format. Allowed values: {', '.join(EXPORT_FORMATS)}"}
+
+    return {"error": False}  # Valid input
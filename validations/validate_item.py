@@ -1,10 +1,18 @@
+from utility.pagination import PAGINATION_PARAMS
+from validations.validate_pagination import validate_pagination_params
+from utility.versions import VERSION_COLUMNS
+
+# Columns of the Item table, in insert order
+ITEM_FIELDS = [
+    "item_sku", "item_name", "item_uom", "item_group", "retail_price", 
+    "purchase_price", "warranty_period", "is_stock_item", "brand", 
+    "description", "single_unit_dimensions", "single_unit_weight", 
+    "weight_uom", "country_of_origin", "barcode", "barcode_type"
+]
+
+
 def validate_create_item(data):
-    required_fields = [
-        "item_sku", "item_name", "item_uom", "item_group", "retail_price", 
-        "purchase_price", "warranty_period", "is_stock_item", "brand", 
-        "description", "single_unit_dimensions", "single_unit_weight", 
-        "weight_uom", "country_of_origin", "barcode", "barcode_type"
-    ]
+    required_fields = ITEM_FIELDS
 
     # Check for missing fields
     missing_fields = [field for field in required_fields if field not in data or data[field] is None]
@@ -30,18 +38,38 @@ def validate_read_params(params):
         return {"error": True, "message": "Provide at least one search parameter"}
     
     # Allowable parameters
-    allowable_params = ["item_name", "item_group", "brand", "item_sku"]
+    allowable_params = ["item_name", "item_group", "brand", "item_sku", "match", "sort"] + PAGINATION_PARAMS
     invalid_params = [key for key in params if key not in allowable_params]
     if invalid_params:
         return {"error": True, "message": f"Invalid query parameter(s): {', '.join(invalid_params)}"}
 
-    return {"error": False}  # Valid input
+    if "match" in params and params["match"] not in ["contains", "exact"]:
+        return {"error": True, "message": "Invalid match. Allowed values: contains, exact"}
+
+    # Relevance ordering returns the top matches only, so it cannot be paged
+    if "sort" in params and params["sort"] not in ["item_sku", "relevance"]:
+        return {"error": True, "message": "Invalid sort. Allowed values: item_sku, relevance"}
+    if params.get("sort") == "relevance" and "after" in params:
+        return {"error": True, "message": "after cannot be combined with sort=relevance"}
+    if params.get("sort") == "relevance" and params.get("match") == "exact":
+        return {"error": True, "message": "match=exact cannot be combined with sort=relevance"}
+
+    return validate_pagination_params(params, ITEM_FIELDS)
 
 
 def validate_update_item(data):
     if not data:
         return {"error": True, "message": "No update fields provided"}
 
+    for field in data:
+        if field in VERSION_COLUMNS:
+            return {"error": True, "message": f"{field} is maintained by the server"}
+
+    # Only Item columns; field names end up in the SQL and the statement registry
+    invalid_fields = [field for field in data if field not in ITEM_FIELDS]
+    if invalid_fields:
+        return {"error": True, "message": "Invalid fields provided", "fields": invalid_fields}
+
     # Validate fields if present
     for field, value in data.items():
         if field in ['retail_price', 'purchase_price', 'warranty_period'] and (
@@ -55,4 +83,34 @@ def validate_update_item(data):
 def validate_delete_item(item_sku):
     if not item_sku:
         return {"error": True, "message": "Item SKU is required"}
-    return {"error": False}  # Valid input
\ No newline at end of file
+    return {"error": False}  # Valid input
+
+
+def validate_bulk_request(data, max_rows):
+    if not isinstance(data, list) or not data:
+        return {"error": True, "message": "Request body must be a non-empty list"}
+    if len(data) > max_rows:
+        return {"error": True, "message": f"Batch exceeds the maximum of {max_rows} rows"}
+    return {"error": False}  # Valid input
+
+
+def validate_bulk_update_item(data):
+    if not isinstance(data, dict) or not data.get("item_sku"):
+        return {"error": True, "message": "Item SKU is required"}
+
+    fields = {field: value for field, value in data.items() if field != "item_sku"}
+    invalid_fields = [field for field in fields if field not in ITEM_FIELDS]
+    if invalid_fields:
+        return {"error": True, "message": "Invalid fields provided", "fields": invalid_fields}
+
+    return validate_update_item(fields)
+
+
+def validate_barcode_lookup(data, max_codes):
+    if not isinstance(data, dict) or not isinstance(data.get("barcodes"), list) or not data["barcodes"]:
+        return {"error": True, "message": "barcodes must be a non-empty list"}
+    if len(data["barcodes"]) > max_codes:
+        return {"error": True, "message": f"Lookup exceeds the maximum of {max_codes} barcodes"}
+    if not all(isinstance(code, str) and code for code in data["barcodes"]):
+        return {"error": True, "message": "Every barcode must be a non-empty string"}
+    return {"error": False}  # Valid input
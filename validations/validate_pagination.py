@@ -0,0 +1,30 @@
+from utility.pagination import MAX_PAGE_SIZE, PAGE_FORMATS, decode_cursor, parse_fields
+
+
+def validate_pagination_params(params, allowed_fields):
+    if "limit" in params:
+        try:
+            limit = int(params["limit"])
+        except ValueError:
+            return {"error": True, "message": "limit must be an integer"}
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return {"error": True, "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+    if "after" in params:
+        try:
+            decode_cursor(params["after"])
+        except ValueError:
+            return {"error": True, "message": "Invalid cursor"}
+
+    if "fields" in params:
+        fields = parse_fields(params["fields"])
+        if not fields:
+            return {"error": True, "message": "fields cannot be empty"}
+        invalid_fields = [field for field in fields if field not in allowed_fields]
+        if invalid_fields:
+            return {"error": True, "message": f"Invalid field(s): {', '.join(invalid_fields)}"}
+
+    if "format" in params and params["format"] not in PAGE_FORMATS:
+        return {"error": True, "message": f"Invalid format. Allowed values: {', '.join(PAGE_FORMATS)}"}
+
+    return {"error": False}  # Valid input
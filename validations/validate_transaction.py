@@ -1,3 +1,16 @@
+import datetime
+from utility.image_store import is_image_id
+from utility.idempotency import IDEMPOTENCY_KEY_MAX_LENGTH
+
+
+def _is_date(value):
+    try:
+        datetime.date.fromisoformat(str(value))
+        return True
+    except ValueError:
+        return False
+
+
 def validate_purchase(data):
     required_fields = [
         "item_sku", "warehouse_id", "customer_id", "date", "sales_uom",
@@ -9,6 +22,10 @@ def validate_purchase(data):
     if missing_fields:
         return {"error": True, "message": "Missing required fields", "fields": missing_fields}
 
+    # The date picks the ledger partition
+    if not _is_date(data["date"]):
+        return {"error": True, "message": "date must be formatted as YYYY-MM-DD"}
+
     # Validate numeric fields
     if data.get("transaction_quantity") is not None and data["transaction_quantity"] <= 0:
         return {"error": True, "message": "Transaction quantity must be greater than 0"}
@@ -20,6 +37,10 @@ def validate_purchase(data):
     if data.get("tracking_information") is not None and len(data["tracking_information"]) > 255:
         return {"error": True, "message": "Tracking information exceeds the maximum allowed length"}
 
+    # Images are uploaded separately, the transaction only references them
+    if data.get("transaction_image") is not None and not is_image_id(data["transaction_image"]):
+        return {"error": True, "message": "transaction_image must be an image ID returned by the image upload"}
+
     return {"error": False}
 
 
@@ -27,25 +48,24 @@ def validate_update_purchase(data):
     if not data:
         return {"error": True, "message": "No update fields provided"}
 
+    # Prevent updating immutable fields. The ledger is append-only, quantity
+    # changes are recorded as a return or a new purchase.
+    immutable_fields = ["transaction_id", "transaction_type", "item_sku", "warehouse_id", "customer_id", "date", "transaction_quantity"]
+    if any(field in data for field in immutable_fields):
+        return {
+            "error": True,
+            "message": "Fields transaction_id, transaction_type, item_sku, warehouse_id, customer_id, date, and transaction_quantity cannot be updated"
+        }
+
     valid_fields = [
-        "date", "sales_uom", "transaction_quantity", "shipping_address",
-        "shipping_city", "shipping_state", "shipping_zipcode", "shipping_country",
-        "transaction_image", "transaction_barcode", "transaction_weight", "tracking_information"
+        "sales_uom", "shipping_address", "shipping_city", "shipping_state", "shipping_zipcode",
+        "shipping_country", "transaction_image", "transaction_barcode", "transaction_weight", "tracking_information"
     ]
     invalid_fields = [field for field in data.keys() if field not in valid_fields]
 
     if invalid_fields:
         return {"error": True, "message": "Invalid fields provided", "fields": invalid_fields}
 
-    # Prevent updating immutable fields
-    immutable_fields = ["item_sku", "warehouse_id", "customer_id"]
-    if any(field in data for field in immutable_fields):
-        return {"error": True, "message": "Fields item_sku, warehouse_id, and customer_id cannot be updated"}
-
-    # Validate numeric fields
-    if data.get("transaction_quantity") is not None and data["transaction_quantity"] <= 0:
-        return {"error": True, "message": "Transaction quantity must be greater than 0"}
-
     if data.get("transaction_weight") is not None and data["transaction_weight"] < 0:
         return {"error": True, "message": "Transaction weight cannot be negative"}
 
@@ -53,6 +73,10 @@ def validate_update_purchase(data):
     if data.get("tracking_information") is not None and len(data["tracking_information"]) > 255:
         return {"error": True, "message": "Tracking information exceeds the maximum allowed length"}
 
+    # Images are uploaded separately, the transaction only references them
+    if data.get("transaction_image") is not None and not is_image_id(data["transaction_image"]):
+        return {"error": True, "message": "transaction_image must be an image ID returned by the image upload"}
+
     return {"error": False}
 
 
@@ -64,9 +88,32 @@ def validate_return(data):
     if data["return_quantity"] <= 0:
         return {"error": True, "message": "Return quantity must be greater than 0"}
 
-    # Check if return_quantity exceeds the transaction_quantity (this should be validated in the database logic)
-    # Example (pseudo-code):
-    # if data["return_quantity"] > current_transaction_quantity:
-    #     return {"error": True, "message": "Return quantity cannot exceed transaction quantity"}
+    # Date of the return, defaults to today
+    if data.get("date") is not None and not _is_date(data["date"]):
+        return {"error": True, "message": "date must be formatted as YYYY-MM-DD"}
+
+    return {"error": False}
+
+
+# Query parameters addressing one ledger row. date is the purchase date;
+# when given, the lookup only touches that date's partition.
+def validate_ledger_params(params):
+    invalid_fields = [field for field in params if field != "date"]
+    if invalid_fields:
+        return {"error": True, "message": "Invalid query parameters", "fields": invalid_fields}
+
+    if "date" in params and not _is_date(params["date"]):
+        return {"error": True, "message": "date must be formatted as YYYY-MM-DD"}
+
+    return {"error": False}
+
+
+# Optional Idempotency-Key header value
+def validate_idempotency_key(key):
+    if key is None:
+        return {"error": False}
+
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH or not key.isascii() or not key.isprintable():
+        return {"error": True, "message": f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} printable ASCII characters"}
 
     return {"error": False}
\ No newline at end of file
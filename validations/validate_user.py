@@ -1,3 +1,15 @@
+from utility.pagination import PAGINATION_PARAMS
+from validations.validate_pagination import validate_pagination_params
+from utility.versions import VERSION_COLUMNS
+
+# Columns of the User table
+USER_FIELDS = ["user_id", "user_name", "user_role", "pass_hash"]
+
+# Columns a read may return or project. pass_hash is write-only, it never
+# leaves the database in a response or a cache entry.
+USER_PUBLIC_FIELDS = [field for field in USER_FIELDS if field != "pass_hash"]
+
+
 def validate_create_user(data):
     required_fields = ["user_id", "user_name", "pass_hash"]
 
@@ -30,18 +42,27 @@ def validate_read_user_params(params):
     if not params:
         return {"error": True, "message": "Provide at least one search parameter"}
 
-    allowable_params = ["user_name", "user_role", "user_id"]
+    allowable_params = ["user_name", "user_role", "user_id"] + PAGINATION_PARAMS
     invalid_params = [key for key in params if key not in allowable_params]
     if invalid_params:
         return {"error": True, "message": f"Invalid query parameter(s): {', '.join(invalid_params)}"}
 
-    return {"error": False}
+    return validate_pagination_params(params, USER_PUBLIC_FIELDS)
 
 
 def validate_update_user(data):
     if not data:
         return {"error": True, "message": "No update fields provided"}
 
+    for field in data:
+        if field in VERSION_COLUMNS:
+            return {"error": True, "message": f"{field} is maintained by the server"}
+
+    # Only User columns; field names end up in the SQL and the statement registry
+    invalid_fields = [field for field in data if field not in USER_FIELDS]
+    if invalid_fields:
+        return {"error": True, "message": "Invalid fields provided", "fields": invalid_fields}
+
     for field, value in data.items():
         if field == "user_id":
             return {"error": True, "message": "user_id cannot be updated (immutable field)"}